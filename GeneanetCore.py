@@ -0,0 +1,4630 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+
+# $Id: $
+
+"""
+Geneanet Import Tool
+Import into Gramps persons from Geneanet
+Core of the import, without GTK so that it also runs as a script on
+machines without display, GeneanetForGramps being the Gramps tool window
+"""
+#-------------------------------------------------------------------------
+#
+# Used Python Modules
+#
+#-------------------------------------------------------------------------
+import os
+import time
+import io
+import sys
+import re
+import random
+import collections
+import heapq
+import contextlib
+import sqlite3
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, Future
+from lxml import html, etree
+import argparse
+import functools
+import uuid
+import json
+import csv
+import email.utils
+import unicodedata
+import hashlib
+
+from gramps.gen.const import GRAMPS_LOCALE as glocale
+try:
+    _trans = glocale.get_addon_translator(__file__)
+except ValueError:
+    _trans = glocale.translation
+_ = _trans.gettext
+
+#------------------------------------------------------------------------
+#
+# Gramps modules
+#
+#------------------------------------------------------------------------
+import logging
+from gramps.gen.config import config
+from gramps.gen.db import DbTxn
+from gramps.gen.dbstate import DbState
+from gramps.cli.grampscli import CLIManager
+from gramps.gen.lib import Person, Name, Surname, NameType, Event, EventType, \
+Date, Place, EventRoleType, EventRef, PlaceName, Family, ChildRef, FamilyRelType, \
+Tag, Url, UrlType, Attribute
+from gramps.gen.const import HOME_DIR
+
+LOG = logging.getLogger("GeneanetForGramps")
+
+# Only created when something is logged
+handler = logging.FileHandler('info.log', delay=True)
+LOG.addHandler(handler)
+
+TIMEOUT = 5
+# Timeout in seconds of a single HTTP request to Geneanet
+HTTP_TIMEOUT = 30
+# Retries of a failed request, first and longest delay in seconds
+# between them
+RETRIES = 4
+BACKOFF = 2.0
+BACKOFF_MAX = 300
+# HTTP status worth retrying, the first ones meaning we are throttled
+RETRY_STATUS = [429, 503, 500, 502, 504]
+THROTTLE_STATUS = [429, 503]
+# Consecutive failures pausing the requests to a host, for how long in
+# seconds, and how much slower the politeness rate may get
+BREAKER_FAILURES = 5
+BREAKER_PAUSE = 120
+SLOWDOWN_MAX = 16
+# Login page of Geneanet
+LOGIN_URL = "https://www.geneanet.org/connexion/"
+# Gramps attribute keeping the hash of the Geneanet page last imported
+HASH_ATTR = "Geneanet hash"
+
+# https://edmundmartin.com
+DESKTOP_AGENTS = ['Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
+         'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
+         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
+         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_1) AppleWebKit/602.2.14 (KHTML, like Gecko) Version/10.0.1 Safari/602.2.14',
+         'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.71 Safari/537.36',
+         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.98 Safari/537.36',
+         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.98 Safari/537.36',
+         'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.71 Safari/537.36',
+         'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
+         'Mozilla/5.0 (Windows NT 10.0; WOW64; rv:50.0) Gecko/20100101 Firefox/50.0']
+
+# TODO: Is it useful ?
+LANGUAGES = {
+    'cs' : 'Czech', 'da' : 'Danish','nl' : 'Dutch',
+    'en' : 'English','eo' : 'Esperanto', 'fi' : 'Finnish',
+    'fr' : 'French', 'de' : 'German', 'hu' : 'Hungarian',
+    'it' : 'Italian', 'lt' : 'Latvian', 'lv' : 'Lithuanian',
+    'no' : 'Norwegian', 'po' : 'Polish', 'pt' : 'Portuguese',
+    'ro' : 'Romanian', 'sk' : 'Slovak', 'es' : 'Spanish',
+    'sv' : 'Swedish', 'ru' : 'Russian',
+    }
+
+# Global variables
+db = None
+gname = None
+verbosity = 0
+force = False
+ascendants = False
+descendants = False
+spouses = False
+LEVEL = 2
+ROOTURL = 'https://gw.geneanet.org/'
+PROFIL = None
+GUIMODE = False
+progress = None
+# Page cache: mode is one of CACHE_MODES, ttl in days, size in MB
+CACHE_MODE = 'normal'
+CACHE_TTL = 7
+CACHE_SIZE = 100
+cache = None
+# Geneanet account, never stored for privacy reasons
+USER = None
+PASSWORD = None
+fetcher = None
+# Politeness: pages per minute and parallel requests for a same tree owner
+# and total number of fetching threads
+RATE = 12
+CONCURRENCY = 1
+WORKERS = 4
+scheduler = None
+# Exploration order of the family tree: one of ORDERS
+ORDER = 'bfs'
+frontier = None
+# State of the import saved every STATE_EVERY seconds to resume it
+STATE_EVERY = 30
+crawlstate = None
+# Identity map of the GPersons already processed, by canonical URL
+persons = {}
+# Index of the Gramps persons by name, and file where to keep it
+pindex = None
+INDEX_FILE = None
+# Index of the Gramps families by couple
+findex = None
+# Index of the Gramps places by name and how names are compared
+plindex = None
+PLACE_MATCH = 'case'
+
+PLACE_MATCHES = {
+    'exact' : _("Exact name"),
+    'case' : _("Ignore case"),
+    'accents' : _("Ignore case and accents"),
+    }
+# Tags resolved or created during the run
+tags = None
+# Number of imported objects per Gramps transaction (0 for the whole import)
+COMMIT_EVERY = 100
+writer = None
+# Number of imported persons between two refreshes of the Gramps views
+# (0 to refresh only at the end of the import)
+CHECKPOINT = 0
+session = None
+# Crawl the whole subtree from Geneanet before writing anything into Gramps
+TWO_PHASE = False
+graph = None
+# Only compute what the import would do, without writing into Gramps
+DRY_RUN = False
+plan = None
+# File where to write the plan as JSON (- for the standard output)
+PLAN_FILE = None
+# File where to write the timings of the import as JSON (- for the standard output)
+TIMINGS_FILE = None
+# Import of several subtrees, and file where to write its results as
+# JSON (- for the standard output)
+batch = None
+BATCH_REPORT = None
+# File where to write a profile of the import, with the number of
+# functions and allocations summarized and whether to trace allocations
+PROFILE = None
+PROFILE_TOP = 25
+PROFILE_MEMORY = False
+
+ORDERS = {
+    'bfs' : _("Breadth first"),
+    'dfs' : _("Depth first"),
+    'priority' : _("Closest generations first"),
+    }
+
+CACHE_MODES = {
+    'normal' : _("Use cache"),
+    'only' : _("Cache only"),
+    'refresh' : _("Refresh cache"),
+    'bypass' : _("Bypass cache"),
+    }
+
+CONFIG_NAME = "geneanetforgramps"
+CACHE_DIR = os.path.join(HOME_DIR, CONFIG_NAME, "cache")
+STATE_FILE = os.path.join(HOME_DIR, CONFIG_NAME, "resume.json")
+CONFIG = config.register_manager(CONFIG_NAME)
+CONFIG.register("pref.ascendants", ascendants)
+CONFIG.register("pref.descendants", descendants)
+CONFIG.register("pref.spouses", spouses)
+CONFIG.register("pref.level", LEVEL)
+CONFIG.register("pref.force", force)
+CONFIG.register("pref.verbosity", verbosity)
+CONFIG.register("pref.cache_mode", CACHE_MODE)
+CONFIG.register("pref.cache_ttl", CACHE_TTL)
+CONFIG.register("pref.cache_size", CACHE_SIZE)
+CONFIG.register("pref.rate", RATE)
+CONFIG.register("pref.concurrency", CONCURRENCY)
+CONFIG.register("pref.workers", WORKERS)
+CONFIG.register("pref.order", ORDER)
+CONFIG.register("pref.place_match", PLACE_MATCH)
+CONFIG.register("pref.commit_every", COMMIT_EVERY)
+CONFIG.register("pref.checkpoint", CHECKPOINT)
+CONFIG.register("pref.two_phase", TWO_PHASE)
+CONFIG.register("pref.dry_run", DRY_RUN)
+CONFIG.register("pref.plan_file", "")
+# Not in the tool window, set in the configuration file when asked to
+CONFIG.register("pref.profile", "")
+CONFIG.register("pref.profile_memory", PROFILE_MEMORY)
+CONFIG.load()
+
+def save_config():
+    CONFIG.set("pref.ascendants", ascendants)
+    CONFIG.set("pref.descendants", descendants)
+    CONFIG.set("pref.spouses", spouses)
+    CONFIG.set("pref.level", LEVEL)
+    CONFIG.set("pref.force", force)
+    CONFIG.set("pref.verbosity", verbosity)
+    CONFIG.set("pref.cache_mode", CACHE_MODE)
+    CONFIG.set("pref.cache_ttl", CACHE_TTL)
+    CONFIG.set("pref.cache_size", CACHE_SIZE)
+    CONFIG.set("pref.rate", RATE)
+    CONFIG.set("pref.concurrency", CONCURRENCY)
+    CONFIG.set("pref.workers", WORKERS)
+    CONFIG.set("pref.order", ORDER)
+    CONFIG.set("pref.place_match", PLACE_MATCH)
+    CONFIG.set("pref.commit_every", COMMIT_EVERY)
+    CONFIG.set("pref.checkpoint", CHECKPOINT)
+    CONFIG.set("pref.two_phase", TWO_PHASE)
+    CONFIG.set("pref.dry_run", DRY_RUN)
+    CONFIG.set("pref.plan_file", PLAN_FILE or "")
+    CONFIG.save()
+
+# Generic functions
+
+def normalize_url(purl):
+    '''
+    Normalize a Geneanet URL so that the same page always gives the same key
+    (lower case scheme and host, sorted query parameters, no fragment)
+    '''
+    u = urllib.parse.urlsplit(purl.strip())
+    query = sorted(urllib.parse.parse_qsl(u.query))
+    scheme = u.scheme.lower()
+    if not scheme:
+        scheme = 'https'
+    return(urllib.parse.urlunsplit((scheme, u.netloc.lower(), u.path, urllib.parse.urlencode(query), '')))
+
+def canonical_url(purl):
+    '''
+    Return the canonical form of the Geneanet URL of a person, used as its
+    identity: only the tree owner and the parameters identifying the person
+    (first name, last name, occurrence or index) are kept, lower cased, so
+    that all the links to the same person give the same string
+    '''
+    if not purl:
+        return(purl)
+    u = urllib.parse.urlsplit(purl.strip())
+    params = dict(urllib.parse.parse_qsl(u.query))
+    ident = []
+    for k in ['i', 'n', 'oc', 'p']:
+        v = params.get(k, '').strip().lower()
+        # occurrence 0 is the default one
+        if v and not (k == 'oc' and v == '0'):
+            ident.append((k, v))
+    if not ident:
+        return(normalize_url(purl))
+    return(urllib.parse.urlunsplit(('https', u.netloc.lower(), u.path.lower(), urllib.parse.urlencode(ident), '')))
+
+def host_key(purl):
+    '''
+    Return the politeness key of a Geneanet URL: the host and the tree owner
+    e.g. gw.geneanet.org/agnesy
+    '''
+    u = urllib.parse.urlsplit(purl.strip())
+    owner = u.path.strip('/').split('/')[0]
+    return(u.netloc.lower()+'/'+owner)
+
+def retry_after(value):
+    '''
+    Return the number of seconds of a Retry-After HTTP header, given as
+    seconds or as a date, or None
+    '''
+    if not value:
+        return(None)
+    try:
+        return(max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return(None)
+    return(max(0.0, when.timestamp() - time.time()))
+
+def format_year(date):
+    """
+    Remove potential empty month/day coming from Gramps (00)
+    """
+    if not date:
+        return(date)
+    if (date[-6:] == "-00-00"):
+        return(date[0:-6])
+    else:
+        return(date)
+
+def format_iso(date_tuple):
+    """
+    Format an iso date.
+    """
+    year, month, day = date_tuple
+    if year == None or year == 0:
+       iso_date = ''
+    elif month == None or month == 0:
+       iso_date = str(year)
+    # Format with a leading 0 if needed
+    elif day == None or day == 0:
+        iso_date = '%s-%s' % (year, str(month).zfill(2))
+    else:
+        iso_date = '%s-%s-%s' % (year, str(month).zfill(2), str(day).zfill(2))
+    return iso_date
+
+def format_noniso(date_tuple):
+    """
+    Format an non-iso tuple into an iso date
+    """
+    day, month, year = date_tuple
+    return(format_iso((year, month, day)))
+
+def gramps_date(event):
+    '''
+    Give back the date of a Gramps event as a string ISO formated
+    prefixed by its modifier if any, the same as the GDate of a
+    Geneanet date
+    '''
+    date = event.get_date_object()
+    if verbosity >= 4:
+        print(_("Found date: "),date.get_ymd())
+    modifier = ''
+    for m in GDate.MODIFIERS:
+        if GDate.MODIFIERS[m] == date.get_modifier():
+            modifier = m
+    calendar = 'gregorian'
+    for c in GDate.CALENDARS:
+        if GDate.CALENDARS[c] == date.get_calendar():
+            calendar = c
+    ymd2 = None
+    if modifier in ['between', 'from']:
+        ymd2 = date.get_stop_ymd()
+    ret = GDate(modifier, date.get_ymd(), ymd2, calendar)
+    if verbosity >= 3:
+        print(_("Returned date: ")+ret)
+    return(ret)
+
+def split_name(person):
+    '''
+    Return the (lastname, firstname) of a Gramps person
+    '''
+    try:
+        name = person.primary_name.get_name().split(', ')
+    except:
+        return(None)
+    if len(name) == 0:
+        return(None)
+    elif len(name) == 1:
+        name.append(None)
+    lastname = name[0] if name[0] else ""
+    firstname = name[1] if name[1] else ""
+    return((lastname, firstname))
+
+# Month names as written by Geneanet, by language of the pages
+MONTHS = {
+    'cs' : ['ledna', 'února', 'března', 'dubna', 'května', 'června', 'července', 'srpna', 'září', 'října', 'listopadu', 'prosince'],
+    'da' : ['januar', 'februar', 'marts', 'april', 'maj', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'december'],
+    'nl' : ['januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli', 'augustus', 'september', 'oktober', 'november', 'december'],
+    'en' : ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october', 'november', 'december'],
+    'eo' : ['januaro', 'februaro', 'marto', 'aprilo', 'majo', 'junio', 'julio', 'aŭgusto', 'septembro', 'oktobro', 'novembro', 'decembro'],
+    'fi' : ['tammikuuta', 'helmikuuta', 'maaliskuuta', 'huhtikuuta', 'toukokuuta', 'kesäkuuta', 'heinäkuuta', 'elokuuta', 'syyskuuta', 'lokakuuta', 'marraskuuta', 'joulukuuta'],
+    'fr' : ['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet', 'août', 'septembre', 'octobre', 'novembre', 'décembre'],
+    'de' : ['januar', 'februar', 'märz', 'april', 'mai', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'dezember'],
+    'hu' : ['január', 'február', 'március', 'április', 'május', 'június', 'július', 'augusztus', 'szeptember', 'október', 'november', 'december'],
+    'it' : ['gennaio', 'febbraio', 'marzo', 'aprile', 'maggio', 'giugno', 'luglio', 'agosto', 'settembre', 'ottobre', 'novembre', 'dicembre'],
+    'lt' : ['sausio', 'vasario', 'kovo', 'balandžio', 'gegužės', 'birželio', 'liepos', 'rugpjūčio', 'rugsėjo', 'spalio', 'lapkričio', 'gruodžio'],
+    'lv' : ['janvāris', 'februāris', 'marts', 'aprīlis', 'maijs', 'jūnijs', 'jūlijs', 'augusts', 'septembris', 'oktobris', 'novembris', 'decembris'],
+    'no' : ['januar', 'februar', 'mars', 'april', 'mai', 'juni', 'juli', 'august', 'september', 'oktober', 'november', 'desember'],
+    'po' : ['stycznia', 'lutego', 'marca', 'kwietnia', 'maja', 'czerwca', 'lipca', 'sierpnia', 'września', 'października', 'listopada', 'grudnia'],
+    'pt' : ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro'],
+    'ro' : ['ianuarie', 'februarie', 'martie', 'aprilie', 'mai', 'iunie', 'iulie', 'august', 'septembrie', 'octombrie', 'noiembrie', 'decembrie'],
+    'sk' : ['januára', 'februára', 'marca', 'apríla', 'mája', 'júna', 'júla', 'augusta', 'septembra', 'októbra', 'novembra', 'decembra'],
+    'es' : ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'],
+    'sv' : ['januari', 'februari', 'mars', 'april', 'maj', 'juni', 'juli', 'augusti', 'september', 'oktober', 'november', 'december'],
+    'ru' : ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня', 'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'],
+    }
+ALLMONTHS = {}
+for months in MONTHS.values():
+    for i in range(12):
+        ALLMONTHS[months[i]] = i + 1
+# Months of the french republican calendar, the 13th being the
+# complementary days
+REPUBLICAN = ['vendémiaire', 'brumaire', 'frimaire', 'nivôse', 'pluviôse', 'ventôse',
+              'germinal', 'floréal', 'prairial', 'messidor', 'thermidor', 'fructidor',
+              'complémentaires']
+# Words qualifying a date, by language of the pages
+# None marks the words to skip
+QUALIFIERS = {
+    'en' : {'about': 'about', 'abt': 'about', 'circa': 'about', 'ca': 'about',
+            'before': 'before', 'after': 'after', 'between': 'between', 'and': 'and',
+            'from': 'from', 'to': 'to', 'in': 'in', 'on': None, 'the': None},
+    'fr' : {'vers': 'about', 'environ': 'about', 'ca': 'about',
+            'avant': 'before', 'après': 'after', 'entre': 'between', 'et': 'and',
+            'de': 'from', 'du': 'from', 'à': 'to', 'au': 'to', 'en': 'in', 'le': None},
+    'de' : {'um': 'about', 'etwa': 'about', 'ca': 'about',
+            'vor': 'before', 'nach': 'after', 'zwischen': 'between', 'und': 'and',
+            'von': 'from', 'bis': 'to', 'im': 'in', 'in': 'in', 'am': None},
+    'es' : {'hacia': 'about', 'cerca': 'about', 'antes': 'before', 'después': 'after',
+            'entre': 'between', 'y': 'and', 'desde': 'from', 'hasta': 'to', 'en': 'in',
+            'de': None, 'del': None, 'el': None},
+    'it' : {'verso': 'about', 'circa': 'about', 'prima': 'before', 'dopo': 'after',
+            'tra': 'between', 'fra': 'between', 'e': 'and', 'dal': 'from', 'al': 'to',
+            'nel': 'in', 'il': None, 'del': None},
+    'nl' : {'rond': 'about', 'omstreeks': 'about', 'ca': 'about', 'voor': 'before',
+            'na': 'after', 'tussen': 'between', 'en': 'and', 'van': 'from', 'tot': 'to',
+            'in': 'in', 'op': None},
+    }
+CALENDARS = {
+    'julian': 'julian', '(julian)': 'julian', 'julien': 'julian', '(julien)': 'julian', '(j)': 'julian',
+    }
+
+class GDate(str):
+    '''
+    Date read from Geneanet
+    As a string, it is the ISO form, prefixed by its modifier, used to
+    compare dates with the Gramps ones (see gramps_date)
+    Its attributes keep the structure applied to Gramps by apply()
+    '''
+    MODIFIERS = {'': Date.MOD_NONE, 'about': Date.MOD_ABOUT, 'before': Date.MOD_BEFORE,
+                 'after': Date.MOD_AFTER, 'between': Date.MOD_RANGE, 'from': Date.MOD_SPAN}
+    CALENDARS = {'gregorian': Date.CAL_GREGORIAN, 'julian': Date.CAL_JULIAN, 'french': Date.CAL_FRENCH}
+
+    def __new__(cls, modifier, ymd, ymd2=None, calendar='gregorian'):
+        if modifier in ['about', 'before', 'after']:
+            text = _(modifier)+" "+format_iso(ymd)
+        elif modifier == 'between':
+            text = _("between")+" "+format_iso(ymd)+" "+_("and")+" "+format_iso(ymd2)
+        elif modifier == 'from':
+            text = _("from")+" "+format_iso(ymd)+" "+_("to")+" "+format_iso(ymd2)
+        else:
+            text = format_iso(ymd)
+        if calendar != 'gregorian':
+            text = text+" ("+calendar+")"
+        self = str.__new__(cls, text)
+        self.modifier = modifier
+        self.ymd = ymd
+        self.ymd2 = ymd2
+        self.calendar = calendar
+        return(self)
+
+    def apply(self, date):
+        '''
+        Set the Gramps Date date to this date
+        '''
+        year, month, day = self.ymd
+        value = (day, month, year, False)
+        if self.ymd2:
+            year, month, day = self.ymd2
+            value = value + (day, month, year, False)
+        date.set(quality=Date.QUAL_NONE, modifier=self.MODIFIERS[self.modifier],
+                 calendar=self.CALENDARS[self.calendar], value=value)
+
+def roman(word):
+    '''
+    Return the value of the roman number word or 0
+    '''
+    values = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100}
+    total = 0
+    for i in range(len(word)):
+        v = values.get(word[i])
+        if v is None:
+            return(0)
+        if i + 1 < len(word) and values.get(word[i+1], 0) > v:
+            total = total - v
+        else:
+            total = total + v
+    return(total)
+
+def qualifiers(lang):
+    '''
+    Return the qualifying words of the pages in lang, with the english
+    and french ones and the ones of the Gramps language as fallback
+    '''
+    words = {_("about"): 'about', _("before"): 'before', _("after"): 'after', _("in"): 'in'}
+    for l in ['fr', 'en', lang]:
+        words.update(QUALIFIERS.get(l, {}))
+    return(words)
+
+def parse_ymd(tokens, months):
+    '''
+    Return the (year, month, day) and calendar of a date written as tokens
+    '''
+    year = month = day = 0
+    calendar = 'gregorian'
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+        if t in REPUBLICAN:
+            month = REPUBLICAN.index(t) + 1
+            calendar = 'french'
+        elif t in months:
+            month = months[t]
+        elif t == 'an' and i + 1 < len(tokens):
+            # Year of the french republic, an XI or an 11
+            i = i + 1
+            year = roman(tokens[i]) or int('0'+''.join([c for c in tokens[i] if c.isdigit()]))
+            calendar = 'french'
+        elif t in CALENDARS:
+            calendar = CALENDARS[t]
+        elif t[0].isdigit():
+            # 1er, 3., 1850/1851 ...
+            digits = re.match(r'\d+', t).group(0)
+            if month or year or len(digits) > 2 or int(digits) > 31 or day:
+                if not year:
+                    year = int(digits[0:4])
+            else:
+                day = int(digits)
+        i = i + 1
+    if day and not month and not year:
+        year = day
+        day = 0
+    return((year, month, day), calendar)
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(text, lang=None):
+    '''
+    Parse a Geneanet date (without the event word, e.g. 'le 1er mars 1850'
+    or 'between 1850 and 1860') written in lang into a GDate, or None
+    Month names of all the languages are recognized
+    '''
+    if verbosity >= 3:
+        print(_("date received:"), text)
+    words = qualifiers(lang)
+    tokens = []
+    for t in text.lower().replace(',', ' ').split():
+        if t in words and words[t] is None:
+            continue
+        tokens.append(t)
+    if not tokens:
+        return(None)
+    modifier = ''
+    kind = words.get(tokens[0])
+    if kind in ['about', 'before', 'after', 'in']:
+        if kind != 'in':
+            modifier = kind
+        tokens = tokens[1:]
+    elif kind == 'to':
+        modifier = 'before'
+        tokens = tokens[1:]
+    elif kind in ['between', 'from']:
+        end = 'and' if kind == 'between' else 'to'
+        rest = tokens[1:]
+        for i in range(len(rest)):
+            if words.get(rest[i]) == end:
+                ymd, calendar = parse_ymd(rest[:i], ALLMONTHS)
+                ymd2, calendar2 = parse_ymd(rest[i+1:], ALLMONTHS)
+                if not ymd[0] or not ymd2[0]:
+                    break
+                return(GDate(kind, ymd, ymd2, calendar))
+        # from without to
+        modifier = 'after'
+        tokens = rest
+    ymd, calendar = parse_ymd(tokens, ALLMONTHS)
+    if not ymd[0]:
+        return(None)
+    return(GDate(modifier, ymd, None, calendar))
+
+@functools.lru_cache(maxsize=4096)
+def date_from_string(text):
+    '''
+    Return the GDate of a date string made by GDate or gramps_date,
+    e.g. when read back from a saved graph, or None
+    '''
+    if isinstance(text, GDate):
+        return(text)
+    tokens = text.split()
+    if not tokens:
+        return(None)
+    calendar = 'gregorian'
+    if tokens[-1][0] == '(' and tokens[-1][1:-1] in GDate.CALENDARS:
+        calendar = tokens[-1][1:-1]
+        tokens = tokens[:-1]
+    isos = [tuple([int(x) for x in (t.split('-') + ['0', '0'])[0:3]]) for t in tokens if t[0].isdigit()]
+    if not isos:
+        return(None)
+    modifier = ''
+    for m in ['about', 'before', 'after', 'between', 'from']:
+        if tokens[0] == _(m):
+            modifier = m
+    ymd2 = None
+    if modifier in ['between', 'from'] and len(isos) > 1:
+        ymd2 = isos[1]
+    elif modifier in ['between', 'from']:
+        modifier = ''
+    return(GDate(modifier, isos[0], ymd2, calendar))
+
+def convert_date(datetab):
+    ''' Convert the Geneanet date format for birth/death/married lines
+    into an ISO date format, see parse_date
+    '''
+    if verbosity >= 3:
+        print(_("datetab received:"),datetab)
+    return(parse_date(' '.join(datetab)))
+
+class GTimings:
+    '''
+    Time spent in each phase of an import (fetch, sleep, parse, Gramps
+    lookups and commits...) and counters of notable events
+    Each phase keeps its number of calls, total and maximum time and a
+    histogram of the call durations; phases include the ones they call
+    Phases may be recorded from the fetching threads
+    '''
+    # Upper bounds in seconds of the histogram buckets, the last bucket
+    # holding the longer calls
+    BOUNDS = [0.001, 0.01, 0.1, 1.0]
+    LABELS = ['<1ms', '<10ms', '<100ms', '<1s', '>=1s']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.start = time.perf_counter()
+        # [calls, total, max, histogram] by phase name
+        self.phases = {}
+        self.counters = {}
+
+    def add(self, name, seconds):
+        '''
+        Record a call of seconds to the phase name
+        '''
+        bucket = len(self.BOUNDS)
+        for i, bound in enumerate(self.BOUNDS):
+            if seconds < bound:
+                bucket = i
+                break
+        with self.lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = [0, 0.0, 0.0, [0] * len(self.LABELS)]
+                self.phases[name] = phase
+            phase[0] = phase[0] + 1
+            phase[1] = phase[1] + seconds
+            phase[2] = max(phase[2], seconds)
+            phase[3][bucket] = phase[3][bucket] + 1
+
+    def count(self, name, number=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + number
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''
+        Record the time spent in the with block as a call to the phase name
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        with self.lock:
+            phases = {}
+            for name, (calls, total, longest, histogram) in self.phases.items():
+                phases[name] = {'calls': calls, 'total': total,
+                    'mean': total / calls, 'max': longest,
+                    'histogram': dict(zip(self.LABELS, histogram))}
+            return({'elapsed': time.perf_counter() - self.start,
+                'phases': phases, 'counters': dict(self.counters)})
+
+    def save(self, path):
+        '''
+        Write the timings as JSON into path, or on the standard output for -
+        '''
+        data = self.to_dict()
+        if path == '-':
+            json.dump(data, sys.stdout, indent=1)
+            print()
+            return
+        with open(path, 'w', encoding='utf-8') as fd:
+            json.dump(data, fd, indent=1)
+
+    def report(self):
+        '''
+        Print the summary table of the phases, longest first
+        '''
+        data = self.to_dict()
+        print(_("Import done in %.1f s")%(data['elapsed']))
+        print("%-22s %8s %10s %10s %10s  %s"%(_("Phase"), _("Calls"), _("Total s"), _("Mean ms"), _("Max ms"), ' '.join(["%7s"%(l) for l in self.LABELS])))
+        for name, phase in sorted(data['phases'].items(), key=lambda item: -item[1]['total']):
+            print("%-22s %8d %10.2f %10.2f %10.2f  %s"%(name, phase['calls'], phase['total'], 1000 * phase['mean'], 1000 * phase['max'], ' '.join(["%7d"%(phase['histogram'][l]) for l in self.LABELS])))
+        for name, number in sorted(data['counters'].items()):
+            print("%-22s %8d"%(name, number))
+
+timings = GTimings()
+
+def timed(name):
+    '''
+    Decorator recording each call of the function as a call to the phase
+    name of the timings
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return(func(*args, **kwargs))
+            finally:
+                timings.add(name, time.perf_counter() - start)
+        return(wrapper)
+    return(decorator)
+
+def report_timings():
+    '''
+    Print the timings of the import and save them when asked to
+    '''
+    if verbosity >= 1:
+        timings.report()
+    if TIMINGS_FILE:
+        timings.save(TIMINGS_FILE)
+
+class GProfiler:
+    '''
+    Profile of an import, to attach to a ticket when an import is slow:
+    the cProfile statistics of the main thread, written into path, and a
+    summary into path.txt with the top functions, the time spent waiting
+    for Geneanet and Gramps (fetches run in other threads, so they come
+    from the timings) and, with memory, the top allocations whose
+    snapshot is written into path.heap
+    '''
+    def __init__(self, path, top=PROFILE_TOP, memory=PROFILE_MEMORY):
+        import cProfile
+
+        self.path = path
+        self.top = top
+        self.memory = memory
+        self.profile = cProfile.Profile()
+        self.snapshot = None
+
+    def start(self):
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start(5)
+            self.snapshot = tracemalloc.take_snapshot()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        import pstats
+
+        self.profile.dump_stats(self.path)
+        with open(self.path+'.txt', 'w', encoding='utf-8') as fd:
+            fd.write(_("Top %d functions by cumulative time")%(self.top)+"\n")
+            stats = pstats.Stats(self.profile, stream=fd)
+            stats.sort_stats('cumulative').print_stats(self.top)
+            fd.write(_("Top %d functions by internal time")%(self.top)+"\n")
+            stats.sort_stats('tottime').print_stats(self.top)
+            fd.write(_("Waiting time")+"\n")
+            phases = timings.to_dict()['phases']
+            for kind, names in [(_("network"), ['fetch', 'sleep', 'wait']),
+                    (_("database"), ['find_grampsp', 'find_grampsf', 'commit', 'transaction'])]:
+                for name in names:
+                    if name in phases:
+                        fd.write("%-10s %-22s %8d %10.2f s\n"%(kind, name, phases[name]['calls'], phases[name]['total']))
+            if self.memory:
+                self.write_memory(fd)
+        print(_("Profile written into %s and %s")%(self.path, self.path+'.txt'))
+
+    def write_memory(self, fd):
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot.dump(self.path+'.heap')
+        fd.write(_("Memory: %.1f MB allocated, %.1f MB at peak")%(current / 1048576, peak / 1048576)+"\n")
+        fd.write(_("Top %d allocations since the start")%(self.top)+"\n")
+        for stat in snapshot.compare_to(self.snapshot, 'lineno')[:self.top]:
+            fd.write("%s\n"%(stat))
+
+def profiled(func, *args):
+    '''
+    Run func(*args), under the profiler when PROFILE gives its file
+    '''
+    if not PROFILE:
+        return(func(*args))
+    profiler = GProfiler(PROFILE, PROFILE_TOP, PROFILE_MEMORY)
+    profiler.start()
+    try:
+        return(func(*args))
+    finally:
+        profiler.stop()
+
+class GPageParser:
+    '''
+    Extraction of the data of a Geneanet person page into a plain record
+    with the attributes of GPerson.RECORD, without network nor Gramps
+    The XPath expressions are compiled once, the translated labels being
+    passed as variables, and each section of the page is walked once
+    Used example from https://gist.github.com/IanHopkinson/ad45831a2fb73f537a79
+    and doc from https://www.w3schools.com/xml/xpath_axes.asp
+    '''
+    # To increase whenever the records extracted change, so that the
+    # records cached by an older version are parsed again
+    VERSION = 2
+    # Parts of the pages changing on each request without being data
+    DYNAMIC = re.compile(rb'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<noscript\b.*?</noscript\s*>|<!--.*?-->|<input\b[^>]*>', re.S | re.I)
+    SPACES = re.compile(rb'\s+')
+
+    def __init__(self):
+        self.xtitle = etree.XPath('//title/text()', smart_strings=False)
+        self.xsex = etree.XPath('//div[@id="person-title"]//img/attribute::alt', smart_strings=False)
+        self.xname = etree.XPath('//div[@id="person-title"]//a/text()', smart_strings=False)
+        self.xevent = etree.XPath('//li[contains(., $label)]/text()', smart_strings=False)
+        # sometime parents are using circle, sometimes disc !
+        # The parents are the list right after their heading, the children
+        # in the unions using the same style
+        self.xparents = etree.XPath('//ul[not(ancestor-or-self::ul[@class="fiche_union"])][preceding-sibling::*[1][self::h2]]/li[@style="vertical-align:middle;list-style-type:disc" or @style="vertical-align:middle;list-style-type:circle"]')
+        self.xunions = etree.XPath('//ul[@class="fiche_union"]/li')
+        self.xanchors = etree.XPath('a')
+        self.xmarriage = etree.XPath('em/text()', smart_strings=False)
+        self.xchildren = etree.XPath('ul/li')
+
+    @staticmethod
+    def ref(anchors):
+        '''
+        Return the link of the first anchor which is not a sosa image
+        or None
+        '''
+        for a in anchors:
+            if a.find('img') is None:
+                href = a.get('href')
+                if href:
+                    return(href)
+        return(None)
+
+    @staticmethod
+    def date(line, lang):
+        '''
+        Return the GDate of a birth/death/married line or None
+        '''
+        return(parse_date(' '.join(line.split()[1:]), lang))
+
+    @staticmethod
+    def code(code, nomatch):
+        '''
+        Return code if it looks like a postal code, nomatch otherwise
+        '''
+        if not re.search(r'\d\d\d\d\d', code):
+            return(nomatch)
+        return(code)
+
+    def event(self, rec, attr, lines, nomatch, lang):
+        '''
+        Fill the date, place and place code of attr (birth or death) in rec
+        from the lines of the page mentioning it
+        '''
+        rec['g_'+attr+'date'] = None
+        rec['g_'+attr+'place'] = None
+        rec['g_'+attr+'placecode'] = None
+        if not lines:
+            return
+        line = lines[0].split('-')
+        rec['g_'+attr+'date'] = self.date(line[0], lang)
+        where = ' '.join(line[1:]).split(',')
+        rec['g_'+attr+'place'] = where[0].strip().title()
+        if len(where) > 1:
+            rec['g_'+attr+'placecode'] = self.code(where[1].strip(), nomatch)
+
+    @classmethod
+    def digest(cls, content):
+        '''
+        Return the hash of the content of a page without its scripts,
+        styles, comments, form fields and spacing, so that a page giving
+        the same data has the same hash
+        '''
+        return(hashlib.sha1(cls.SPACES.sub(b' ', cls.DYNAMIC.sub(b'', content))).hexdigest())
+
+    @staticmethod
+    def record_hash(rec):
+        '''
+        Return the hash of the data of a record, whatever the URL it was
+        found at
+        '''
+        data = dict([(k, v) for k, v in rec.items() if k not in ('url', 'hash')])
+        return(hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest())
+
+    def parse(self, content, purl):
+        '''
+        Return the record of the person page content found at purl
+        Geneanet gives relative links, they are returned absolute
+        '''
+        tree = html.fromstring(content)
+        rec = {'url': purl}
+        lang = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(purl).query)).get('lang')
+        rec['title'] = self.xtitle(tree)
+
+        # Should return M or F, seems we have a french codification on the site
+        sex = self.xsex(tree)
+        rec['g_sex'] = 'U'
+        if sex:
+            rec['g_sex'] = 'M' if sex[0] == 'H' else sex[0]
+
+        name = self.xname(tree)
+        if len(name) >= 2:
+            rec['g_firstname'] = name[0].title()
+            rec['g_lastname'] = name[1].title()
+        else:
+            LOG.debug(str(name))
+            rec['g_firstname'] = str(uuid.uuid3(uuid.NAMESPACE_URL, purl))
+            rec['g_lastname'] = ""
+
+        self.event(rec, 'birth', self.xevent(tree, label=_("Born")), _("no match"), lang)
+        self.event(rec, 'death', self.xevent(tree, label=_("Deceased")), _("not match"), lang)
+
+        rec['spouseref'] = []
+        rec['marriagedate'] = []
+        rec['marriageplace'] = []
+        rec['marriageplacecode'] = []
+        rec['childref'] = []
+        for union in self.xunions(tree):
+            sref = self.ref(self.xanchors(union))
+            if sref:
+                rec['spouseref'].append(urllib.parse.urljoin(purl, sref))
+            date = None
+            place = None
+            code = None
+            marriage = self.xmarriage(union)
+            if marriage:
+                parts = marriage[0].split(',')
+                date = self.date(parts[0], lang)
+                if len(parts) > 1:
+                    place = parts[1][1:].title()
+                if len(parts) > 2:
+                    code = self.code(parts[2][1:], _("not match"))
+            rec['marriagedate'].append(date)
+            rec['marriageplace'].append(place)
+            rec['marriageplacecode'].append(code)
+            clist = []
+            for child in self.xchildren(union):
+                cref = self.ref(self.xanchors(child))
+                if cref:
+                    clist.append(urllib.parse.urljoin(purl, cref))
+            rec['childref'].append(clist)
+
+        prefl = []
+        for parent in self.xparents(tree):
+            pref = self.ref(self.xanchors(parent))
+            if pref:
+                prefl.append(urllib.parse.urljoin(purl, pref))
+            else:
+                prefl.append("")
+        rec['fref'] = prefl[0] if len(prefl) > 0 else ""
+        rec['mref'] = prefl[1] if len(prefl) > 1 else ""
+        return(rec)
+
+page_parser = GPageParser()
+
+class GPageCache:
+    '''
+    On-disk cache of Geneanet pages keyed by normalized URL
+    Kept between runs in a sqlite file, entries older than ttl days
+    are refetched and least recently used ones are evicted above size MB
+    The ETag and Last-Modified of the pages are kept for conditional
+    requests, and the records parsed from them to avoid parsing again
+    '''
+    def __init__(self, path, mode='normal', ttl=CACHE_TTL, size=CACHE_SIZE):
+        self.mode = mode
+        self.ttl = ttl * 86400
+        self.size = size * 1024 * 1024
+        self.conn = None
+        # The cache is used by the fetching threads of GScheduler
+        self.lock = threading.Lock()
+        if mode == 'bypass':
+            return
+        os.makedirs(path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(path, "pages.db"), check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, content BLOB, fetched REAL, accessed REAL, size INTEGER)')
+        # Caches made before the validators were kept
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(pages)')]
+        for column in ['etag', 'modified']:
+            if column not in columns:
+                self.conn.execute('ALTER TABLE pages ADD COLUMN %s TEXT' % column)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS records (url TEXT PRIMARY KEY, hash TEXT, record TEXT, version INTEGER)')
+        # Records cached before the parser version was kept
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(records)')]
+        if 'version' not in columns:
+            self.conn.execute('ALTER TABLE records ADD COLUMN version INTEGER')
+        self.conn.commit()
+        if verbosity >= 2:
+            print(_("Using page cache %s (mode %s)")%(path, mode))
+
+    def get(self, purl):
+        '''
+        Return the cached content of purl or None
+        In cache only mode, expired entries are still returned
+        '''
+        if not self.conn or self.mode == 'refresh':
+            return(None)
+        key = normalize_url(purl)
+        with self.lock:
+            row = self.conn.execute('SELECT content, fetched FROM pages WHERE url = ?', (key,)).fetchone()
+            if not row:
+                return(None)
+            content, fetched = row
+            now = time.time()
+            if self.mode != 'only' and now - fetched > self.ttl:
+                if verbosity >= 2:
+                    print(_("Page expired in cache:"), purl)
+                return(None)
+            self.conn.execute('UPDATE pages SET accessed = ? WHERE url = ?', (now, key))
+            self.conn.commit()
+        return(content)
+
+    def validators(self, purl):
+        '''
+        Return the (content, etag, modified) stored for purl, even expired,
+        to ask Geneanet whether it changed, or None
+        '''
+        if not self.conn:
+            return(None)
+        with self.lock:
+            row = self.conn.execute('SELECT content, etag, modified FROM pages WHERE url = ?', (normalize_url(purl),)).fetchone()
+        if not row or not (row[1] or row[2]):
+            return(None)
+        return(row)
+
+    def put(self, purl, content, etag=None, modified=None):
+        '''
+        Store content for purl and evict old pages if the cache is too big
+        '''
+        if not self.conn or self.mode == 'only' or not content:
+            return
+        key = normalize_url(purl)
+        now = time.time()
+        with self.lock:
+            self.conn.execute('REPLACE INTO pages (url, content, fetched, accessed, size, etag, modified) VALUES (?, ?, ?, ?, ?, ?, ?)', (key, content, now, now, len(content), etag, modified))
+            self.evict()
+            self.conn.commit()
+
+    def get_record(self, purl, phash):
+        '''
+        Return the record parsed from the page purl if its content hash
+        is still phash and it was parsed by the current parser, or None
+        '''
+        if not self.conn:
+            return(None)
+        with self.lock:
+            row = self.conn.execute('SELECT hash, record, version FROM records WHERE url = ?', (normalize_url(purl),)).fetchone()
+        if not row or row[0] != phash or row[2] != GPageParser.VERSION:
+            return(None)
+        return(json.loads(row[1]))
+
+    def put_record(self, purl, phash, record):
+        '''
+        Store the record parsed from the page purl of content hash phash
+        '''
+        if not self.conn:
+            return
+        with self.lock:
+            self.conn.execute('REPLACE INTO records (url, hash, record, version) VALUES (?, ?, ?, ?)', (normalize_url(purl), phash, json.dumps(record), GPageParser.VERSION))
+            self.conn.commit()
+
+    def evict(self):
+        '''
+        Remove least recently used pages until we are below the size cap
+        '''
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.size:
+            return
+        for key, size in self.conn.execute('SELECT url, size FROM pages ORDER BY accessed').fetchall():
+            if total <= self.size:
+                break
+            self.conn.execute('DELETE FROM pages WHERE url = ?', (key,))
+            self.conn.execute('DELETE FROM records WHERE url = ?', (key,))
+            total = total - size
+            if verbosity >= 3:
+                print(_("Evicting page from cache:"), key)
+
+    def close(self):
+        with self.lock:
+            if self.conn:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+class GBackoff:
+    '''
+    Retry policy of the requests to Geneanet: exponential backoff with
+    jitter, following Retry-After when the server gives it
+    Per host, a circuit breaker pauses all the requests after failures
+    consecutive failures, and the politeness interval is lengthened each
+    time the host throttles us, then shortened back as requests succeed
+    '''
+    def __init__(self, retries=RETRIES, delay=BACKOFF, failures=BREAKER_FAILURES, pause=BREAKER_PAUSE):
+        self.retries = retries
+        self.base = delay
+        self.failures = failures
+        self.pausetime = pause
+        self.lock = threading.Lock()
+        # Consecutive failures, end of the pause and politeness slowdown
+        # factor, by host
+        self.failed = {}
+        self.paused = {}
+        self.factor = {}
+
+    def delay(self, attempt, retry_after=None):
+        '''
+        Return the number of seconds to wait before the retry attempt,
+        randomized between half and one and a half of the backoff,
+        and never more than BACKOFF_MAX
+        '''
+        delay = min(BACKOFF_MAX, self.base * (2 ** attempt) * random.uniform(0.5, 1.5))
+        if retry_after:
+            delay = max(delay, min(retry_after, BACKOFF_MAX))
+        return(delay)
+
+    def pause(self, host):
+        '''
+        Return the number of seconds the requests to host stay paused
+        '''
+        with self.lock:
+            return(max(0.0, self.paused.get(host, 0) - time.time()))
+
+    def slowdown(self, host):
+        with self.lock:
+            return(self.factor.get(host, 1.0))
+
+    def success(self, host):
+        with self.lock:
+            self.failed[host] = 0
+            factor = self.factor.get(host, 1.0)
+            if factor > 1.0:
+                self.factor[host] = max(1.0, factor * 0.9)
+
+    def failure(self, host, throttled):
+        '''
+        Count a failed request to host, throttled when the host asked us
+        to slow down
+        '''
+        with self.lock:
+            self.failed[host] = self.failed.get(host, 0) + 1
+            if throttled:
+                self.factor[host] = min(SLOWDOWN_MAX, self.factor.get(host, 1.0) * 2)
+                timings.count('rate reductions')
+                if verbosity >= 1:
+                    print(_("WARNING: %s throttles the requests, slowing down %.1f times")%(host, self.factor[host]))
+            if self.failures and self.failed[host] >= self.failures:
+                # Once paused, a single request tells whether to pause again
+                self.failed[host] = self.failures - 1
+                self.paused[host] = time.time() + self.pausetime
+                timings.count('circuit breaker pauses')
+                print(_("WARNING: %d failed requests in a row to %s, pausing for %d s")%(self.failures, host, self.pausetime))
+
+class GFetcher:
+    '''
+    Fetch layer shared by the whole import
+    Holds one keep-alive HTTP session (and its login cookies)
+    and sends a single GET per page not found in the page cache,
+    retried as told by backoff when it fails
+    '''
+    def __init__(self, cache=None, user=None, password=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.cache = cache
+        self.user = user
+        self.password = password
+        self.logged = False
+        # The workers of GScheduler share the session and the counters
+        self.lock = threading.Lock()
+        self.login_lock = threading.Lock()
+        # Number of pages really requested to Geneanet
+        self.requests = 0
+        # Number of them answered as not modified
+        self.notmodified = 0
+        # Number of requests retried, and of pages given up
+        self.retries = 0
+        self.failures = 0
+        self.backoff = GBackoff(RETRIES, BACKOFF, BREAKER_FAILURES, BREAKER_PAUSE)
+        # Set to stop waiting before a retry when closing
+        self.stopping = threading.Event()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': random.choice(DESKTOP_AGENTS),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'})
+        if self.user and self.password:
+            self.login(self.user, self.password)
+
+    def login(self, user, password):
+        '''
+        Login and password set for geneanet servers
+        The cookies obtained stay in the session for the next requests
+        '''
+        r = self.session.get(LOGIN_URL, timeout=HTTP_TIMEOUT)
+        pos1 = r.text.find('name="_csrf_token" value="')
+        pos1 = pos1 + len('name="_csrf_token" value="')
+        pos2 = r.text.find('"', pos1)
+        csrf = r.text[pos1:pos2]
+        r = self.session.post(
+                 LOGIN_URL+"login_check"
+                ,data={
+                      "_username": user
+                     ,"_password": password
+                     ,"_submit": ""
+                     ,"_remember_me": "1"
+                     ,"_csrf_token": csrf
+                     }
+               ,allow_redirects=False
+               ,headers={'referer':LOGIN_URL,
+                         'authority':urllib.parse.urlsplit(LOGIN_URL).netloc}
+               ,timeout=HTTP_TIMEOUT
+             )
+        LOG.info(r.text)
+        self.user = user
+        self.password = password
+        self.logged = True
+
+    @timed('fetch')
+    def request(self, purl, headers=None):
+        '''
+        Send one GET for purl, following a redirection to the login page
+        by login in once and asking again. Return the response, whatever
+        its status, or None when a login is needed
+        '''
+        logged = self.logged
+        page = self.session.get(purl, allow_redirects=False, headers=headers, timeout=HTTP_TIMEOUT)
+        self.count('requests')
+        timings.count('pages requested')
+        if verbosity >= 3:
+            print(_("Return code:"), page.status_code)
+        if page.is_redirect:
+            location = urllib.parse.urljoin(purl, page.headers.get('Location', ''))
+            if 'connexion' in location and self.user and self.password and not logged:
+                LOG.debug('Need to log in')
+                with self.login_lock:
+                    # Unless another worker did it meanwhile
+                    if not self.logged:
+                        self.login(self.user, self.password)
+                location = purl
+            elif 'connexion' in location:
+                print(_("WARNING: Geneanet asks to log in for"), purl)
+                return(None)
+            page = self.session.get(location, headers=headers, timeout=HTTP_TIMEOUT)
+            self.count('requests')
+            timings.count('pages requested')
+        LOG.info('type %s' % page.headers.get('Content-Type'))
+        return(page)
+
+    def count(self, what):
+        '''
+        Increase the counter what (requests, retries...) by one
+        '''
+        with self.lock:
+            setattr(self, what, getattr(self, what) + 1)
+
+    def cached(self, purl):
+        '''
+        Return the content of the Geneanet page purl if in the cache, or None
+        '''
+        if not self.cache:
+            return(None)
+        content = self.cache.get(purl)
+        if content is not None:
+            timings.count('pages from cache')
+            if verbosity >= 2:
+                print(_("Page found in cache:"), purl)
+        return(content)
+
+    def download(self, purl):
+        '''
+        Download the Geneanet page purl, store it in the cache
+        and return its content or None
+        A page already in the cache is only asked if it was modified since
+        Politeness delays are handled by GScheduler, network errors and
+        the HTTP status of RETRY_STATUS are retried after a backoff delay
+        '''
+        if CACHE_MODE == 'only':
+            print(_("Page not in cache, skipping:"), purl)
+            return(None)
+        stored = None
+        headers = {}
+        if self.cache:
+            stored = self.cache.validators(purl)
+        if stored:
+            if stored[1]:
+                headers['If-None-Match'] = stored[1]
+            if stored[2]:
+                headers['If-Modified-Since'] = stored[2]
+        host = urllib.parse.urlsplit(purl).netloc.lower()
+        attempt = 0
+        while True:
+            pause = self.backoff.pause(host)
+            if pause > 0:
+                with timings.phase('paused'):
+                    if self.stopping.wait(pause):
+                        return(None)
+            delay = None
+            try:
+                page = self.request(purl, headers)
+            except Exception as e:
+                error = e
+                kind = 'network errors'
+            else:
+                if page is None:
+                    return(None)
+                if page.status_code not in RETRY_STATUS:
+                    break
+                error = page.status_code
+                kind = 'throttled' if page.status_code in THROTTLE_STATUS else 'server errors'
+                delay = retry_after(page.headers.get('Retry-After'))
+            timings.count(kind)
+            self.backoff.failure(host, kind == 'throttled')
+            if attempt >= self.backoff.retries:
+                print(_("[Requests]: We failed to reach the server at"), purl, error)
+                self.count('failures')
+                timings.count('pages failed')
+                return(None)
+            delay = self.backoff.delay(attempt, delay)
+            if verbosity >= 1:
+                print(_("Retrying %s in %.1f s after %s")%(purl, delay, error))
+            self.count('retries')
+            timings.count('retries')
+            with timings.phase('backoff'):
+                if self.stopping.wait(delay):
+                    return(None)
+            attempt = attempt + 1
+        self.backoff.success(host)
+        if not page.ok:
+            print(_("[Requests]: We failed to reach the server at"), purl, page.status_code)
+            self.count('failures')
+            timings.count('pages failed')
+            return(None)
+        etag = page.headers.get('ETag')
+        modified = page.headers.get('Last-Modified')
+        if page.status_code == 304 and stored:
+            if verbosity >= 2:
+                print(_("Page not modified:"), purl)
+            self.count('notmodified')
+            timings.count('pages not modified')
+            content = stored[0]
+            etag = etag or stored[1]
+            modified = modified or stored[2]
+        else:
+            content = page.content
+        if self.cache:
+            self.cache.put(purl, content, etag, modified)
+        return(content)
+
+    def get(self, purl):
+        '''
+        Return the content of the Geneanet page purl, from the cache
+        when possible, or None
+        '''
+        content = self.cached(purl)
+        if content is None:
+            content = self.download(purl)
+        return(content)
+
+    def close(self):
+        if verbosity >= 1:
+            print(_("%d pages requested to Geneanet (%d not modified, %d retries, %d failed)")%(self.requests, self.notmodified, self.retries, self.failures))
+        self.session.close()
+
+class GScheduler:
+    '''
+    Fetch pages in a pool of threads while the main thread parses them
+    and writes into Gramps
+    Requests to a same tree owner (see host_key) are limited to rate pages
+    per minute and concurrency parallel requests, different owners
+    proceed in parallel
+    '''
+    def __init__(self, fetcher, rate=RATE, concurrency=CONCURRENCY, workers=WORKERS):
+        self.fetcher = fetcher
+        self.interval = 60.0 / max(rate, 1)
+        self.concurrency = max(concurrency, 1)
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self.lock = threading.Lock()
+        # Also stops the fetcher waiting before a retry
+        self.stopping = fetcher.stopping
+        # Future of each page asked and not consumed yet, by normalized URL
+        self.futures = {}
+        # Normalized URLs of the pages consumed, not to prefetch them again
+        self.consumed = set()
+        # Per owner pages waiting for a slot, number of pages being
+        # fetched and time of the next allowed request
+        self.pending = {}
+        self.active = {}
+        self.next = {}
+
+    def submit(self, purl):
+        '''
+        Ask for the page purl in the background and return its Future
+        A page asked twice is only fetched once
+        The page only goes to a fetching thread when its owner has a free
+        slot, so that a burst of pages of one owner does not hold all
+        the threads while pages of other owners wait
+        '''
+        key = normalize_url(purl)
+        with self.lock:
+            future = self.futures.get(key)
+            if future is not None:
+                return(future)
+            future = Future()
+            self.futures[key] = future
+            owner = host_key(purl)
+            self.pending.setdefault(owner, collections.deque()).append((key, purl, future))
+            self.dispatch(owner)
+        return(future)
+
+    def dispatch(self, owner):
+        '''
+        Hand the pending pages of owner to the fetching threads while it
+        has free slots, called with the lock held
+        '''
+        pending = self.pending.get(owner)
+        while pending and self.active.get(owner, 0) < self.concurrency:
+            key, purl, future = pending.popleft()
+            self.active[owner] = self.active.get(owner, 0) + 1
+            self.executor.submit(self.run, owner, key, purl, future)
+        if not pending:
+            self.pending.pop(owner, None)
+
+    def run(self, owner, key, purl, future):
+        '''
+        Run in a fetching thread: fetch purl into future then free the
+        slot of owner for its next pending page
+        A failed page is forgotten so that it is asked again if needed
+        '''
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    content = self.fetch(purl)
+                except BaseException as e:
+                    content = None
+                    future.set_exception(e)
+                else:
+                    future.set_result(content)
+                if content is None:
+                    with self.lock:
+                        if self.futures.get(key) is future:
+                            del self.futures[key]
+        finally:
+            with self.lock:
+                self.active[owner] -= 1
+                if not self.stopping.is_set():
+                    self.dispatch(owner)
+
+    def prefetch(self, urls):
+        '''
+        Ask in advance for pages which will be needed later on
+        '''
+        for purl in urls:
+            if purl and normalize_url(purl) not in self.consumed:
+                self.submit(purl)
+
+    @timed('wait')
+    def get(self, purl):
+        '''
+        Return the content of the page purl, waiting for it if needed
+        The page is then forgotten, the page cache keeps it if needed again
+        '''
+        future = self.submit(purl)
+        try:
+            content = future.result()
+        finally:
+            key = normalize_url(purl)
+            with self.lock:
+                if self.futures.get(key) is future:
+                    del self.futures[key]
+        if content is not None:
+            self.consumed.add(key)
+        return(content)
+
+    def wait_turn(self, key, host):
+        '''
+        Wait until the politeness rate allows a new request for key
+        The delay is randomized between half and one and a half interval,
+        longer when host throttles us
+        '''
+        interval = self.interval * self.fetcher.backoff.slowdown(host)
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next.get(key, now))
+            self.next[key] = slot + interval * random.uniform(0.5, 1.5)
+        if slot > now:
+            with timings.phase('sleep'):
+                self.stopping.wait(slot - now)
+
+    def fetch(self, purl):
+        '''
+        Cache first, then the network
+        '''
+        content = self.fetcher.cached(purl)
+        if content is not None or self.stopping.is_set():
+            return(content)
+        self.wait_turn(host_key(purl), urllib.parse.urlsplit(purl).netloc.lower())
+        if self.stopping.is_set():
+            return(None)
+        return(self.fetcher.download(purl))
+
+    def close(self):
+        '''
+        Forget pending prefetches and stop the threads
+        '''
+        self.stopping.set()
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+            self.pending.clear()
+        self.executor.shutdown(wait=True)
+
+class GPersonIndex:
+    '''
+    Index of the Gramps persons by normalized (lastname, firstname)
+    with their birth and death dates, and by the canonical Geneanet URL
+    they were imported from, built once per run so that find_grampsp
+    does not load the whole database for each person
+    '''
+    def __init__(self):
+        # normalized name -> {handle: (birthdate, deathdate)}
+        self.names = {}
+        # handle -> normalized name
+        self.handles = {}
+        # canonical Geneanet URL -> handle
+        self.urls = {}
+
+    @staticmethod
+    def key(lastname, firstname):
+        '''
+        Normalize a name: case and spaces do not matter
+        '''
+        return(' '.join(str(lastname).split()).casefold()+'|'+' '.join(str(firstname).split()).casefold())
+
+    def update(self, handle, lastname, firstname, birthdate, deathdate):
+        '''
+        Add or refresh the entry of a person
+        Dates are kept as compared by find_grampsp (without empty month/day)
+        '''
+        if handle in self.handles:
+            self.names[self.handles[handle]].pop(handle, None)
+        key = self.key(lastname, firstname)
+        self.handles[handle] = key
+        self.names.setdefault(key, {})[handle] = (format_year(birthdate), format_year(deathdate))
+
+    def add_url(self, handle, purl):
+        '''
+        Record that the person was imported from the Geneanet page purl
+        '''
+        key = canonical_url(purl)
+        if key:
+            self.urls[key] = handle
+
+    def build(self, db):
+        '''
+        Index all the persons of the Gramps database
+        '''
+        if verbosity >= 2:
+            print(_("Indexing the Gramps persons"))
+        for p in db.iter_people():
+            name = split_name(p)
+            if not name:
+                continue
+            dates = []
+            for ref in [p.get_birth_ref(), p.get_death_ref()]:
+                date = None
+                if ref:
+                    try:
+                        date = gramps_date(db.get_event_from_handle(ref.ref))
+                    except:
+                        LOG.debug('no event for %s' % p.gramps_id)
+                dates.append(date)
+            self.update(p.get_handle(), name[0], name[1], dates[0], dates[1])
+            # Pages stored by to_gramps
+            for u in p.get_url_list():
+                if u.get_type() == UrlType.WEB_HOME:
+                    self.add_url(p.get_handle(), u.get_path())
+        if verbosity >= 2:
+            print(_("%d Gramps persons indexed")%(len(self.handles)))
+
+    def lookup(self, lastname, firstname):
+        '''
+        Return the (handle, birthdate, deathdate) of the persons named so
+        '''
+        return([(h, d[0], d[1]) for h, d in self.names.get(self.key(lastname, firstname), {}).items()])
+
+    def lookup_url(self, purl):
+        '''
+        Return the handle of the person imported from purl or None
+        '''
+        return(self.urls.get(canonical_url(purl)))
+
+    def load(self, path, signature):
+        '''
+        Load the index saved for a database in the same state
+        Return whether it was possible
+        '''
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return(False)
+        # Indexes saved before the URLs were kept are rebuilt
+        if not signature or data.get('signature') != signature or 'urls' not in data:
+            if verbosity >= 2:
+                print(_("Saved index %s is obsolete")%(path))
+            return(False)
+        for handle, entry in data.get('persons', {}).items():
+            self.update(handle, entry[0], entry[1], entry[2], entry[3])
+        self.urls = data['urls']
+        if verbosity >= 2:
+            print(_("%d Gramps persons loaded from %s")%(len(self.handles), path))
+        return(True)
+
+    def save(self, path, signature):
+        '''
+        Save the index with the signature of the database
+        '''
+        if not signature:
+            return
+        persons = {}
+        for handle, key in self.handles.items():
+            lastname, firstname = key.split('|', 1)
+            birthdate, deathdate = self.names[key][handle]
+            persons[handle] = [lastname, firstname, birthdate, deathdate]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'persons': persons, 'urls': self.urls}, f)
+
+def db_signature():
+    '''
+    Return a string changing whenever persons or events are added to or
+    removed from the Gramps database, or None if it can't be computed
+    It is cheap, without reading the objects: the changes of existing
+    persons and events made outside of the import are not seen, the index
+    file is to be removed after such changes
+    '''
+    try:
+        return('%s:%d:%d' % (db.get_save_path(), db.get_number_of_people(), db.get_number_of_events()))
+    except:
+        return(None)
+
+def get_pindex():
+    '''
+    Return the index of the Gramps persons, building it on first use
+    '''
+    global pindex
+    if pindex is None:
+        pindex = GPersonIndex()
+        if not (INDEX_FILE and pindex.load(INDEX_FILE, db_signature())):
+            pindex.build(db)
+    return(pindex)
+
+class GFamilyIndex:
+    '''
+    Index of the Gramps families by (father handle, mother handle)
+    built from the family table on first use
+    '''
+    def __init__(self):
+        # (father handle, mother handle) -> family handle
+        self.couples = {}
+        # family handle -> (father handle, mother handle)
+        self.handles = {}
+
+    def update(self, handle, fh, mh):
+        '''
+        Add or refresh the entry of a family
+        '''
+        old = self.handles.get(handle)
+        if old and self.couples.get(old) == handle:
+            del self.couples[old]
+        self.handles[handle] = (fh, mh)
+        if fh and mh:
+            self.couples[(fh, mh)] = handle
+
+    def build(self, db):
+        '''
+        Index all the families of the Gramps database
+        '''
+        if verbosity >= 2:
+            print(_("Indexing the Gramps families"))
+        for f in db.iter_families():
+            self.update(f.get_handle(), f.get_father_handle(), f.get_mother_handle())
+        if verbosity >= 2:
+            print(_("%d Gramps families indexed")%(len(self.handles)))
+
+    def lookup(self, fh, mh):
+        '''
+        Return the handle of the family of this couple or None
+        '''
+        return(self.couples.get((fh, mh)))
+
+def get_findex():
+    '''
+    Return the index of the Gramps families, building it on first use
+    '''
+    global findex
+    if findex is None:
+        findex = GFamilyIndex()
+        findex.build(db)
+    return(findex)
+
+class GPlaceIndex:
+    '''
+    Index of the Gramps places by normalized name and postal code
+    built on first use and kept current when places are added
+    The policy tells how names are normalized:
+    exact, case (e.g. Title-cased Geneanet names) or accents
+    '''
+    def __init__(self, policy=PLACE_MATCH):
+        self.policy = policy
+        # normalized name -> {handle: code}
+        self.names = {}
+        # handle -> normalized name
+        self.handles = {}
+
+    def key(self, name):
+        if name is None:
+            name = ""
+        name = str(name)
+        if self.policy == 'exact':
+            return(name)
+        name = ' '.join(name.replace('-', ' ').split()).casefold()
+        if self.policy == 'accents':
+            name = ''.join([c for c in unicodedata.normalize('NFKD', name) if not unicodedata.combining(c)])
+        return(name)
+
+    @staticmethod
+    def code(code):
+        '''
+        Only keep real postal codes
+        '''
+        if code and re.search(r'\d', str(code)):
+            return(str(code).strip())
+        return("")
+
+    def update(self, place):
+        '''
+        Add or refresh the entry of a place
+        '''
+        handle = place.get_handle()
+        if handle in self.handles:
+            self.names[self.handles[handle]].pop(handle, None)
+        key = self.key(place.get_name().value)
+        self.handles[handle] = key
+        self.names.setdefault(key, {})[handle] = self.code(place.get_code())
+
+    def build(self, db):
+        '''
+        Index all the places of the Gramps database
+        '''
+        if verbosity >= 2:
+            print(_("Indexing the Gramps places"))
+        for place in db.iter_places():
+            self.update(place)
+        if verbosity >= 2:
+            print(_("%d Gramps places indexed")%(len(self.handles)))
+
+    def lookup(self, name, code=None):
+        '''
+        Return the handle of the place with this name, or None
+        With a postal code, a place with the same code is preferred,
+        then one without code, and one with another code is not taken
+        '''
+        candidates = self.names.get(self.key(name), {})
+        code = self.code(code)
+        nocode = None
+        for handle, pcode in candidates.items():
+            if pcode == code:
+                return(handle)
+            if not pcode and not nocode:
+                nocode = handle
+        if nocode:
+            return(nocode)
+        if not code and candidates:
+            return(next(iter(candidates)))
+        return(None)
+
+def get_plindex():
+    '''
+    Return the index of the Gramps places, building it on first use
+    '''
+    global plindex
+    if plindex is None:
+        plindex = GPlaceIndex(PLACE_MATCH)
+        plindex.build(db)
+    return(plindex)
+
+class GTagRegistry:
+    '''
+    Tags used by the import, each resolved or created once per run
+    '''
+    def __init__(self):
+        # tag name -> tag handle
+        self.handles = {}
+        # Same import tag for the whole run, as Gramps does
+        self.import_name = None
+        if config.get('preferences.tag-on-import'):
+            self.import_name = time.strftime(config.get('preferences.tag-on-import-format'))
+
+    def handle(self, name, tran):
+        '''
+        Return the handle of the tag name, creating it if needed
+        '''
+        if name not in self.handles:
+            tag = db.get_tag_from_name(name)
+            if not tag:
+                tag = Tag()
+                tag.set_name(name)
+                db.add_tag(tag, tran)
+                session.touch('tag')
+                if verbosity >= 2:
+                    print(_("Create Tag:"), name)
+            self.handles[name] = tag.get_handle()
+        return(self.handles[name])
+
+    def import_tag(self, timelog, tran):
+        '''
+        Return the handle of the tag marking imported objects:
+        the Gramps import tag if configured, else timelog
+        '''
+        if self.import_name:
+            return(self.handle(self.import_name, tran))
+        return(self.handle(timelog, tran))
+
+def get_tags():
+    '''
+    Return the tag registry of the run
+    '''
+    global tags
+    if tags is None:
+        tags = GTagRegistry()
+    return(tags)
+
+class GWriteBatch:
+    '''
+    Group the Gramps writes of the import in transactions of size objects
+    (0 for the whole import, 1 for one transaction per object)
+    Objects written several times in a same transaction scope are only
+    committed once, when the scope ends
+    '''
+    def __init__(self, size=COMMIT_EVERY):
+        self.size = size
+        self.txn = None
+        # Objects to commit, by handle
+        self.pending = {}
+        # Objects written in the current transaction
+        self.count = 0
+        # Statistics
+        self.transactions = 0
+        self.writes = 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        '''
+        Give the transaction to use for the writes of one imported object
+        '''
+        if self.size == 1:
+            tran = DbTxn("Geneanet import", db)
+            tran.__enter__()
+            self.transactions = self.transactions + 1
+            try:
+                yield tran
+                self.flush(tran)
+            except BaseException:
+                tran.__exit__(*sys.exc_info())
+                raise
+            with timings.phase('transaction'):
+                tran.__exit__(None, None, None)
+            return
+        if self.txn is None:
+            self.txn = DbTxn("Geneanet import", db)
+            self.txn.__enter__()
+            self.transactions = self.transactions + 1
+        yield self.txn
+        self.flush(self.txn)
+        self.count = self.count + 1
+        if self.size and self.count >= self.size:
+            self.commit()
+
+    def write(self, obj):
+        '''
+        Ask for obj to be committed at the end of the transaction scope
+        '''
+        self.pending[obj.get_handle()] = obj
+
+    def flush(self, tran):
+        '''
+        Commit the pending objects
+        '''
+        for obj in self.pending.values():
+            name = obj.__class__.__name__
+            start = time.perf_counter()
+            if name == 'Person':
+                db.commit_person(obj, tran)
+            elif name == 'Family':
+                db.commit_family(obj, tran)
+            elif name == 'Event':
+                db.commit_event(obj, tran)
+            elif name == 'Place':
+                db.commit_place(obj, tran)
+            else:
+                print(_("ERROR: Unable to commit class %s")%(name))
+                continue
+            timings.add('commit', time.perf_counter() - start)
+            session.touch(name.lower())
+            self.writes = self.writes + 1
+        self.pending = {}
+
+    def commit(self):
+        '''
+        Commit the current transaction
+        '''
+        if self.txn is not None:
+            if verbosity >= 2:
+                print(_("Committing %d imported objects")%(self.count))
+            with timings.phase('transaction'):
+                self.txn.__exit__(None, None, None)
+            self.txn = None
+            self.count = 0
+
+    def abort(self, exc_type=None, exc_value=None, traceback=None):
+        '''
+        Roll back the current transaction after a failure
+        '''
+        self.pending = {}
+        if self.txn is not None:
+            print(_("WARNING: Rolling back the last %d imported objects")%(self.count))
+            self.txn.__exit__(exc_type or Exception, exc_value, traceback)
+            self.txn = None
+            self.count = 0
+
+class GImportSession:
+    '''
+    Keep the Gramps signals disabled during the whole import, remember
+    which types of objects changed and rebuild only the related views,
+    at the end of the import or every checkpoint imported persons
+    '''
+    def __init__(self, checkpoint=CHECKPOINT):
+        self.checkpoint = checkpoint
+        # Types of objects changed since the last rebuild (person, family...)
+        self.changed = set()
+        self.persons = 0
+        # Imported persons skipped as unchanged on Geneanet
+        self.unchanged = 0
+        self.started = False
+
+    def start(self):
+        db.disable_signals()
+        self.started = True
+
+    def touch(self, objtype):
+        '''
+        Record that an object of objtype was added or changed
+        '''
+        self.changed.add(objtype)
+
+    def imported(self):
+        '''
+        Count an imported person and refresh the views at checkpoints
+        '''
+        self.persons = self.persons + 1
+        if self.checkpoint and self.persons % self.checkpoint == 0:
+            # The views are not to show what an abort can still roll back
+            writer.commit()
+            self.rebuild()
+            db.disable_signals()
+
+    def rebuild(self):
+        '''
+        Emit the rebuild signals of the changed object types
+        '''
+        db.enable_signals()
+        for objtype in sorted(self.changed):
+            if verbosity >= 3:
+                print(_("Rebuilding %s views")%(objtype))
+            db.emit(objtype+'-rebuild')
+        self.changed = set()
+
+    def end(self):
+        if self.started:
+            self.rebuild()
+            self.started = False
+
+class GWork:
+    '''
+    Work item of the crawl frontier: explore the relation ('parents' of a
+    GPerson or 'children' of a GFamily) of gobj, found at url, at level
+    In a two-phase import, the relation is 'person' or 'spouse' and the
+    GPerson gobj is only crawled into the graph
+    '''
+    def __init__(self, relation, level, gobj):
+        self.relation = relation
+        self.level = level
+        self.gobj = gobj
+        self.url = gobj.url
+
+    def key(self):
+        '''
+        Identity of the exploration, so that it is done only once
+        '''
+        if self.relation == 'children':
+            return((self.relation, canonical_url(self.gobj.father.url), canonical_url(self.gobj.mother.url)))
+        return((self.relation, canonical_url(self.url)))
+
+    def urls(self):
+        '''
+        Geneanet pages this work item will need
+        Explorations beyond LEVEL only stop and need none
+        '''
+        if self.relation in ('parents', 'children') and self.level > LEVEL:
+            return([])
+        if self.relation == 'parents':
+            return([self.gobj.fref, self.gobj.mref])
+        elif self.relation == 'children':
+            return(list(self.gobj.g_childref))
+        elif self.relation in ('person', 'spouse'):
+            return([self.url])
+        return([])
+
+    def run(self):
+        if self.relation == 'parents':
+            self.gobj.recurse_parents(self.level)
+        elif self.relation == 'children':
+            self.gobj.recurse_children(self.level)
+        elif self.relation in ('person', 'spouse'):
+            self.gobj.crawl(self.level, self.relation)
+        else:
+            print(_("ERROR: Unknown relation %s to explore")%(self.relation))
+
+class GFrontier:
+    '''
+    Queue of the exploration still to be done, replacing the recursion
+    between recurse_parents and recurse_children
+    Work items are processed breadth first (bfs), depth first (dfs) or
+    by priority (closest levels first, ascendants before descendants)
+    '''
+    RANKS = {'parents': 0, 'children': 1}
+
+    def __init__(self, order=ORDER):
+        self.order = order
+        self.queue = collections.deque()
+        self.heap = []
+        # Items queued while running the current one
+        self.pending = []
+        # Lowest level each item was queued at, by key
+        self.seen = {}
+        self.count = 0
+        self.stopped = False
+        # Item being processed
+        self.current = None
+
+    def push(self, work):
+        '''
+        Queue work, and ask the scheduler for the pages it will need
+        An exploration already queued is ignored, unless it is now reached
+        at a lower level where it can go further
+        '''
+        key = work.key()
+        if work.url and key in self.seen and self.seen[key] <= work.level:
+            if verbosity >= 2:
+                print(_("Already explored %s of %s")%(work.relation, work.url))
+            return
+        self.seen[key] = work.level
+        if scheduler:
+            scheduler.prefetch(work.urls())
+        self.pending.append(work)
+
+    def flush(self):
+        '''
+        Move the items queued by the last run into the frontier
+        In depth first order, they are stacked so that the first queued
+        is the first processed
+        '''
+        if self.order == 'dfs':
+            self.pending.reverse()
+        for work in self.pending:
+            self.count = self.count + 1
+            if self.order == 'priority':
+                heapq.heappush(self.heap, (work.level, self.RANKS.get(work.relation, 2), self.count, work))
+            else:
+                self.queue.append(work)
+        self.pending = []
+
+    def pop(self):
+        if self.order == 'priority':
+            return(heapq.heappop(self.heap)[3])
+        elif self.order == 'dfs':
+            return(self.queue.pop())
+        else:
+            return(self.queue.popleft())
+
+    def __len__(self):
+        return(len(self.queue) + len(self.heap))
+
+    def items(self):
+        '''
+        Return the work items still to process in the order they would
+        be, the current one and the ones it queued first
+        '''
+        if self.order == 'priority':
+            works = [item[3] for item in sorted(self.heap, key=lambda item: item[:3])]
+        elif self.order == 'dfs':
+            works = list(reversed(self.queue))
+        else:
+            works = list(self.queue)
+        if self.current:
+            return([self.current] + self.pending + works)
+        return(self.pending + works)
+
+    def restore(self, works, seen):
+        '''
+        Set the work items to process, in that order, and the levels of the
+        ones already queued by key, as saved from items() and seen
+        '''
+        self.seen = dict(seen)
+        for work in works:
+            key = work.key()
+            self.seen[key] = min(work.level, self.seen.get(key, work.level))
+        self.pending = []
+        if self.order == 'priority':
+            self.heap = []
+            for work in works:
+                self.count = self.count + 1
+                heapq.heappush(self.heap, (work.level, self.RANKS.get(work.relation, 2), self.count, work))
+        elif self.order == 'dfs':
+            self.queue = collections.deque(reversed(works))
+        else:
+            self.queue = collections.deque(works)
+
+    def stop(self):
+        '''
+        Stop the exploration after the current work item
+        '''
+        self.stopped = True
+
+    def stale(self, work):
+        '''
+        Whether work was queued again at a lower level since
+        '''
+        return(bool(work.url) and self.seen.get(work.key(), work.level) < work.level)
+
+    def run(self):
+        '''
+        Process work items until the frontier is empty
+        '''
+        self.flush()
+        while len(self) > 0 and not self.stopped:
+            work = self.pop()
+            if self.stale(work):
+                continue
+            if verbosity >= 3:
+                print(_("Exploring %s of %s at level %d (%d remaining)")%(work.relation, work.url, work.level, len(self)))
+            self.current = work
+            work.run()
+            self.current = None
+            self.flush()
+            if crawlstate and crawlstate.due():
+                crawlstate.checkpoint()
+
+class GGraph:
+    '''
+    Persons crawled from Geneanet by canonical URL, without any access to
+    Gramps, so that they can be applied into Gramps later, possibly from
+    another run through a JSON file
+    '''
+    def __init__(self, root=None):
+        self.root = root
+        self.persons = {}
+
+    def add(self, p):
+        self.persons[canonical_url(p.url)] = p
+
+    def get(self, purl):
+        return(self.persons.get(canonical_url(purl)))
+
+    def __len__(self):
+        return(len(self.persons))
+
+    def to_dict(self):
+        return({'root': self.root, 'persons': [p.record() for p in self.persons.values()]})
+
+    def from_dict(self, data):
+        self.root = data['root']
+        self.persons = {}
+        for rec in data['persons']:
+            p = GPerson(rec['level'])
+            p.from_record(rec)
+            self.add(p)
+
+    def save(self, path):
+        '''
+        Write the graph as JSON into path
+        '''
+        with open(path, 'w', encoding='utf-8') as fd:
+            json.dump(self.to_dict(), fd, ensure_ascii=False, indent=1)
+        if verbosity >= 1:
+            print(_("%d persons saved into %s")%(len(self.persons), path))
+
+    def load(self, path):
+        '''
+        Read the graph from the JSON file path
+        '''
+        with open(path, encoding='utf-8') as fd:
+            self.from_dict(json.load(fd))
+        if verbosity >= 1:
+            print(_("%d persons loaded from %s")%(len(self.persons), path))
+
+class GCrawlState:
+    '''
+    State of an import saved every interval seconds into path, so that
+    --resume goes on where an interrupted import stopped: its options and
+    root person, the explorations still to do and already queued, the
+    persons merged into Gramps with their Gramps id and, for a two-phase
+    import, the graph crawled
+    The state of an import is taken between two explorations, once the
+    pending writes are committed, so that all the persons listed are in
+    Gramps. The file is removed once the import is done
+    '''
+    # Globals of the import options kept with the state
+    OPTIONS = ['LEVEL', 'ascendants', 'descendants', 'spouses', 'ORDER', 'TWO_PHASE']
+
+    def __init__(self, path, interval=STATE_EVERY):
+        self.path = path
+        self.interval = interval
+        self.root = None
+        self.gid = None
+        # import, or crawl then apply for a two-phase import
+        self.phase = 'import'
+        self.options = {}
+        self.saved = time.time()
+        # Content of the file resumed, None for a new import
+        self.data = None
+        # JSON state of the import at the last checkpoint and its number
+        # of explorations to do
+        self.last = None
+
+    def due(self):
+        return(self.interval > 0 and time.time() - self.saved >= self.interval)
+
+    def checkpoint(self):
+        '''
+        Save the state between two explorations, committing the writes of
+        an import first
+        '''
+        if self.phase == 'import' and writer:
+            writer.commit()
+        self.last = self.dump(self.state())
+        self.save()
+
+    def state(self):
+        '''
+        Return the current state as a plain dict
+        '''
+        data = {'root': self.root, 'gid': self.gid, 'phase': self.phase,
+            'options': dict([(o, globals()[o]) for o in self.OPTIONS]),
+            'frontier': [], 'seen': [], 'persons': {}}
+        # An empty frontier is false
+        if frontier is not None:
+            data['frontier'] = [self.work_data(w) for w in frontier.items()]
+            data['seen'] = [[list(k), l] for k, l in frontier.seen.items()]
+        if self.phase == 'import':
+            for key, p in persons.items():
+                if p.gid:
+                    data['persons'][key] = {'gid': p.gid, 'record': p.record()}
+        elif graph:
+            data['graph'] = graph.to_dict()
+        return(data)
+
+    def dump(self, data):
+        '''
+        Return the JSON text of the state data and its number of
+        explorations to do, so that later changes do not alter it
+        '''
+        return((json.dumps(data, ensure_ascii=False), len(data['frontier'])))
+
+    def save(self):
+        '''
+        Write the state into path, through a temporary file so that an
+        interruption keeps the previous one
+        Nothing is committed here: an import saves its state at the last
+        checkpoint, the later writes may be aborted
+        '''
+        if self.phase == 'import':
+            last = self.last
+        else:
+            last = self.dump(self.state())
+        if last is None:
+            return
+        text, todo = last
+        tmp = self.path+'.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as fd:
+            fd.write(text)
+        os.replace(tmp, self.path)
+        self.saved = time.time()
+        if verbosity >= 2:
+            print(_("Import state saved into %s (%d explorations to do)")%(self.path, todo))
+
+    def load(self):
+        '''
+        Read the state of the interrupted import, return False if none
+        '''
+        if not os.path.exists(self.path):
+            return(False)
+        with open(self.path, encoding='utf-8') as fd:
+            self.data = json.load(fd)
+        self.root = self.data['root']
+        self.gid = self.data['gid']
+        self.phase = self.data['phase']
+        self.options = self.data['options']
+        return(True)
+
+    def restore(self):
+        '''
+        Rebuild the persons merged, or the graph crawled, and the frontier
+        of the interrupted import
+        '''
+        global graph
+
+        data = self.data
+        if self.phase == 'import':
+            for key, item in data['persons'].items():
+                p = GPerson(item['record']['level'])
+                p.from_record(item['record'])
+                p.from_gramps(item['gid'])
+                persons[key] = p
+        elif 'graph' in data:
+            graph = GGraph()
+            graph.from_dict(data['graph'])
+        works = []
+        for d in data['frontier']:
+            work = self.work(d)
+            if work:
+                works.append(work)
+        frontier.restore(works, [(tuple(k), l) for k, l in data['seen']])
+        self.last = self.dump(data)
+        if verbosity >= 1:
+            print(_("Resuming the import of %s with %d persons done and %d explorations to do")%(self.root, len(data['persons']) or len(graph or []), len(works)))
+
+    def work_data(self, work):
+        '''
+        Return the work item as a plain dict
+        '''
+        d = {'relation': work.relation, 'level': work.level, 'url': work.url}
+        if work.relation == 'children':
+            d['father'] = canonical_url(work.gobj.father.url)
+            d['mother'] = canonical_url(work.gobj.mother.url)
+            d['gid'] = work.gobj.gid
+            d['childref'] = list(work.gobj.g_childref)
+        return(d)
+
+    def work(self, d):
+        '''
+        Return the work item of the dict made by work_data, or None when
+        it has nothing left to explore
+        '''
+        if d['relation'] in ('person', 'spouse'):
+            return(GWork(d['relation'], d['level'], GPerson(d['level']).at(d['url'])))
+        if d['relation'] == 'parents':
+            p = persons.get(canonical_url(d['url']))
+            if p:
+                return(GWork('parents', d['level'], p))
+        elif d['relation'] == 'children':
+            father = persons.get(d['father']) or GPerson(d['level'])
+            mother = persons.get(d['mother']) or GPerson(d['level'])
+            f = GFamily(father, mother)
+            f.g_childref = d['childref']
+            f.from_gramps(d['gid'])
+            return(GWork('children', d['level'], f))
+        return(None)
+
+    def done(self):
+        '''
+        Forget the state once the import is done
+        '''
+        for path in [self.path, self.path+'.tmp']:
+            if os.path.exists(path):
+                os.remove(path)
+
+class GPlan:
+    '''
+    What an import would do in Gramps, as computed by a dry run:
+    persons and families to create or update, with the fields changed,
+    and places to create
+    '''
+    def __init__(self):
+        self.persons = []
+        self.families = []
+        self.places = []
+        self.warnings = []
+
+    def person(self, p, fields):
+        if p.grampsp is None:
+            action = 'create'
+        elif fields:
+            action = 'update'
+        else:
+            action = 'keep'
+        self.persons.append({'action': action, 'gid': p.gid, 'url': p.url,
+            'name': p.firstname+" "+p.lastname, 'fields': fields})
+
+    def family(self, f, fields, children):
+        if f.family is None:
+            action = 'create'
+        elif fields or children:
+            action = 'update'
+        else:
+            action = 'keep'
+        self.families.append({'action': action, 'gid': f.gid,
+            'father': f.father.firstname+" "+f.father.lastname,
+            'mother': f.mother.firstname+" "+f.mother.lastname,
+            'fields': fields, 'children': children})
+
+    def place(self, name, code):
+        if [name, code] not in self.places:
+            self.places.append([name, code])
+
+    def warning(self, msg):
+        print(msg)
+        self.warnings.append(msg)
+
+    def counts(self):
+        ret = {}
+        for kind in ['persons', 'families']:
+            for item in getattr(self, kind):
+                key = kind+'_'+item['action']
+                ret[key] = ret.get(key, 0) + 1
+        ret['places_create'] = len(self.places)
+        return(ret)
+
+    def save(self, path):
+        '''
+        Write the plan as JSON into path, or on the standard output for -
+        '''
+        data = {'counts': self.counts(), 'persons': self.persons,
+            'families': self.families, 'places': self.places,
+            'warnings': self.warnings}
+        if path == '-':
+            json.dump(data, sys.stdout, ensure_ascii=False, indent=1)
+            print()
+            return
+        with open(path, 'w', encoding='utf-8') as fd:
+            json.dump(data, fd, ensure_ascii=False, indent=1)
+
+    def text(self):
+        '''
+        Return the plan for humans
+        '''
+        lines = []
+        for p in self.persons:
+            if p['action'] == 'keep' and verbosity < 2:
+                continue
+            lines.append(_("Person %s %s (%s)")%(p['action'], p['name'], p['gid'] or p['url']))
+            for attr in p['fields']:
+                lines.append("    %s: %s -> %s"%(attr, p['fields'][attr][0], p['fields'][attr][1]))
+        for f in self.families:
+            if f['action'] == 'keep' and verbosity < 2:
+                continue
+            lines.append(_("Family %s %s - %s (%s)")%(f['action'], f['father'], f['mother'], f['gid']))
+            for attr in f['fields']:
+                lines.append("    %s: %s -> %s"%(attr, f['fields'][attr][0], f['fields'][attr][1]))
+            for c in f['children']:
+                lines.append(_("    child: %s")%(c))
+        for name, code in self.places:
+            lines.append(_("Place create %s (%s)")%(name, code))
+        counts = self.counts()
+        lines.append(_("Persons: %d to create, %d to update, %d unchanged")%(counts.get('persons_create', 0), counts.get('persons_update', 0), counts.get('persons_keep', 0)))
+        lines.append(_("Families: %d to create, %d to update, %d unchanged")%(counts.get('families_create', 0), counts.get('families_update', 0), counts.get('families_keep', 0)))
+        lines.append(_("Places: %d to create")%(counts['places_create']))
+        return("\n".join(lines)+"\n")
+
+    def report(self):
+        '''
+        Print the plan for humans
+        '''
+        print(self.text(), end='')
+
+class GBatch:
+    '''
+    Import of several subtrees in a same run, one per row of a CSV or
+    JSONL file giving the Geneanet URL of the root person and optionally
+    the Gramps id to merge it into, the depth and the direction (letters a
+    for ascendants, d for descendants and s for spouses)
+    The page cache, downloads, Gramps indexes and persons already merged
+    are shared by the rows
+    '''
+    # Columns of a CSV file without header
+    FIELDS = ['url', 'id', 'depth', 'direction']
+
+    def __init__(self):
+        self.rows = []
+        self.results = []
+
+    def load(self, path):
+        '''
+        Read the rows of the CSV or JSONL file path, ignoring empty
+        lines and the ones starting with #
+        '''
+        with open(path, encoding='utf-8', newline='') as fd:
+            lines = [l for l in fd if l.strip() and not l.lstrip().startswith('#')]
+        if path.endswith('.jsonl') or (lines and lines[0].lstrip().startswith('{')):
+            items = [json.loads(l) for l in lines]
+        else:
+            items = []
+            header = None
+            for cells in csv.reader(lines):
+                cells = [c.strip() for c in cells]
+                if header is None and not items and cells[0].lower() == 'url':
+                    header = [c.lower() for c in cells]
+                    continue
+                items.append(dict(zip(header or self.FIELDS, cells)))
+        for num, item in enumerate(items, 1):
+            self.rows.append(self.row(num, item))
+        if verbosity >= 1:
+            print(_("%d rows to import from %s")%(len(self.rows), path))
+
+    def row(self, num, item):
+        '''
+        Check and normalize the item read for the row num
+        '''
+        row = {'row': num, 'url': str(item.get('url') or '').strip(), 'gid': None,
+            'level': None, 'direction': None, 'error': None}
+        gid = str(item.get('id') or '').strip()
+        if gid:
+            # Same as --id when only the number is given
+            if gid.isdigit():
+                gid = "I"+gid
+            row['gid'] = gid
+        # A depth of 0 from JSON is kept
+        depth = item.get('depth')
+        try:
+            if depth is not None and str(depth).strip():
+                row['level'] = int(depth)
+        except ValueError:
+            row['error'] = _("Invalid depth %s")%(depth)
+        direction = str(item.get('direction') or '').strip().lower()
+        if direction:
+            if set(direction) - set('ads'):
+                row['error'] = _("Invalid direction %s")%(direction)
+            row['direction'] = direction
+        if not row['url']:
+            row['error'] = _("No Geneanet URL")
+        return(row)
+
+    def run(self):
+        '''
+        Import the rows one after the other, going on after a failed one
+        '''
+        global LEVEL
+        global ascendants
+        global descendants
+        global spouses
+        global frontier
+
+        defaults = (LEVEL, ascendants, descendants, spouses)
+        try:
+            for row in self.rows:
+                result = {'row': row['row'], 'url': row['url'], 'gid': row['gid'],
+                    'status': 'ok', 'persons': 0, 'seconds': 0.0, 'message': ''}
+                self.results.append(result)
+                if row['error']:
+                    result['status'] = 'skipped'
+                    result['message'] = row['error']
+                    print(_("Skipping batch row %d: %s")%(row['row'], row['error']))
+                    continue
+                if verbosity >= 1:
+                    print(_("Batch row %d: %s")%(row['row'], row['url']))
+                LEVEL = defaults[0] if row['level'] is None else row['level']
+                if row['direction'] is None:
+                    ascendants, descendants, spouses = defaults[1:]
+                else:
+                    ascendants = 'a' in row['direction']
+                    descendants = 'd' in row['direction']
+                    spouses = 's' in row['direction']
+                # Explorations done for a previous row are done again
+                # as the depth may differ, their pages come from the cache
+                frontier = GFrontier(ORDER)
+                before = len(persons)
+                start = time.perf_counter()
+                try:
+                    self.run_row(row, result)
+                except Exception as e:
+                    result['status'] = 'error'
+                    result['message'] = str(e) or e.__class__.__name__
+                    print(_("ERROR: Batch row %d failed: %s")%(row['row'], result['message']))
+                    self.rollback(sys.exc_info())
+                else:
+                    if not DRY_RUN:
+                        result['persons'] = len(persons) - before
+                result['seconds'] = time.perf_counter() - start
+        finally:
+            LEVEL, ascendants, descendants, spouses = defaults
+
+    def run_row(self, row, result):
+        if DRY_RUN:
+            g = crawl(row['url'])
+            result['persons'] = len(g)
+            result['plan'] = plan_import(g, row['gid']).counts()
+            return
+        if TWO_PHASE:
+            gp = apply_graph(crawl(row['url']), row['gid'])
+        else:
+            gp = import_root(row['gid'], row['url'])
+        # Each row is committed on its own, so that a failing row
+        # only rolls back its own writes
+        writer.commit()
+        if gp is None:
+            result['status'] = 'failed'
+            result['message'] = _("Person not imported")
+        else:
+            result['gid'] = gp.gid
+
+    def rollback(self, exc_info):
+        '''
+        Roll back the writes of the failed row and forget what was
+        found in Gramps, as it may refer to them
+        '''
+        global persons
+        global pindex
+        global findex
+        global plindex
+        global tags
+
+        if DRY_RUN:
+            return
+        writer.abort(*exc_info)
+        persons = {}
+        pindex = None
+        findex = None
+        plindex = None
+        tags = None
+
+    def counts(self):
+        ret = {}
+        for result in self.results:
+            ret[result['status']] = ret.get(result['status'], 0) + 1
+        return(ret)
+
+    def save(self, path):
+        '''
+        Write the results as JSON into path, or on the standard output for -
+        '''
+        data = {'counts': self.counts(), 'rows': self.results}
+        if path == '-':
+            json.dump(data, sys.stdout, ensure_ascii=False, indent=1)
+            print()
+            return
+        with open(path, 'w', encoding='utf-8') as fd:
+            json.dump(data, fd, ensure_ascii=False, indent=1)
+
+    def report(self):
+        '''
+        Print the result of each row
+        '''
+        print("%5s %-8s %8s %9s %-10s %s"%(_("Row"), _("Status"), _("Persons"), _("Seconds"), _("Gramps id"), _("URL")))
+        for r in self.results:
+            print("%5d %-8s %8d %9.1f %-10s %s"%(r['row'], r['status'], r['persons'], r['seconds'], r['gid'] or '', r['url']))
+            if r['message']:
+                print("      %s"%(r['message']))
+        counts = self.counts()
+        print(_("Rows: %d ok, %d failed, %d in error, %d skipped")%(counts.get('ok', 0), counts.get('failed', 0), counts.get('error', 0), counts.get('skipped', 0)))
+
+class GBase:
+
+    def __init__(self):
+        pass
+
+    def _smartcopy(self,attr):
+        '''
+        Smart Copying an attribute from geneanet (g_ attrs) into attr
+        Works for GPerson and GFamily
+        '''
+        if verbosity >= 3:
+            print(_("Smart Copying Attributes"),attr)
+
+        # By default do not copy as Gramps is the master reference
+        scopy = False
+
+        # Find the case where copy is to be done
+        # Nothing yet
+        if not self.__dict__[attr]:
+            scopy = True
+
+        # Empty field
+        if self.__dict__[attr] and self.__dict__[attr] == "" and self.__dict__['g_'+attr] and self.__dict__['g_'+attr] != "":
+            scopy = True
+
+        # Force the copy
+        if self.__dict__[attr] != self.__dict__['g_'+attr] and force:
+            scopy = True
+
+        # Managing sex, Gramps is always right except when unknown
+        # Warn on conflict
+        if attr == 'sex' and self.__dict__[attr] == 'U' and self.__dict__['g_'+attr] != 'U':
+            scopy = True
+            if (self.__dict__[attr] == 'F' and self.__dict__['g_'+attr] == 'M') \
+            or (self.__dict__[attr] == 'M' and self.__dict__['g_'+attr] == 'F'):
+                if verbosity >= 1:
+                    print(_("WARNING: Gender conflict between Geneanet (%s) and Gramps (%s), keeping Gramps value")%(self.__dict__['g_'+attr],self.__dict__[attr]))
+                scopy = False
+
+        if attr == 'lastname' and self.__dict__[attr] != self.__dict__['g_'+attr]:
+            if verbosity >= 1 and self.__dict__[attr] != "":
+                print(_("WARNING: Lastname conflict between Geneanet (%s) and Gramps (%s), keeping Gramps value")%(self.__dict__['g_'+attr],self.__dict__[attr]))
+        if attr == 'lastname' and self.__dict__[attr] == "":
+            scopy = True
+
+        if attr == 'firstname' and self.__dict__[attr] != self.__dict__['g_'+attr]:
+            if verbosity >= 1 and self.__dict__[attr] != "":
+                print(_("WARNING: Firstname conflict between Geneanet (%s) and Gramps (%s), keeping Gramps value")%(self.__dict__['g_'+attr],self.__dict__[attr]))
+        if attr == 'firstname' and self.__dict__[attr] == "":
+            scopy = True
+
+        # Copy only if code is more precise
+        match = re.search(r'code$', attr)
+        if match:
+            if not self.__dict__[attr]:
+                scopy = True
+            else:
+                if not self.__dict__['g_'+attr]:
+                    scopy = False
+                else:
+                    try:
+                        if int(self.__dict__[attr]) < int(self.__dict__['g_'+attr]):
+                            scopy = True
+                    except ValueError:
+                        LOG.debug(str(self.__dict__[attr]))
+
+        # Copy only if date is more precise
+        match = re.search(r'date$', attr)
+        if match:
+            if not self.__dict__[attr]:
+                scopy = True
+            else:
+                if not self.__dict__['g_'+attr]:
+                    scopy = False
+                else:
+                    if self.__dict__[attr] == "" and self.__dict__['g_'+attr] != "":
+                        scopy = True
+                    elif self.__dict__[attr] < self.__dict__['g_'+attr]:
+                        scopy = True
+
+        if scopy:
+            if verbosity >= 2:
+                print(_("Copying Person attribute %s (former value %s newer value %s)")%(attr, self.__dict__[attr],self.__dict__['g_'+attr]))
+
+            self.__dict__[attr] = self.__dict__['g_'+attr]
+        else:
+            if verbosity >= 3:
+                print(_("Not Copying Person attribute (%s, value %s) onto %s")%(attr, self.__dict__[attr],self.__dict__['g_'+attr]))
+
+
+    def plan_smartcopy(self, attrs):
+        '''
+        Smart copy as to_gramps would, and return the attributes changed
+        with their former and newer values
+        '''
+        before = {}
+        for attr in attrs:
+            before[attr] = self.__dict__[attr]
+        self.smartcopy()
+        fields = {}
+        for attr in attrs:
+            if self.__dict__[attr] != before[attr]:
+                fields[attr] = [before[attr], self.__dict__[attr]]
+        return(fields)
+
+    def plan_place(self, attr):
+        '''
+        Dry run of get_or_create_event for the places: give to the plan the
+        place it would create for the event attr
+        '''
+        placename = self.__dict__[attr+'place']
+        placecode = self.__dict__[attr+'placecode']
+        if not placename and not placecode:
+            return
+        event = None
+        try:
+            if attr == 'marriage':
+                for eventref in self.family.get_event_ref_list():
+                    ev = db.get_event_from_handle(eventref.ref)
+                    if ev.get_type() == EventType.MARRIAGE:
+                        event = ev
+            else:
+                ref = getattr(self.grampsp, 'get_'+attr+'_ref')()
+                if ref:
+                    event = db.get_event_from_handle(ref.ref)
+        except AttributeError:
+            # Not yet in Gramps
+            event = None
+        if event and event.get_place_handle():
+            return
+        if not placename:
+            placename = ""
+        if get_plindex().lookup(placename, placecode):
+            return
+        plan.place(placename, placecode)
+
+    @timed('get_or_create_place')
+    def get_or_create_place(self,event,placename,placecode=None):
+        '''
+        Create Place for Events or get an existing one based on the name
+        (and postal code when known)
+        '''
+
+        try:
+            pl = event.get_place_handle()
+        except:
+            place = Place()
+            return(place)
+
+        if pl:
+            try:
+                place = db.get_place_from_handle(pl)
+                if verbosity >= 2:
+                    print(_("Reuse Place from Event:"), place.get_name().value)
+            except:
+                place = Place()
+        else:
+            if placename == None:
+                place = Place()
+                return(place)
+            keep = None
+            # Check whether our place already exists
+            handle = get_plindex().lookup(placename, placecode)
+            if handle:
+                keep = db.get_place_from_handle(handle)
+            if keep == None:
+                if verbosity >= 2:
+                    print(_("Create Place:"), placename)
+                place = Place()
+            else:
+                if verbosity >= 2:
+                    print(_("Reuse existing Place:"), placename)
+                place = keep
+        return(place)
+
+    def get_or_create_event(self, gobj, attr, tran, timelog):
+        '''
+        Create Birth and Death Events for a person
+        and Marriage Events for a family or get an existing one
+        self is GPerson or GFamily
+        gobj is a gramps object Person or Family
+        '''
+
+        event = None
+        # Manages name indirection for person
+        if gobj.__class__.__name__ == 'Person':
+            role = EventRoleType.PRIMARY
+            func = getattr(gobj,'get_'+attr+'_ref')
+            reffunc = func()
+            if reffunc:
+                event = db.get_event_from_handle(reffunc.ref)
+                if verbosity >= 2:
+                    print(_("Existing ")+attr+_(" Event"))
+        elif gobj.__class__.__name__ == 'Family':
+            role = EventRoleType.FAMILY
+            if attr == 'marriage':
+                marev = None
+                for event_ref in gobj.get_event_ref_list():
+                    event = db.get_event_from_handle(event_ref.ref)
+                    if (event.get_type() == EventType.MARRIAGE and
+                            (event_ref.get_role() == EventRoleType.FAMILY or
+                             event_ref.get_role() == EventRoleType.PRIMARY)):
+                        marev = event
+                if marev:
+                    event = marev
+                    if verbosity >= 2:
+                        print(_("Existing ")+attr+_(" Event"))
+        else:
+            print(_("ERROR: Unable to handle class %s in get_or_create_all_event")%(gobj.__class__.__name__))
+
+        if event is None:
+            event = Event()
+            uptype = getattr(EventType,attr.upper())
+            event.set_type(EventType(uptype))
+            try:
+                event.set_description(str(self.title[0]))
+            except:
+                event.set_description(_("No title"))
+            tag_handle = get_tags().import_tag(timelog, tran)
+            event.add_tag(tag_handle)
+            db.add_event(event, tran)
+            session.touch('event')
+
+            eventref = EventRef()
+            eventref.set_role(role)
+            eventref.set_reference_handle(event.get_handle())
+            if gobj.__class__.__name__ == 'Person':
+                func = getattr(gobj,'set_'+attr+'_ref')
+                reffunc = func(eventref)
+                writer.write(event)
+                gobj.add_tag(tag_handle)
+                writer.write(gobj)
+            elif gobj.__class__.__name__ == 'Family':
+                eventref.set_role(EventRoleType.FAMILY)
+                gobj.add_event_ref(eventref)
+                if attr == 'marriage':
+                    gobj.set_relationship(FamilyRelType(FamilyRelType.MARRIED))
+                writer.write(event)
+                gobj.add_tag(tag_handle)
+                writer.write(gobj)
+            if verbosity >= 2:
+                print(_("Creating ")+attr+" ("+str(uptype)+") "+_("Event"))
+
+        if self.__dict__[attr+'date'] \
+            or self.__dict__[attr+'place'] \
+            or self.__dict__[attr+'placecode'] :
+            # Get or create the event date
+            date = event.get_date_object()
+            if self.__dict__[attr+'date']:
+                # Dates read back from Gramps or a saved graph are strings
+                gdate = date_from_string(self.__dict__[attr+'date'])
+                if gdate:
+                    gdate.apply(date)
+                else:
+                    print(_("WARNING: Trying to affect an empty date"))
+            if verbosity >= 2 and self.__dict__[attr+'date']:
+                print(_("Update ")+attr+_(" Date to ")+self.__dict__[attr+'date'])
+            event.set_date_object(date)
+            writer.write(event)
+
+            if self.__dict__[attr+'place'] \
+                or self.__dict__[attr+'placecode'] :
+                if self.__dict__[attr+'place']:
+                    placename = self.__dict__[attr+'place']
+                else:
+                    placename = ""
+                place = self.get_or_create_place(event, placename, self.__dict__[attr+'placecode'])
+                # An existing place is kept as the user named it
+                if not place.get_handle():
+                    place.set_name(PlaceName(value=placename))
+                    if self.__dict__[attr+'placecode']:
+                        place.set_code(self.__dict__[attr+'placecode'])
+                    place.add_tag(get_tags().handle(_('place from geneanet'), tran))
+                    db.add_place(place, tran)
+                    session.touch('place')
+                    get_plindex().update(place)
+                event.set_place_handle(place.get_handle())
+                writer.write(event)
+
+        writer.write(event)
+        return
+
+    def get_gramps_date(self, evttype):
+        '''
+        Give back the date of the event related to the GPerson or GFamily
+        as a string ISO formated
+        '''
+
+        if verbosity >= 4:
+            print(_("EventType: %d")%(evttype))
+
+        if not self:
+            return(None)
+
+        if evttype == EventType.BIRTH:
+            ref = self.grampsp.get_birth_ref()
+        elif evttype == EventType.DEATH:
+            ref = self.grampsp.get_death_ref()
+        elif evttype == EventType.MARRIAGE:
+            eventref = None
+            for eventref in self.family.get_event_ref_list():
+                event = db.get_event_from_handle(eventref.ref)
+                if (event.get_type() == EventType.MARRIAGE
+                    and (eventref.get_role() == EventRoleType.FAMILY
+                    or eventref.get_role() == EventRoleType.PRIMARY)):
+                        break
+            ref = eventref
+        else:
+            print(_("Didn't find a known EventType: "),evttype)
+            return(None)
+
+        if ref:
+            if verbosity >= 4:
+                print(_("Ref:"),ref)
+            try:
+                event = db.get_event_from_handle(ref.ref)
+            except:
+                print(_("Didn't find a known ref for this ref date: "),ref)
+                return(None)
+            if event:
+                if verbosity >= 4:
+                    print(_("Event")+":",event)
+                return(gramps_date(event))
+            else:
+                return(None)
+        else:
+            return(None)
+
+
+class GFamily(GBase):
+    '''
+    Family as seen by Gramps and Geneanet
+    '''
+    def __init__(self,father,mother):
+        # The 2 GPersons parents in this family should exist
+        # and properties filled before we create the family
+        # Gramps properties
+        self.title = ""
+        self.marriagedate = None
+        self.marriageplace = None
+        self.marriageplacecode = None
+        self.gid = None
+        # Pointer to the Gramps Family instance
+        self.family = None
+        # Geneanet properties
+        self.g_marriagedate = None
+        self.g_marriageplace = None
+        self.g_marriageplacecode = None
+        self.g_childref = []
+
+        if verbosity >= 1:
+            print(_("Creating GFamily: ")+father.firstname+" "+father.lastname+" - "+mother.firstname+" "+mother.lastname)
+        self.url = father.url
+        if self.url == "":
+            self.url = mother.url
+        # TODO: what if father or mother is None
+        self.father = father
+        self.mother = mother
+
+    def create_grampsf(self):
+        '''
+        Create a Family in Gramps and return it
+        '''
+        if plan:
+            # Dry run: to_gramps is never called, plan_graph reports it
+            return
+        with writer.transaction() as tran:
+            grampsf = Family()
+            db.add_family(grampsf, tran)
+            session.touch('family')
+            self.gid = grampsf.gramps_id
+            self.family = grampsf
+            if verbosity >= 2:
+                print(_("Create new Gramps Family: ")+self.gid)
+        # The couple will be set by to_gramps
+        get_findex().update(grampsf.get_handle(), self.father.get_handle(), self.mother.get_handle())
+
+    @timed('find_grampsf')
+    def find_grampsf(self):
+        '''
+        Find a Family in Gramps and return it
+        '''
+        if verbosity >= 2:
+            print(_("Look for a Gramps Family"))
+        # Do these people already form a family
+        if not self.father or not self.mother:
+            return(None)
+        fh = self.father.get_handle()
+        mh = self.mother.get_handle()
+        if verbosity >= 3:
+            print(_("Check father and mother handles: %s %s")%(fh, mh))
+        if not fh or not mh:
+            return(None)
+        handle = get_findex().lookup(fh, mh)
+        if handle:
+            return(db.get_family_from_handle(handle))
+        return(None)
+
+    def from_geneanet(self):
+        '''
+        Initiate the GFamily from Geneanet data
+        '''
+        # Once we get the right spouses, then we can have the marriage info
+        idx = 0
+        murl = canonical_url(self.mother.url)
+        for sr in self.father.spouseref:
+            if verbosity >= 3:
+                print(_("Comparing sr %s to %s (idx: %d)")%(sr,self.mother.url,idx))
+            if canonical_url(sr) == murl:
+                if verbosity >= 2:
+                    print(_("Spouse %s found (idx: %d)")%(sr,idx))
+                break
+            idx = idx + 1
+
+        if idx < len(self.father.spouseref):
+            # We found one
+            try:
+                self.g_marriagedate = self.father.marriagedate[idx]
+                self.g_marriageplace = self.father.marriageplace[idx]
+                self.g_marriageplacecode = self.father.marriageplacecode[idx]
+            except:
+                LOG.debug('marriage, father and spouse(%s)' % idx)
+            try:
+                for c in self.father.childref[idx]:
+                    LOG.info(c)
+                    self.g_childref.append(c)
+            except:
+                LOG.debug('child, father and spouse(%s)' % idx)
+            
+
+        if self.g_marriagedate and self.g_marriageplace and self.g_marriageplacecode:
+            if verbosity >= 2:
+                print(_("Geneanet Marriage found the %s at %s (%s)")%(self.g_marriagedate,self.g_marriageplace,self.g_marriageplacecode))
+
+
+    @timed('family.from_gramps')
+    def from_gramps(self,gid):
+        '''
+        Initiate the GFamily from Gramps data
+        '''
+        if verbosity >= 2:
+            print(_("Calling from_gramps with gid: %s")%(gid))
+
+        # If our gid was already setup and we didn't pass one
+        if not gid and self.gid:
+            gid = self.gid
+
+        if verbosity >= 2:
+            print(_("Now gid is: %s")%(gid))
+
+        found = None
+        try:
+            found = db.get_family_from_gramps_id(gid)
+            self.gid = gid
+            self.family = found
+            if verbosity >= 2:
+                print(_("Existing gid of a Gramps Family: %s")%(self.gid))
+        except:
+            if verbosity >= 1:
+                print(_("WARNING: Unable to retrieve id %s from the gramps db %s")%(gid,gname))
+
+        if not found:
+            # If we don't know which family this is, try to find it in Gramps
+            # This supposes that Geneanet data are already present in GFamily
+            self.family = self.find_grampsf()
+            if self.family:
+                if verbosity >= 2:
+                    print(_("Found an existing Gramps family ")+self.family.gramps_id)
+                self.gid = self.family.gramps_id
+            # And if we haven't found it, create it in gramps
+            if self.family == None:
+                self.create_grampsf()
+
+        if self.family:
+            self.marriagedate = self.get_gramps_date(EventType.MARRIAGE)
+            if self.marriagedate == "":
+                self.marriagedate = None
+            for eventref in self.family.get_event_ref_list():
+                event = db.get_event_from_handle(eventref.ref)
+                if (event.get_type() == EventType.MARRIAGE
+                and (eventref.get_role() == EventRoleType.FAMILY
+                or eventref.get_role() == EventRoleType.PRIMARY)):
+                    place = self.get_or_create_place(event,None)
+                    self.marriageplace = place.get_name().value
+                    self.marriageplacecode = place.get_code()
+                    break
+
+            if verbosity >= 2:
+                if self.marriagedate and self.marriageplace and self.marriageplacecode:
+                    print(_("Gramps Marriage found the %s at %s (%s)")%(self.marriagedate,self.marriageplace,self.marriageplacecode))
+
+    @timed('family.to_gramps')
+    def to_gramps(self):
+        '''
+        '''
+        # Smart copy from Geneanet to Gramps inside GFamily
+        self.smartcopy()
+        with writer.transaction() as tran:
+            # When it's not the case create the family
+            if self.family == None:
+                self.family = Family()
+                db.add_family(self.family, tran)
+                session.touch('family')
+
+            try:
+                grampsp0 = db.get_person_from_gramps_id(self.father.gid)
+            except:
+                if verbosity >= 2:
+                    print(_("No father for this family"))
+                grampsp0 = None
+
+            if grampsp0:
+                try:
+                    self.family.set_father_handle(grampsp0.get_handle())
+                except:
+                    if verbosity >= 2:
+                        print(_("Can't affect father to the family"))
+
+                writer.write(self.family)
+                grampsp0.add_family_handle(self.family.get_handle())
+                writer.write(grampsp0)
+                # The copy of the father kept by the identity map is stale
+                self.father.grampsp = grampsp0
+
+            try:
+                grampsp1 = db.get_person_from_gramps_id(self.mother.gid)
+            except:
+                if verbosity >= 2:
+                    print(_("No mother for this family"))
+                grampsp1 = None
+
+            if grampsp1:
+                try:
+                    self.family.set_mother_handle(grampsp1.get_handle())
+                except:
+                    if verbosity >= 2:
+                        print(_("Can't affect mother to the family"))
+
+                writer.write(self.family)
+                grampsp1.add_family_handle(self.family.get_handle())
+                writer.write(grampsp1)
+                self.mother.grampsp = grampsp1
+
+            # Now celebrate the marriage ! (if needed)
+            timelog = _('marriage from Geneanet')
+            self.get_or_create_event(self.family, 'marriage', tran, timelog)
+        get_findex().update(self.family.get_handle(), self.family.get_father_handle(), self.family.get_mother_handle())
+
+    def smartcopy(self):
+        '''
+        Smart Copying GFamily
+        '''
+        if verbosity >= 2:
+            print(_("Smart Copying Family"))
+        self._smartcopy("marriagedate")
+        self._smartcopy("marriageplace")
+        self._smartcopy("marriageplacecode")
+
+    def add_child(self, child):
+        '''
+        Adds a child GPerson child to the GFamily
+        '''
+        found = None
+        i = 0
+        # Avoid handling already processed children in Gramps
+        for cr in self.family.get_child_ref_list():
+            c = db.get_person_from_handle(cr.ref)
+            if c.gramps_id == child.gid:
+                found = child
+                if verbosity >= 1:
+                    print(_("Child already existing : ")+child.firstname+" "+child.lastname)
+                break
+            # Ensure that the child is part of the family
+
+        if not found:
+            if child:
+                if verbosity >= 2:
+                    print(_("Adding child: ")+child.firstname+" "+child.lastname)
+                childref = ChildRef()
+                if child.grampsp:
+                    try:
+                        childref.set_reference_handle(child.grampsp.get_handle())
+                    except:
+                        if verbosity >= 2:
+                            print(_("No handle for this child"))
+                    self.family.add_child_ref(childref)
+                    with writer.transaction() as tran:
+                        writer.write(self.family)
+                        # The child may have been written since it was read,
+                        # with its own families
+                        grampsp = db.get_person_from_handle(child.grampsp.get_handle())
+                        grampsp.add_parent_family_handle(self.family.get_handle())
+                        writer.write(grampsp)
+                        child.grampsp = grampsp
+
+    def recurse_children(self,level):
+        '''
+        analyze the children of the GFamily passed in parameter
+        their own families are queued in the frontier
+        '''
+        try:
+            cpt = len(self.g_childref)
+        except:
+            if verbosity >= 1:
+                print(_("Stopping exploration as there are no more children for family ")+self.fater.firstname+" "+self.father.lastname+" - "+self.mother.firstname+" "+self.mother.lastname)
+            return
+        loop = False
+        # Explore while we have children urls and level not reached
+        if level <= LEVEL and (cpt > 0):
+            loop = True
+            level = level + 1
+
+            if not self.family:
+                print(_("WARNING: No family found whereas there should be one :-("))
+                return
+
+            # Create a GPerson from all children mentioned in Geneanet
+            for c in self.g_childref:
+                child = geneanet_to_gramps(None,level-1,None,c)
+                if not child:
+                    continue
+                if verbosity >= 2:
+                    print(_("=> Exploring the child of ")+self.father.lastname+' - '+self.mother.lastname+': '+child.firstname+' '+child.lastname)
+                self.add_child(child)
+
+                fam = []
+                if spouses:
+                     fam = child.add_spouses(level)
+                     if ascendants:
+                         for f in fam:
+                             if child.sex == 'M':
+                                 frontier.push(GWork('parents', level-1, f.mother))
+                             if child.sex == 'F':
+                                 frontier.push(GWork('parents', level-1, f.father))
+                     if descendants:
+                         for f in fam:
+                             frontier.push(GWork('children', level, f))
+
+        if not loop:
+            if cpt == 0:
+                if verbosity >= 1:
+                    print(_("Stopping exploration for family ")+self.father.firstname+" "+self.father.lastname+' - '+self.mother.firstname+" "+self.mother.lastname+_(" as there are no more children"))
+                return
+
+            if level > LEVEL:
+                if verbosity >= 1:
+                    print(_("Stopping exploration for family ")+self.father.firstname+" "+self.father.lastname+' - '+self.mother.firstname+" "+self.mother.lastname+_(" as we reached level ")+str(level))
+        return
+
+class GPerson(GBase):
+    '''
+    Generic Person common between Gramps and Geneanet
+    '''
+    # Geneanet attributes kept in the records of a crawled graph
+    RECORD = ['level', 'url', 'title', 'g_firstname', 'g_lastname', 'g_sex',
+              'g_birthdate', 'g_birthplace', 'g_birthplacecode',
+              'g_deathdate', 'g_deathplace', 'g_deathplacecode',
+              'spouseref', 'fref', 'mref', 'marriagedate', 'marriageplace',
+              'marriageplacecode', 'childref', 'hash']
+
+    def __init__(self,level):
+        if verbosity >= 3:
+            print(_("Initialize Person at level %d")%(level))
+        # Counter
+        self.level = level
+        # Gramps
+        self.firstname = ""
+        self.lastname = ""
+        self.sex = 'U'
+        self.birthdate = None
+        self.birthplace = None
+        self.birthplacecode = None
+        self.deathdate = None
+        self.deathplace = None
+        self.deathplacecode = None
+        self.gid = None
+        self.grampsp = None
+        # Father and Mother and Spouses GPersons
+        self.father = None
+        self.mother = None
+        self.spouse = []
+        # GFamilies
+        self.family = []
+        # Geneanet
+        self.g_firstname = ""
+        self.g_lastname = ""
+        self.g_sex = 'U'
+        self.g_birthdate = None
+        self.g_birthplace = None
+        self.g_birthplacecode = None
+        self.g_deathdate = None
+        self.g_deathplace = None
+        self.g_deathplacecode = None
+        self.url = ""
+        self.spouseref = []
+        self.fref = ""
+        self.mref = ""
+        self.marriagedate = []
+        self.marriageplace = []
+        self.marriageplacecode = []
+        self.childref = []
+        # Hash of the content of the Geneanet page
+        self.hash = None
+
+    def smartcopy(self):
+        '''
+        Smart Copying GPerson
+        '''
+        if verbosity >= 2:
+            print(_("Smart Copying Person"),self.gid)
+        self._smartcopy("firstname")
+        self._smartcopy("lastname")
+        self._smartcopy("sex")
+        self._smartcopy("birthdate")
+        self._smartcopy("birthplace")
+        self._smartcopy("birthplacecode")
+        self._smartcopy("deathdate")
+        self._smartcopy("deathplace")
+        self._smartcopy("deathplacecode")
+
+    @timed('from_geneanet')
+    def from_geneanet(self, purl):
+        '''
+        Fill the Geneanet data of the GPerson from its page purl
+        The page is parsed by page_parser, unless it was already parsed
+        with the same content
+        '''
+
+        if verbosity >= 3:
+            print(_("Purl:"),purl)
+        if not purl:
+            return()
+        if verbosity >= 1:
+            print("-----------------------------------------------------------")
+            print(_("Page considered:"), purl)
+        content = scheduler.get(purl)
+        if content is None:
+            print(_("We failed to be ok with the server"))
+            return()
+
+        # A page already parsed with the same content is not parsed again
+        phash = page_parser.digest(content)
+        rec = None
+        if cache:
+            rec = cache.get_record(purl, phash)
+        if rec:
+            timings.count('pages not parsed again')
+            if verbosity >= 2:
+                print(_("Page unchanged since last parsed:"), purl)
+        else:
+            with timings.phase('parse'):
+                rec = page_parser.parse(content, purl)
+            if cache:
+                cache.put_record(purl, phash, rec)
+        level = self.level
+        self.from_record(rec)
+        self.level = level
+        self.url = purl
+        # What unchanged compares, only the data extracted matters
+        self.hash = page_parser.record_hash(rec)
+        LOG.debug((purl, self.title))
+
+        if verbosity >= 1:
+            print(_("==> GENEANET Name (L%d): %s %s")%(self.level,self.g_firstname,self.g_lastname))
+        if verbosity >= 2:
+            print(_("Sex:"), self.g_sex)
+            print(_("Birth:"), self.g_birthdate)
+            print(_("Birth place:"), self.g_birthplace)
+            print(_("Birth place code:"), self.g_birthplacecode)
+            print(_("Death:"), self.g_deathdate)
+            print(_("Death place:"), self.g_deathplace)
+            print(_("Death place code:"), self.g_deathplacecode)
+            for s in range(len(self.spouseref)):
+                print(_("Spouse %d ref: %s") %(s, self.spouseref[s]))
+                try:
+                    print(_("Married:"), self.marriagedate[s])
+                    print(_("Married place:"), self.marriageplace[s])
+                    for cnum in range(len(self.childref[s])):
+                        print(_("Child %d ref: %s") %(cnum, self.childref[s][cnum]))
+                except IndexError:
+                    pass
+        if verbosity >= 1:
+            print(_("Parents:"), self.fref, self.mref)
+
+        if verbosity >= 2:
+            print("-----------------------------------------------------------")
+        return(True)
+
+    def record(self):
+        '''
+        Return the Geneanet data of the GPerson as a plain dict
+        '''
+        rec = {}
+        for attr in self.RECORD:
+            rec[attr] = getattr(self, attr, None)
+        rec['title'] = [str(t) for t in getattr(self, 'title', [])]
+        return(rec)
+
+    def from_record(self, rec):
+        '''
+        Initiate the GPerson from a record made by record()
+        '''
+        for attr in self.RECORD:
+            if attr in rec:
+                setattr(self, attr, rec[attr])
+
+    def crawl(self, level, relation):
+        '''
+        Phase 1 of a two-phase import: add the Geneanet data of the person
+        to the graph without touching Gramps, and queue the relatives to
+        crawl as the online import would explore them
+        '''
+        p = graph.get(self.url)
+        if p is None:
+            if not self.from_geneanet(self.url):
+                return
+            graph.add(self)
+            p = self
+        elif level < p.level:
+            p.level = level
+        if level <= LEVEL:
+            if ascendants:
+                for pref in [p.fref, p.mref]:
+                    if pref:
+                        frontier.push(GWork('person', level+1, GPerson(level+1).at(pref)))
+            # The children of a spouse come with the person it was found with
+            if descendants and relation == 'person':
+                for clist in p.childref:
+                    for cref in clist:
+                        if cref:
+                            frontier.push(GWork('person', level+1, GPerson(level+1).at(cref)))
+        # Spouses of spouses are not explored, as online
+        if spouses and relation == 'person':
+            for sref in p.spouseref:
+                if sref:
+                    frontier.push(GWork('spouse', level, GPerson(level).at(sref)))
+
+    def at(self, purl):
+        '''
+        Set the Geneanet URL of the GPerson and return it
+        '''
+        self.url = purl
+        return(self)
+
+    def connexion(self, user, password):
+        '''
+        Login and password set for geneanet servers
+        '''
+        fetcher.login(user, password)
+
+    def unchanged(self):
+        '''
+        Whether the Gramps Person was imported from the same content of its
+        Geneanet page, so that there is nothing to copy again
+        '''
+        if not self.grampsp or not self.hash or force:
+            return(False)
+        for a in self.grampsp.get_attribute_list():
+            if str(a.get_type()) == HASH_ATTR and a.get_value() == self.hash:
+                return(True)
+        return(False)
+
+    def get_handle(self):
+        '''
+        Return the handle of the Gramps Person or None
+        '''
+        if self.grampsp:
+            return(self.grampsp.get_handle())
+        if self.gid:
+            try:
+                return(db.get_person_from_gramps_id(self.gid).get_handle())
+            except:
+                return(None)
+        return(None)
+
+    def create_grampsp(self):
+        '''
+        Create a Person in Gramps and return it
+        '''
+        if plan:
+            # Dry run: to_gramps is never called, plan_graph reports it
+            return
+        with writer.transaction() as tran:
+            grampsp = Person()
+            db.add_person(grampsp, tran)
+            session.touch('person')
+            self.gid = grampsp.gramps_id
+            self.grampsp = grampsp
+            if verbosity >= 1:
+                print(_("Create new Gramps Person: ")+self.gid+' ('+self.g_firstname+' '+self.g_lastname+')')
+        # It will be filled with the Geneanet data
+        get_pindex().update(grampsp.get_handle(), self.g_lastname, self.g_firstname, self.g_birthdate, self.g_deathdate)
+
+
+    @timed('find_grampsp')
+    def find_grampsp(self):
+        '''
+        Find a Person in Gramps and return it
+        The parameter precises the relationship with our person
+        A person already imported from the same Geneanet page is taken
+        first, other candidates come from the index of the Gramps persons
+        by name
+        '''
+        self.grampsp = None
+        handle = get_pindex().lookup_url(self.url)
+        if handle:
+            p = db.get_person_from_handle(handle)
+            if p:
+                self.grampsp = p
+                self.gid = p.gramps_id
+                if verbosity >= 2:
+                    print(_("Found a Gramps Person imported from %s: %s")%(self.url, self.gid))
+                return
+        for handle, bd, dd in get_pindex().lookup(self.g_lastname, self.g_firstname):
+            if verbosity >= 3:
+                print(_("DEBUG: Looking after ")+handle)
+                if not bd:
+                    pbd = "None"
+                else:
+                    pbd = bd
+                if not dd:
+                    pdd = "None"
+                else:
+                    pdd = dd
+                if not self.g_birthdate:
+                    g_pbd = "None"
+                else:
+                    g_pbd = self.g_birthdate
+                if not self.g_deathdate:
+                    g_pdd = "None"
+                else:
+                    g_pdd = self.g_deathdate
+                print(_("DEBUG: bd: ")+pbd+_(" vs g_bd: ")+g_pbd)
+                print(_("DEBUG: dd: ")+pdd+_(" vs g_dd: ")+g_pdd)
+            if not bd and not dd and not self.g_birthdate and not self.g_deathdate:
+                # we skip a person for which we have no date at all
+                # this may create duplicates, but is the best apparoach
+                continue
+            # Dates of saved records may still have an empty month/day
+            # Two missing dates do not make the same person
+            if (bd and bd == format_year(self.g_birthdate)) or (dd and dd == format_year(self.g_deathdate)):
+                p = db.get_person_from_handle(handle)
+                if not p:
+                    continue
+                self.grampsp = p
+                self.gid = p.gramps_id
+                if verbosity >= 2:
+                    print(_("Found a Gramps Person: ")+self.g_firstname+' '+self.g_lastname+ " ("+self.gid+")")
+                # Found it we can exit
+                break
+
+    @timed('person.to_gramps')
+    def to_gramps(self):
+        '''
+        Push into Gramps the GPerson
+        '''
+
+        # Smart copy from Geneanet to Gramps inside GPerson
+        self.smartcopy()
+
+        with writer.transaction() as tran:
+            grampsp = self.grampsp
+            if not grampsp:
+                if verbosity >= 2:
+                    print(_("ERROR: Unable sync unknown Gramps Person"))
+                return
+
+            if self.sex == 'M':
+                grampsp.set_gender(Person.MALE)
+            elif self.sex == 'F':
+                grampsp.set_gender(Person.FEMALE)
+            else:
+                grampsp.set_gender(Person.UNKNOWN)
+
+            n = Name()
+            n.set_type(NameType(NameType.BIRTH))
+            n.set_first_name(self.firstname)
+            s = n.get_primary_surname()
+            s.set_surname(self.lastname)
+            grampsp.set_primary_name(n)
+
+            # We need to create events for Birth and Death
+            for ev in ['birth', 'death']:
+                timelog = _('event from Geneanet')
+                self.get_or_create_event(grampsp, ev, tran, timelog)
+
+            # Store the importation place as an Internet note
+            if self.url != "":
+                found = False
+                for u in grampsp.get_url_list():
+                    if u.get_type() == UrlType.WEB_HOME \
+                    and canonical_url(u.get_path()) == canonical_url(self.url):
+                        found = True
+                if not found:
+                    url = Url()
+                    try:
+                        url.set_description(str(self.title[0]))
+                    except:
+                        url.set_description(_("Geneanet"))
+                    url.set_type(UrlType.WEB_HOME)
+                    url.set_path(self.url)
+                    grampsp.add_url(url)
+
+            # Remember the content imported, see unchanged
+            if self.hash:
+                attr = None
+                for a in grampsp.get_attribute_list():
+                    if str(a.get_type()) == HASH_ATTR:
+                        attr = a
+                if not attr:
+                    attr = Attribute()
+                    attr.set_type(HASH_ATTR)
+                    grampsp.add_attribute(attr)
+                attr.set_value(self.hash)
+
+            writer.write(grampsp)
+        get_pindex().update(grampsp.get_handle(), self.lastname, self.firstname, self.birthdate, self.deathdate)
+        if self.url != "":
+            get_pindex().add_url(grampsp.get_handle(), self.url)
+
+    @timed('person.from_gramps')
+    def from_gramps(self, gid):
+        '''
+        Fill a GPerson with its Gramps data
+        '''
+
+        GENDER = ['F', 'M', 'U']
+
+        if verbosity >= 2:
+            print(_("Calling from_gramps with gid: %s")%(gid))
+
+        # If our gid was already setup and we didn't pass one
+        if not gid and self.gid:
+            gid = self.gid
+
+        if verbosity >= 3:
+            print(_("Now gid is: %s")%(gid))
+
+        found = None
+        try:
+            found = db.get_person_from_gramps_id(gid)
+            self.gid = gid
+            self.grampsp = found
+            if verbosity >= 2 and self.gid:
+                print(_("Existing Gramps Person: %s")%(self.gid))
+        except:
+            if verbosity >= 1:
+                print(_("WARNING: Unable to retrieve id %s from the gramps db %s") %(gid, gname))
+
+        if not found:
+            # If we don't know who this is, try to find it in Gramps
+            # This supposes that Geneanet data are already present in GPerson
+            self.find_grampsp()
+            # And if we haven't found it, create it in gramps
+            if self.grampsp == None:
+                self.create_grampsp()
+
+        if self.grampsp and self.grampsp.gender:
+            self.sex = GENDER[self.grampsp.gender]
+            if verbosity >= 2:
+                print(_("Gender:"),self.sex)
+
+        try:
+            name = self.grampsp.primary_name.get_name().split(', ')
+        except:
+            name = [None, None]
+
+        if name[0]:
+            self.firstname = name[1]
+        if name[1]:
+            self.lastname = name[0]
+        if verbosity >= 2:
+            print(_("===> Gramps Name of %s: %s %s")%(self.gid, self.firstname, self.lastname))
+
+        try:
+            bd = self.get_gramps_date(EventType.BIRTH)
+            if bd:
+                if verbosity >= 2:
+                    print(_("Birth:"),bd)
+                self.birthdate = bd
+            else:
+                if verbosity >= 2:
+                    print(_("No Birth date"))
+        except:
+            if verbosity >= 1:
+                print(_("WARNING: Unable to retrieve birth date for id %s")%(self.gid))
+
+        try:
+            dd = self.get_gramps_date(EventType.DEATH)
+            if dd:
+                if verbosity >= 2:
+                    print(_("Death:"),dd)
+                self.deathdate = dd
+            else:
+                if verbosity >= 2:
+                    print(_("No Death date"))
+        except:
+            if verbosity >= 1:
+                print(_("WARNING: Unable to retrieve death date for id %s")%(self.gid))
+
+        # Deal with the parents now, as they necessarily exist
+        self.father = GPerson(self.level+1)
+        self.mother = GPerson(self.level+1)
+        try:
+            fh = self.grampsp.get_main_parents_family_handle()
+            if fh:
+                if verbosity >= 3:
+                    print(_("Family:"),fh)
+                fam = db.get_family_from_handle(fh)
+                if fam:
+                    if verbosity >= 3:
+                        print(_("Family:"),fam)
+
+                # find father from the family
+                fh = fam.get_father_handle()
+                if fh:
+                    if verbosity >= 3:
+                        print(_("Father H:"),fh)
+                    father = db.get_person_from_handle(fh)
+                    if father:
+                        if verbosity >= 1:
+                            print(_("Father name:"),father.primary_name.get_name())
+                        self.father.gid = father.gramps_id
+
+                # find mother from the family
+                mh = fam.get_mother_handle()
+                if mh:
+                    if verbosity >= 3:
+                        print(_("Mother H:"),mh)
+                    mother = db.get_person_from_handle(mh)
+                    if mother:
+                        if verbosity >= 1:
+                            print(_("Mother name:"),mother.primary_name.get_name())
+                        self.mother.gid = mother.gramps_id
+
+        except:
+            if verbosity >= 1:
+                print(_("NOTE: Unable to retrieve family for id %s")%(self.gid))
+
+    def add_spouses(self,level):
+        '''
+        Add all spouses for this person, with corresponding families
+        returns all the families created in a list
+        '''
+        # Ask for all the spouses pages at once, so that they are
+        # downloaded in parallel
+        known = [canonical_url(s.url) for s in self.spouse]
+        scheduler.prefetch([sref for sref in self.spouseref if canonical_url(sref) not in known])
+        i = 0
+        ret = []
+        while i < len(self.spouseref):
+            spouse = None
+            # Avoid handling already processed spouses
+            for s in self.spouse:
+                if canonical_url(s.url) == canonical_url(self.spouseref[i]):
+                    spouse = s
+                    break
+            if not spouse:
+                spouse = geneanet_to_gramps(None, level, None, self.spouseref[i])
+                if spouse:
+                    self.spouse.append(spouse)
+                    spouse.spouse.append(self)
+                    # Create a GFamily with them and do a Geaneanet to Gramps for it
+                    if verbosity >= 2:
+                        print(_("=> Initialize Family of ")+self.firstname+" "+self.lastname+" + "+spouse.firstname+" "+spouse.lastname)
+                if self.sex == 'M':
+                    f = GFamily(self, spouse)
+                elif self.sex == 'F':
+                    f = GFamily(spouse, self)
+                else:
+                    if verbosity >= 1:
+                        print(_("Unable to Initialize Family of ")+self.firstname+" "+self.lastname+_(" sex unknown"))
+                        break
+
+                f.from_geneanet()
+                f.from_gramps(f.gid)
+                f.to_gramps()
+                self.family.append(f)
+                if spouse:
+                    spouse.family.append(f)
+                ret.append(f)
+            i = i + 1
+        return(ret)
+
+    def recurse_parents(self,level):
+        '''
+        analyze the parents of the person passed in parameter
+        their own parents and families are queued in the frontier
+        '''
+        loop = False
+        # Explore while we have parents urls and level not reached
+        if level <= LEVEL and (self.fref != "" or self.mref != ""):
+            loop = True
+            level = level + 1
+
+            # A parent already processed in this run is reused as is
+            if self.father:
+                father = geneanet_to_gramps(self.father, level, self.father.gid, self.fref)
+                if father:
+                    self.father = father
+
+            if self.mother:
+                mother = geneanet_to_gramps(self.mother, level, self.mother.gid, self.mref)
+                if mother:
+                    self.mother = mother
+
+            if self.father:
+                if self.mother and self.father not in self.mother.spouse:
+                    self.mother.spouse.append(self.father)
+                if verbosity >= 2:
+                    print(_("=> Queuing the parents of ")+self.father.firstname+" "+self.father.lastname)
+                frontier.push(GWork('parents', level, self.father))
+
+            if self.mother:
+                if self.father and self.mother not in self.father.spouse:
+                    self.father.spouse.append(self.mother)
+                if verbosity >= 2:
+                    print(_("=> Queuing the parents of ")+self.mother.firstname+" "+self.mother.lastname)
+                frontier.push(GWork('parents', level, self.mother))
+
+            # Create a GFamily with them and do a Geaneanet to Gramps for it
+            if verbosity >= 2:
+                print(_("=> Initialize Parents Family of ")+self.firstname+" "+self.lastname)
+            f = GFamily(self.father, self.mother)
+            f.from_geneanet()
+            f.from_gramps(f.gid)
+            f.to_gramps()
+            if self.father:
+                self.father.family.append(f)
+            if self.mother:
+                self.mother.family.append(f)
+
+            # Deal with other spouses
+            if spouses:
+                fam = self.father.add_spouses(level)
+                if ascendants:
+                    for ff in fam:
+                        if ff.gid != f.gid:
+                            frontier.push(GWork('parents', level, ff.mother))
+                if descendants:
+                    for ff in fam:
+                        if ff.gid != f.gid:
+                            frontier.push(GWork('children', level, ff))
+                fam = self.mother.add_spouses(level)
+                if ascendants:
+                    for mf in fam:
+                        if mf.gid != f.gid:
+                            frontier.push(GWork('parents', level, mf.father))
+                if descendants:
+                    for mf in fam:
+                        if mf.gid != f.gid:
+                            frontier.push(GWork('children', level, mf))
+
+
+            # The exploration of the children stops at LEVEL, which
+            # this family may be beyond
+            f.add_child(self)
+            if descendants:
+                frontier.push(GWork('children', level, f))
+
+        if not loop:
+            if level > LEVEL:
+                if verbosity >= 2:
+                    print(_("Stopping exploration as we reached level ")+str(level))
+            else:
+                if verbosity >= 1:
+                    print(_("Stopping exploration as there are no more parents"))
+        return
+
+
+class GMismatch(Exception):
+    '''
+    Raised when the Gramps person to import into is not the Geneanet one,
+    without force, to stop the import keeping what was already imported
+    '''
+    pass
+
+def geneanet_to_gramps(p, level, gid, url):
+    '''
+    Function to create a person from Geneanet into gramps
+    '''
+    # Each Geneanet page is fetched and merged only once per run
+    key = canonical_url(url)
+    if key and key in persons:
+        if verbosity >= 2:
+            print(_("Person already processed:"), url)
+        return(persons[key])
+
+    # Create the Person coming from Geneanet
+    if not p:
+        p = GPerson(level)
+    p.from_geneanet(url)
+    return(merge_person(p, gid))
+
+def merge_person(p, gid):
+    '''
+    Merge the GPerson p, with its Geneanet data, into the Gramps person gid
+    or the one matching it, and return it
+    '''
+    global progress
+
+    # Create the Person coming from Gramps
+    # Done after so we can try to find it in Gramps with the Geneanet data
+    p.from_gramps(gid)
+
+    # Check we point to the same person
+    if gid != None:
+        if (p.firstname != p.g_firstname or p.lastname != p.g_lastname) and (not force):
+            print(_("Gramps   person: %s %s")%(p.firstname,p.lastname))
+            print(_("Geneanet person: %s %s")%(p.g_firstname,p.g_lastname))
+            if not GUIMODE and batch is None:
+                raise GMismatch(_("Do not continue without force"))
+            else:
+                return(None)
+
+        # Fix potential empty dates
+        if p.g_birthdate == "":
+            p.g_birthdate = None
+        if p.birthdate == "":
+            p.birthdate = None
+        if p.g_deathdate == "":
+            p.g_deathdate = None
+        if p.deathdate == "":
+            p.deathdate = None
+
+        if p.birthdate == p.g_birthdate or p.deathdate == p.g_deathdate or force:
+            pass
+        else:
+            print(_("Gramps   person birth/death: %s / %s")%(p.birthdate,p.deathdate))
+            print(_("Geneanet person birth/death: %s / %s")%(p.g_birthdate,p.g_deathdate))
+            if not GUIMODE and batch is None:
+                raise GMismatch(_("Do not continue without force"))
+            else:
+                print(_("Please fix the person in gramps"))
+                return(None)
+
+    # Copy from Geneanet into Gramps and commit
+    # unless the page is the one already imported
+    if p.unchanged():
+        if verbosity >= 1:
+            print(_("Gramps Person %s unchanged since the last import")%(p.gid))
+        session.unchanged = session.unchanged + 1
+        timings.count('persons unchanged')
+    else:
+        p.to_gramps()
+    session.imported()
+    key = canonical_url(p.url)
+    if key:
+        persons[key] = p
+    if GUIMODE:
+        progress.set_header(_("Adding Gramps Person %s %s (%s | %s)")%(p.firstname,p.lastname,p.birthdate,p.deathdate))
+        progress.step()
+    return(p)
+
+def crawl(purl):
+    '''
+    Phase 1 of a two-phase import: crawl the requested subtree from
+    Geneanet into a graph, without any access to Gramps
+    '''
+    global graph
+
+    if crawlstate and crawlstate.data:
+        crawlstate.restore()
+    else:
+        graph = GGraph(purl)
+        frontier.push(GWork('person', 0, GPerson(0).at(purl)))
+    frontier.run()
+    if verbosity >= 1:
+        print(_("%d persons crawled from Geneanet")%(len(graph)))
+    return(graph)
+
+def apply_graph(g, gid):
+    '''
+    Phase 2 of a two-phase import: merge the persons of the graph g into
+    Gramps, closest generations first, the root one into the person gid,
+    then create the families between them
+    Return the root GPerson, or None when it could not be merged
+    '''
+    root = canonical_url(g.root)
+    gps = {}
+    for key, p in sorted(g.persons.items(), key=lambda item: (item[1].level, item[0] != root)):
+        if key == root:
+            gp = merge_person(p, gid)
+            if gp is None:
+                # Nothing to attach the other persons to
+                return(None)
+        elif key in persons:
+            # Already merged for a previous subtree of a batch
+            gp = persons[key]
+        else:
+            gp = merge_person(p, None)
+        if gp:
+            gps[key] = gp
+
+    for father, mother, kids in graph_couples(gps):
+        if verbosity >= 2:
+            print(_("=> Initialize Family of ")+father.firstname+" "+father.lastname+" + "+mother.firstname+" "+mother.lastname)
+        f = GFamily(father, mother)
+        f.from_geneanet()
+        f.from_gramps(f.gid)
+        f.to_gramps()
+        father.family.append(f)
+        mother.family.append(f)
+        for c in family_children(f, gps, kids):
+            f.add_child(c)
+    return(gps.get(root))
+
+def graph_couples(gps):
+    '''
+    Return the couples (father, mother, children) between the GPersons gps
+    by canonical URL: the spouses found and the parents of a person
+    '''
+    couples = []
+    children = {}
+    for p in gps.values():
+        for sref in p.spouseref:
+            s = gps.get(canonical_url(sref))
+            if not s:
+                continue
+            if p.sex == 'M':
+                couples.append((p, s))
+            elif p.sex == 'F':
+                couples.append((s, p))
+            elif verbosity >= 1:
+                print(_("Unable to Initialize Family of ")+p.firstname+" "+p.lastname+_(" sex unknown"))
+        father = gps.get(canonical_url(p.fref))
+        mother = gps.get(canonical_url(p.mref))
+        if father and mother:
+            couples.append((father, mother))
+            children.setdefault((canonical_url(father.url), canonical_url(mother.url)), []).append(p)
+
+    ret = []
+    done = set()
+    for father, mother in couples:
+        key = (canonical_url(father.url), canonical_url(mother.url))
+        if key in done:
+            continue
+        done.add(key)
+        ret.append((father, mother, children.get(key, [])))
+    return(ret)
+
+def family_children(f, gps, kids):
+    '''
+    Return the children of the GFamily f among the GPersons gps: kids,
+    whose parents they are, and the ones listed by Geneanet for the couple
+    '''
+    kids = list(kids)
+    for cref in f.g_childref:
+        c = gps.get(canonical_url(cref))
+        if c and c not in kids:
+            kids.append(c)
+    return(kids)
+
+def plan_graph(g, gid):
+    '''
+    Dry run of apply_graph: compute into the plan what it would do,
+    reading Gramps without any transaction
+    '''
+    root = canonical_url(g.root)
+    gps = {}
+    for key, p in sorted(g.persons.items(), key=lambda item: (item[1].level, item[0] != root)):
+        if key == root:
+            p.from_gramps(gid)
+            if p.firstname != p.g_firstname or p.lastname != p.g_lastname:
+                plan.warning(_("Gramps person %s %s is not Geneanet person %s %s")%(p.firstname,p.lastname,p.g_firstname,p.g_lastname))
+        else:
+            p.from_gramps(None)
+        gps[key] = p
+        if p.unchanged():
+            plan.person(p, {})
+            continue
+        plan.person(p, p.plan_smartcopy(['firstname', 'lastname', 'sex', 'birthdate', 'birthplace', 'birthplacecode', 'deathdate', 'deathplace', 'deathplacecode']))
+        for ev in ['birth', 'death']:
+            p.plan_place(ev)
+
+    for father, mother, kids in graph_couples(gps):
+        f = GFamily(father, mother)
+        f.from_geneanet()
+        f.from_gramps(f.gid)
+        fields = f.plan_smartcopy(['marriagedate', 'marriageplace', 'marriageplacecode'])
+        f.plan_place('marriage')
+        existing = []
+        if f.family:
+            for cr in f.family.get_child_ref_list():
+                existing.append(cr.ref)
+        added = []
+        for c in family_children(f, gps, kids):
+            if not c.get_handle() or c.get_handle() not in existing:
+                added.append(c.g_firstname+" "+c.g_lastname)
+        plan.family(f, fields, added)
+
+def open_crawler():
+    '''
+    Prepare the Geneanet side of an import: page cache, downloads
+    and exploration
+    '''
+    global cache
+    global fetcher
+    global scheduler
+    global frontier
+
+    cache = GPageCache(CACHE_DIR, CACHE_MODE, CACHE_TTL, CACHE_SIZE)
+    fetcher = GFetcher(cache, USER, PASSWORD)
+    scheduler = GScheduler(fetcher, RATE, CONCURRENCY, WORKERS)
+    frontier = GFrontier(ORDER)
+
+def close_crawler():
+    global cache
+    global fetcher
+    global scheduler
+    global frontier
+
+    frontier = None
+    scheduler.close()
+    scheduler = None
+    fetcher.close()
+    fetcher = None
+    cache.close()
+    cache = None
+
+def open_import():
+    '''
+    Prepare the Gramps side of an import: indexes, batched writes
+    and signals
+    '''
+    global persons
+    global pindex
+    global findex
+    global plindex
+    global tags
+    global writer
+    global session
+
+    persons = {}
+    # The database may have changed since the last run
+    pindex = None
+    findex = None
+    plindex = None
+    tags = None
+    writer = GWriteBatch(COMMIT_EVERY)
+    session = GImportSession(CHECKPOINT)
+    session.start()
+
+def close_import(exc_info=None):
+    '''
+    Commit what is left to write, or abort it when the import failed
+    with exc_info, and refresh the Gramps views
+    An import stopped on a GMismatch keeps what was already imported
+    '''
+    if exc_info and not issubclass(exc_info[0], GMismatch):
+        writer.abort(*exc_info)
+        session.end()
+        return
+    writer.commit()
+    session.end()
+    if verbosity >= 1:
+        print(_("%d Gramps objects written in %d transactions")%(writer.writes, writer.transactions))
+        print(_("%d persons unchanged since the last import")%(session.unchanged))
+
+def import_graph(g, gid):
+    '''
+    Apply the crawled graph g into Gramps
+    '''
+    open_import()
+    try:
+        apply_graph(g, gid)
+    except BaseException:
+        close_import(sys.exc_info())
+        raise
+    close_import()
+
+def plan_import(g, gid):
+    '''
+    Report what applying the crawled graph g into Gramps would do,
+    and return the GPlan
+    '''
+    global persons
+    global pindex
+    global findex
+    global plindex
+    global plan
+
+    persons = {}
+    pindex = None
+    findex = None
+    plindex = None
+    plan = GPlan()
+    try:
+        plan_graph(g, gid)
+        plan.report()
+        # The counts of each row are in the report of a batch
+        if PLAN_FILE and batch is None:
+            plan.save(PLAN_FILE)
+        return(plan)
+    finally:
+        plan = None
+
+def import_root(gid, purl):
+    '''
+    Import the person purl into the Gramps person gid, then the relatives
+    asked for, once the crawler and the import are opened
+    Return the root GPerson, or None when it could not be imported
+    '''
+    # Create the first Person
+    gp = geneanet_to_gramps(None,0, gid, purl)
+
+    if gp != None:
+        if ascendants:
+            frontier.push(GWork('parents', 0, gp))
+
+        fam = []
+        if spouses:
+            fam = gp.add_spouses(0)
+        else:
+            # TODO: If we don't ask for spouses, we won't get children at all
+            pass
+
+        if descendants:
+            for f in fam:
+                frontier.push(GWork('children', 0, f))
+
+        frontier.run()
+    return(gp)
+
+def g2gbatch(path):
+    '''
+    Import the subtrees listed in the batch file path, see GBatch
+    '''
+    global batch
+
+    timings.reset()
+    batch = GBatch()
+    batch.load(path)
+    open_crawler()
+    if not DRY_RUN:
+        open_import()
+    try:
+        batch.run()
+    except BaseException:
+        if not DRY_RUN:
+            close_import(sys.exc_info())
+        close_crawler()
+        batch = None
+        raise
+    if not DRY_RUN:
+        close_import()
+    close_crawler()
+    batch.report()
+    if BATCH_REPORT:
+        batch.save(BATCH_REPORT)
+    batch = None
+    report_timings()
+
+def g2gaction(gid, purl):
+    '''
+    Import the person purl into the Gramps person gid with its relatives
+    Return the GPlan of a dry run, None otherwise
+    '''
+    global progress
+
+    ret = None
+
+    timings.reset()
+    open_crawler()
+    if crawlstate and not crawlstate.data:
+        crawlstate.root = purl
+        crawlstate.gid = gid
+        crawlstate.phase = 'crawl' if TWO_PHASE else 'import'
+    if TWO_PHASE or DRY_RUN:
+        # Nothing is written into Gramps while crawling
+        try:
+            if crawlstate and crawlstate.phase == 'apply':
+                # Crawled by the interrupted import
+                crawlstate.restore()
+                g = graph
+            else:
+                g = crawl(purl)
+        finally:
+            close_crawler()
+        if DRY_RUN:
+            ret = plan_import(g, gid)
+        else:
+            if crawlstate:
+                crawlstate.phase = 'apply'
+                crawlstate.save()
+            import_graph(g, gid)
+    else:
+        open_import()
+        try:
+            if crawlstate and crawlstate.data:
+                crawlstate.restore()
+                frontier.run()
+            else:
+                import_root(gid, purl)
+        except BaseException:
+            close_import(sys.exc_info())
+            if crawlstate:
+                # Keep what was committed at the last checkpoint, the
+                # explorations since are done again when resuming
+                crawlstate.save()
+            close_crawler()
+            raise
+        close_import()
+        close_crawler()
+    if crawlstate:
+        crawlstate.done()
+    report_timings()
+    if GUIMODE:
+        progress.close()
+    return(ret)
+
+def main():
+
+    # global allow local modification of these global variables
+    global db
+    global gname
+    global verbosity
+    global force
+    global ascendants
+    global descendants
+    global spouses
+    global LEVEL
+    global CACHE_MODE
+    global CACHE_TTL
+    global CACHE_SIZE
+    global CACHE_DIR
+    global USER
+    global PASSWORD
+    global RATE
+    global CONCURRENCY
+    global WORKERS
+    global ORDER
+    global INDEX_FILE
+    global PLACE_MATCH
+    global COMMIT_EVERY
+    global TWO_PHASE
+    global DRY_RUN
+    global PLAN_FILE
+    global TIMINGS_FILE
+    global PROFILE
+    global PROFILE_TOP
+    global PROFILE_MEMORY
+    global BATCH_REPORT
+    global STATE_FILE
+    global STATE_EVERY
+    global RETRIES
+    global BACKOFF
+    global crawlstate
+
+
+    parser = argparse.ArgumentParser(description=_("Import Geneanet subtrees into Gramps"))
+    parser.add_argument("-v", "--verbosity", action="count", default=0, help=_("Increase verbosity"))
+    parser.add_argument("-a", "--ascendants", default=False, action='store_true', help=_("Includes ascendants (off by default)"))
+    parser.add_argument("-d", "--descendants", default=False, action='store_true', help=_("Includes descendants (off by default)"))
+    parser.add_argument("-s", "--spouses", default=False, action='store_true', help=_("Includes all spouses (off by default)"))
+    parser.add_argument("-l", "--level", default=2, type=int, help=_("Number of level to explore (2 by default)"))
+    parser.add_argument("-g", "--grampsfile", type=str, help=_("Full path of the Gramps database (under $HOME/.gramps/grampsdb)"))
+    parser.add_argument("-i", "--id", type=str, help=_("ID of the person to start from in Gramps"))
+    parser.add_argument("-f", "--force", default=False, action='store_true', help=_("Force processing"))
+    parser.add_argument("-c", "--cache", default=CACHE_MODE, choices=list(CACHE_MODES), help=_("Page cache mode: normal, only (no network), refresh or bypass (normal by default)"))
+    parser.add_argument("--cache-ttl", default=CACHE_TTL, type=int, help=_("Number of days a cached page stays valid (7 by default)"))
+    parser.add_argument("--cache-size", default=CACHE_SIZE, type=int, help=_("Maximum size of the page cache in MB (100 by default)"))
+    parser.add_argument("--cache-dir", default=CACHE_DIR, type=str, help=_("Directory of the page cache"))
+    parser.add_argument("--rate", default=RATE, type=int, help=_("Maximum number of pages per minute for a same Geneanet tree (12 by default)"))
+    parser.add_argument("--concurrency", default=CONCURRENCY, type=int, help=_("Maximum number of parallel requests for a same Geneanet tree (1 by default)"))
+    parser.add_argument("--retries", default=RETRIES, type=int, help=_("Number of retries of a failed request to Geneanet (4 by default)"))
+    parser.add_argument("--backoff", default=BACKOFF, type=float, help=_("Seconds before the first retry, doubled for each next one (2 by default)"))
+    parser.add_argument("--workers", default=WORKERS, type=int, help=_("Number of downloading threads (4 by default)"))
+    parser.add_argument("-o", "--order", default=ORDER, choices=list(ORDERS), help=_("Exploration order: bfs (breadth first), dfs (depth first) or priority (closest generations first) (bfs by default)"))
+    parser.add_argument("--commit-every", default=COMMIT_EVERY, type=int, help=_("Number of imported objects per Gramps transaction, 0 for a single transaction (100 by default)"))
+    parser.add_argument("--place-match", default=PLACE_MATCH, choices=list(PLACE_MATCHES), help=_("How place names are compared: exact, case (ignore case) or accents (ignore case and accents) (case by default)"))
+    parser.add_argument("--index", type=str, help=_("File where to keep the index of the Gramps persons between runs, to remove after editing persons in Gramps"))
+    parser.add_argument("--two-phase", default=False, action='store_true', help=_("Crawl the whole subtree from Geneanet before writing into Gramps"))
+    parser.add_argument("--crawl-only", type=str, metavar="FILE", help=_("Only crawl the subtree from Geneanet and save it into FILE, without Gramps"))
+    parser.add_argument("--apply", type=str, metavar="FILE", help=_("Apply into Gramps the subtree crawled into FILE by --crawl-only"))
+    parser.add_argument("-n", "--dry-run", default=False, action='store_true', help=_("Only report what the import would do, without writing into Gramps"))
+    parser.add_argument("--plan", type=str, metavar="FILE", help=_("Write the report of --dry-run as JSON into FILE (- for the standard output)"))
+    parser.add_argument("--batch", type=str, metavar="FILE", help=_("Import the subtrees listed in the CSV or JSONL FILE, with the columns url, id, depth and direction (letters a, d and s)"))
+    parser.add_argument("--batch-report", type=str, metavar="FILE", help=_("Write the result of each row of --batch as JSON into FILE (- for the standard output)"))
+    parser.add_argument("--resume", default=False, action='store_true', help=_("Continue the interrupted import saved into the state file"))
+    parser.add_argument("--state", default=STATE_FILE, type=str, metavar="FILE", help=_("File where the state of the import is saved to resume it"))
+    parser.add_argument("--state-every", default=STATE_EVERY, type=int, help=_("Number of seconds between two saves of the state of the import, 0 to never save it (30 by default)"))
+    parser.add_argument("--timings", type=str, metavar="FILE", help=_("Write the time spent in each phase of the import as JSON into FILE (- for the standard output)"))
+    parser.add_argument("--profile", type=str, metavar="FILE", help=_("Profile the import into FILE, with a summary of the hot functions into FILE.txt"))
+    parser.add_argument("--profile-top", default=PROFILE_TOP, type=int, help=_("Number of functions and allocations in the profile summary (25 by default)"))
+    parser.add_argument("--profile-memory", default=False, action='store_true', help=_("Also trace the memory allocations of the import into FILE.heap"))
+    parser.add_argument("-u", "--user", type=str, help=_("Geneanet account used to log in (not stored)"))
+    parser.add_argument("-p", "--password", type=str, help=_("Password of the Geneanet account (not stored)"))
+    parser.add_argument("searchedperson", type=str, nargs='?', help=_("Url of the person to search in Geneanet"))
+    args = parser.parse_args()
+
+    if args.batch and (args.apply or args.crawl_only or args.searchedperson):
+        parser.error(_("--batch gives the persons to import"))
+    if args.apply or args.batch or args.resume:
+        # The person comes with the crawled subtree, the batch file
+        # or the state of the import
+        purl = None
+    elif args.searchedperson == None:
+        #purl = 'https://gw.geneanet.org/agnesy?lang=fr&pz=hugo+mathis&nz=renard&p=marie+sebastienne&n=helgouach'
+        #purl = 'https://gw.geneanet.org/agnesy?lang=fr&n=queffelec&oc=17&p=marie+anne'
+        print(_("Please provide a person to search for"))
+        sys.exit(-1)
+    else:
+        purl = args.searchedperson
+
+    gname = args.grampsfile
+    verbosity = args.verbosity
+    force = args.force
+    ascendants = args.ascendants
+    descendants = args.descendants
+    spouses = args.spouses
+    LEVEL = args.level
+    CACHE_MODE = args.cache
+    CACHE_TTL = args.cache_ttl
+    CACHE_SIZE = args.cache_size
+    CACHE_DIR = args.cache_dir
+    RATE = args.rate
+    CONCURRENCY = args.concurrency
+    WORKERS = args.workers
+    RETRIES = args.retries
+    BACKOFF = args.backoff
+    ORDER = args.order
+    INDEX_FILE = args.index
+    PLACE_MATCH = args.place_match
+    COMMIT_EVERY = args.commit_every
+    USER = args.user
+    PASSWORD = args.password
+    TWO_PHASE = args.two_phase
+    DRY_RUN = args.dry_run
+    PLAN_FILE = args.plan
+    TIMINGS_FILE = args.timings
+    BATCH_REPORT = args.batch_report
+    STATE_FILE = args.state
+    STATE_EVERY = args.state_every
+
+    if args.resume:
+        crawlstate = GCrawlState(STATE_FILE, STATE_EVERY)
+        if not crawlstate.load():
+            print(_("No import to resume in %s")%(STATE_FILE))
+            sys.exit(-1)
+        purl = crawlstate.root
+        LEVEL = crawlstate.options['LEVEL']
+        ascendants = crawlstate.options['ascendants']
+        descendants = crawlstate.options['descendants']
+        spouses = crawlstate.options['spouses']
+        ORDER = crawlstate.options['ORDER']
+        TWO_PHASE = crawlstate.options['TWO_PHASE']
+    elif STATE_EVERY and not (DRY_RUN or args.batch or args.apply or args.crawl_only):
+        crawlstate = GCrawlState(STATE_FILE, STATE_EVERY)
+    PROFILE = args.profile
+    PROFILE_TOP = args.profile_top
+    PROFILE_MEMORY = args.profile_memory
+
+    if args.crawl_only:
+        # No Gramps database needed to crawl
+        open_crawler()
+        try:
+            g = crawl(purl)
+        finally:
+            close_crawler()
+        g.save(args.crawl_only)
+        report_timings()
+        sys.exit(0)
+
+    # TODO: do a backup before opening and remove fixed path
+    if gname == None:
+        #gname = "Test import"
+        # To be searched in ~/.gramps/recent-files-gramps.xml
+        #gname = "/users/bruno/.gramps/grampsdb/5ec17554"
+        print(_("Please provide a grampsfile to search into"))
+        sys.exit(-1)
+    try:
+        dbstate = DbState()
+        climanager = CLIManager(dbstate, True, None)
+        climanager.open_activate(gname)
+        db = dbstate.db
+    except:
+        print(_("Opening the '%s' database") % gname)
+        print(_("An attempt to convert the database failed. "
+                "Perhaps it needs updating."))
+        sys.exit(-1)
+
+    gid = args.id
+    if gid == None:
+        gid = "0000"
+    gid = "I"+gid
+    if args.resume:
+        gid = crawlstate.gid
+
+    ids = db.get_person_gramps_ids()
+    for i in ids:
+        if verbosity >= 3:
+            print(_("DEBUG: existing gramps id:")+i)
+
+    if verbosity >= 1 and force:
+        print(_("WARNING: Force mode activated"))
+        time.sleep(TIMEOUT)
+
+    ret = 0
+    try:
+        if args.apply:
+            g = GGraph()
+            g.load(args.apply)
+            if DRY_RUN:
+                profiled(plan_import, g, gid)
+            else:
+                profiled(import_graph, g, gid)
+            report_timings()
+        elif args.batch:
+            profiled(g2gbatch, args.batch)
+        else:
+            profiled(g2gaction, gid, purl)
+    except GMismatch as e:
+        ret = str(e)
+
+    if INDEX_FILE and pindex:
+        pindex.save(INDEX_FILE, db_signature())
+    db.close()
+    sys.exit(ret)
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+End-to-end benchmark of an import (fetch, parse, match, write)
+Runs g2gaction against the local stand-in of Geneanet of geneweb_server.py
+into a throwaway Gramps database, and reports persons per minute, requests
+per person and Gramps commits per person
+The database is then checked against the tree served, the benchmark
+failing when persons, couples or parents differ
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from gramps.gen.dbstate import DbState
+from gramps.cli.clidbman import CLIDbManager
+from gramps.cli.grampscli import CLIManager
+
+import GeneanetCore as g2g
+import geneweb_server
+
+def pid(person):
+    '''
+    Return the id in the synthetic tree of the page person was imported
+    from, None when not from a single page of the stand-in
+    '''
+    ids = set()
+    for u in person.get_url_list():
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(u.get_path()).query)
+        ids.update(query.get('i', []))
+    if len(ids) != 1:
+        return(None)
+    return(ids.pop())
+
+def check(db, tree, complete):
+    '''
+    Return the differences between the Gramps database db and the synthetic
+    tree it was imported from: persons, couples and parents
+    With complete, all the persons of the tree are expected
+    '''
+    errors = []
+    ids = {}
+    for p in db.iter_people():
+        i = pid(p)
+        name = p.get_primary_name()
+        if i is None or not tree.exists(i):
+            errors.append("%s is not a person of the tree (%s)" % (p.gramps_id, ', '.join([u.get_path() for u in p.get_url_list()])))
+        elif i in ids.values():
+            errors.append("%s imported several times" % i)
+        elif (name.get_first_name(), name.get_surname()) != (tree.firstname(i), tree.lastname(i)):
+            errors.append("%s imported as %s %s" % (i, name.get_first_name(), name.get_surname()))
+        ids[p.get_handle()] = i
+    if complete:
+        missing = set(tree.persons()) - set(ids.values())
+        if missing:
+            errors.append("%d persons not imported: %s" % (len(missing), ' '.join(sorted(missing))))
+    couples = set()
+    for f in db.iter_families():
+        father = ids.get(f.get_father_handle())
+        mother = ids.get(f.get_mother_handle())
+        if (father, mother) in couples:
+            errors.append("%s: couple %s %s imported several times" % (f.gramps_id, father, mother))
+        couples.add((father, mother))
+        if father and mother and mother not in [s for s, c in tree.unions(father)]:
+            errors.append("%s: %s and %s are not a couple" % (f.gramps_id, father, mother))
+        for cr in f.get_child_ref_list():
+            child = ids.get(cr.ref)
+            if child and tuple([x for x in tree.parents(child) or [] if x in [father, mother]]) != (father, mother):
+                errors.append("%s: %s is not a child of %s and %s" % (f.gramps_id, child, father, mother))
+    for h, i in ids.items():
+        parents = tree.parents(i) if i else None
+        if not parents or not all([x in ids.values() for x in parents]):
+            continue
+        found = []
+        for fh in db.get_person_from_handle(h).get_parent_family_handle_list():
+            f = db.get_family_from_handle(fh)
+            found.append((ids.get(f.get_father_handle()), ids.get(f.get_mother_handle())))
+        if tuple(parents) not in found:
+            errors.append("%s: parents %s and %s not linked (%s)" % (i, parents[0], parents[1], found))
+    return(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a whole import against a local Geneanet stand-in")
+    geneweb_server.add_arguments(parser)
+    parser.add_argument("-v", "--verbosity", action="count", default=0, help="Increase verbosity of the import")
+    parser.add_argument("-l", "--level", default=4, type=int, help="Number of level to explore (4 by default)")
+    parser.add_argument("--lang", default='en', choices=['en', 'fr'], help="Language of the pages (en by default)")
+    parser.add_argument("--rate", default=6000, type=int, help="Maximum number of pages per minute (6000 by default)")
+    parser.add_argument("--concurrency", default=g2g.CONCURRENCY, type=int, help="Maximum number of parallel requests")
+    parser.add_argument("--workers", default=g2g.WORKERS, type=int, help="Number of downloading threads")
+    parser.add_argument("-o", "--order", default=g2g.ORDER, choices=list(g2g.ORDERS), help="Exploration order")
+    parser.add_argument("--commit-every", default=g2g.COMMIT_EVERY, type=int, help="Number of imported objects per Gramps transaction")
+    parser.add_argument("--two-phase", default=False, action='store_true', help="Crawl the whole tree before writing into Gramps")
+    parser.add_argument("--login", default=False, action='store_true', help="Log in to the stand-in, for --login-rate")
+    parser.add_argument("--keep", default=False, action='store_true', help="Keep the Gramps database created")
+    parser.add_argument("--json", type=str, metavar="FILE", help="Also write the results as JSON into FILE")
+    args = parser.parse_args()
+
+    server = geneweb_server.from_arguments(args)
+    purl = '%s%s?lang=%s&i=a1' % (server.url, geneweb_server.OWNER, args.lang)
+
+    dbstate = DbState()
+    dbman = CLIDbManager(dbstate)
+    path, title = dbman.create_new_db_cli("GeneanetForGramps benchmark %s" % time.strftime("%Y-%m-%d %H:%M:%S"), dbid="sqlite")
+    climanager = CLIManager(dbstate, True, None)
+    climanager.open_activate(path)
+
+    g2g.db = dbstate.db
+    g2g.gname = path
+    g2g.verbosity = args.verbosity
+    g2g.ascendants = True
+    g2g.descendants = True
+    g2g.spouses = True
+    g2g.LEVEL = args.level
+    g2g.CACHE_MODE = 'bypass'
+    g2g.RATE = args.rate
+    g2g.CONCURRENCY = args.concurrency
+    g2g.WORKERS = args.workers
+    g2g.ORDER = args.order
+    g2g.COMMIT_EVERY = args.commit_every
+    g2g.TWO_PHASE = args.two_phase
+    g2g.LOGIN_URL = server.url + 'connexion/'
+    if args.login:
+        g2g.USER = 'bench'
+        g2g.PASSWORD = 'bench'
+
+    try:
+        start = time.perf_counter()
+        g2g.g2gaction(None, purl)
+        elapsed = time.perf_counter() - start
+
+        persons = g2g.db.get_number_of_people()
+        results = {
+            'tree': server.tree.size(),
+            'persons': persons,
+            'families': g2g.db.get_number_of_families(),
+            'seconds': elapsed,
+            'persons_per_minute': 60.0 * persons / elapsed,
+            'requests_per_person': server.stats.get('requests', 0) / max(persons, 1),
+            'commits_per_person': g2g.writer.transactions / max(persons, 1),
+            'writes_per_person': g2g.writer.writes / max(persons, 1),
+            'timings': g2g.timings.to_dict(),
+            'server': server.stats,
+            # The tree is wholly imported when the level covers it
+            'errors': check(g2g.db, server.tree, args.level > max(args.generations, args.descendants)),
+            }
+    finally:
+        g2g.db.close()
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+    print("%d persons and %d families imported out of %d in %.1f s" % (results['persons'], results['families'], results['tree'], results['seconds']))
+    print("%-22s %10.1f" % ("persons per minute", results['persons_per_minute']))
+    print("%-22s %10.2f" % ("requests per person", results['requests_per_person']))
+    print("%-22s %10.2f" % ("commits per person", results['commits_per_person']))
+    print("%-22s %10.2f" % ("writes per person", results['writes_per_person']))
+    print("server: %s" % ', '.join(["%s %d" % (k, v) for k, v in sorted(server.stats.items())]))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fd:
+            json.dump(results, fd, indent=1)
+    # The figures of a wrong import are meaningless
+    if results['errors']:
+        for error in results['errors']:
+            print("ERROR: %s" % error)
+        sys.exit("The import does not match the tree served: %d errors" % len(results['errors']))
+
+if __name__ == '__main__':
+    main()
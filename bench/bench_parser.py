@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Offline benchmark of the Geneanet parser hot path
+Runs page_parser.parse, GPerson.from_geneanet and convert_date on the
+Geneanet person pages saved in bench/fixtures and reports pages per second
+and memory allocated per page
+Gramps is needed as for the plugin itself, the network is not
+"""
+import os
+import sys
+import time
+import glob
+import json
+import argparse
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import GeneanetCore as g2g
+
+# Date lines as split by the parser, english and french ones
+DATES = [
+    'Born 3 March 1850',
+    'Deceased 12 November 1910',
+    'Married 1 June 1875',
+    'Born about 1790',
+    'Deceased before 1860',
+    'Né le 1er janvier 1801',
+    'Décédé le 17 août 1870',
+    'Marié en 1838',
+    'Marié vers 1850',
+    ]
+
+class FixtureScheduler:
+    '''
+    Stands for GScheduler: serves the fixture pages instead of Geneanet
+    '''
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get(self, purl):
+        return(self.pages.get(purl))
+
+    def prefetch(self, urls):
+        pass
+
+def load_fixtures(path):
+    '''
+    Return the content of the saved pages of path by fixture name
+    '''
+    pages = {}
+    for f in sorted(glob.glob(os.path.join(path, '*.html'))):
+        with open(f, 'rb') as fd:
+            pages[os.path.basename(f)[:-5]] = fd.read()
+    return(pages)
+
+def fixture_url(name):
+    return('https://gw.geneanet.org/bench?fixture='+name)
+
+def measure(func, args, number):
+    '''
+    Return the calls per second of func(*args), and the peak and retained
+    memory in KB of one call
+    '''
+    func(*args)
+    start = time.perf_counter()
+    for i in range(number):
+        func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    ret = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ret
+    return({'per_second': number / elapsed, 'peak_kb': (peak - base) / 1024, 'retained_kb': (current - base) / 1024})
+
+def convert(line):
+    '''
+    Convert a date line as the parser does, None when it fails
+    '''
+    try:
+        return(g2g.convert_date(line.split()[1:]))
+    except ValueError:
+        return(None)
+
+def from_geneanet(purl):
+    p = g2g.GPerson(0)
+    p.from_geneanet(purl)
+    return(p)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Geneanet parser on saved pages")
+    parser.add_argument("-n", "--number", default=200, type=int, help="Number of runs of each measure (200 by default)")
+    parser.add_argument("--fixtures", default=FIXTURES, type=str, help="Directory of the saved Geneanet pages")
+    parser.add_argument("--json", type=str, metavar="FILE", help="Also write the results as JSON into FILE, to compare runs")
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        sys.exit("No fixture found in "+args.fixtures)
+    g2g.verbosity = 0
+    g2g.spouses = False
+    g2g.cache = None
+    g2g.scheduler = FixtureScheduler(dict([(fixture_url(name), content) for name, content in pages.items()]))
+
+    results = {}
+    print("%-28s %-14s %10s %10s %12s"%("fixture", "function", "pages/s", "peak KB", "retained KB"))
+    for name, content in pages.items():
+        for fname, func, fargs in [
+                ('parse', g2g.page_parser.parse, (content, fixture_url(name))),
+                ('from_geneanet', from_geneanet, (fixture_url(name),)),
+                ]:
+            r = measure(func, fargs, args.number)
+            results[name+':'+fname] = r
+            print("%-28s %-14s %10.1f %10.1f %12.1f"%(name, fname, r['per_second'], r['peak_kb'], r['retained_kb']))
+
+    failed = [line for line in DATES if convert(line) is None]
+    r = measure(lambda: [convert(line) for line in DATES], (), args.number)
+    r['per_second'] = r['per_second'] * len(DATES)
+    r['failed'] = len(failed)
+    results['dates:convert_date'] = r
+    print("%-28s %-14s %10.1f %10.1f %12.1f"%("dates", "convert_date", r['per_second'], r['peak_kb'], r['retained_kb']))
+    if failed:
+        print("convert_date failed on %d of %d dates: %s"%(len(failed), len(DATES), ', '.join(failed)))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fd:
+            json.dump(results, fd, indent=1)
+
+if __name__ == '__main__':
+    main()
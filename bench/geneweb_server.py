@@ -0,0 +1,388 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Local stand-in for Geneanet, serving a synthetic GeneWeb tree
+Person pages are generated on the fly as /bench?lang=en&i=<id>, with the
+same structure as the real ones, for a tree of configurable size:
+ascendants up to a number of generations, with siblings, and descendants
+of the root person (a1) with their spouses
+Latency, errors and redirections to the login page can be simulated
+"""
+import sys
+import time
+import zlib
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OWNER = 'bench'
+
+MONTHS = {
+    'en': ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December'],
+    'fr': ['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet',
+           'août', 'septembre', 'octobre', 'novembre', 'décembre'],
+    }
+LABELS = {
+    'en': {'M': {'born': 'Born', 'deceased': 'Deceased', 'married': 'Married'},
+           'F': {'born': 'Born', 'deceased': 'Deceased', 'married': 'Married'},
+           'on': '', 'parents': 'Parents', 'unions': 'Spouses and children'},
+    'fr': {'M': {'born': 'Né', 'deceased': 'Décédé', 'married': 'Marié'},
+           'F': {'born': 'Née', 'deceased': 'Décédée', 'married': 'Mariée'},
+           'on': 'le ', 'parents': 'Parents', 'unions': 'Union(s) et enfant(s)'},
+    }
+FIRSTNAMES = {
+    'M': ['Jean', 'Pierre', 'Louis', 'Yves', 'Joseph', 'François', 'Paul', 'Henri', 'Jacques', 'René'],
+    'F': ['Marie', 'Anne', 'Jeanne', 'Catherine', 'Françoise', 'Louise', 'Rose', 'Marguerite', 'Hélène', 'Julie'],
+    }
+LASTNAMES = ['Martin', 'Le Gall', 'Durand', 'Queffelec', 'Le Bihan', 'Guillou', 'Cloarec', 'Tanguy',
+             'Morvan', 'Le Goff', 'Riou', 'Kerautret', 'Jaouen', 'Prigent', 'Salaun', 'Abiven']
+PLACES = [('Rennes', '35000'), ('Brest', '29200'), ('Quimper', '29000'), ('Morlaix', '29600'),
+          ('Lannion', '22300'), ('Vannes', '56000'), ('Lorient', '56100'), ('Paris', '75000')]
+
+class SyntheticTree:
+    '''
+    Deterministic family tree, persons being identified by:
+    a<n>      ascendant of sosa number n, a1 being the root person
+    s<n>_<k>  k-th sibling of a<n>
+    d<path>   descendant of the root, d1_2 being the 2nd child of d1
+    w<id>     spouse of the person id (a1 or a descendant)
+    '''
+    def __init__(self, generations=3, descendants=2, children=3, missing=0.1, seed=0):
+        self.generations = generations
+        self.descendants = descendants
+        self.children = children
+        self.missing = missing
+        self.seed = seed
+
+    def rand(self, pid, what):
+        '''
+        Return a float in [0, 1) always the same for pid and what
+        '''
+        return(zlib.crc32(('%s:%s:%s' % (self.seed, pid, what)).encode()) / 4294967296.0)
+
+    @staticmethod
+    def generation(n):
+        return(n.bit_length() - 1)
+
+    def exists(self, pid):
+        try:
+            if pid[0] == 'a':
+                return(int(pid[1:]) >= 1 and self.generation(int(pid[1:])) <= self.generations)
+            elif pid[0] == 's':
+                n, k = [int(x) for x in pid[1:].split('_')]
+                return(self.exists('a%d' % n) and self.generation(n) < self.generations and 1 <= k < self.children)
+            elif pid[0] == 'd':
+                path = [int(x) for x in pid[1:].split('_')]
+                return(len(path) <= self.descendants and min(path) >= 1 and max(path) <= self.children)
+            elif pid[0] == 'w':
+                # Only the persons with children have a spouse
+                return((pid[1:] == 'a1' or (pid[1] == 'd' and self.exists(pid[1:]))) and self.depth(pid[1:]) < self.descendants)
+        except (ValueError, IndexError):
+            pass
+        return(False)
+
+    def sex(self, pid):
+        if pid[0] == 'a':
+            n = int(pid[1:])
+            return('M' if n == 1 or n % 2 == 0 else 'F')
+        elif pid[0] == 'w':
+            return('F' if self.sex(pid[1:]) == 'M' else 'M')
+        return('M' if self.rand(pid, 'sex') < 0.5 else 'F')
+
+    def lastname(self, pid):
+        if pid[0] == 'a':
+            # Paternal line: strip the fathers to find whose name it is
+            n = int(pid[1:])
+            while n % 2 == 0:
+                n = n // 2
+            return(LASTNAMES[n % len(LASTNAMES)])
+        elif pid[0] == 's':
+            return(self.lastname('a%s' % pid[1:].split('_')[0]))
+        elif pid[0] == 'd':
+            return(self.lastname('a1'))
+        return(LASTNAMES[int(self.rand(pid, 'lastname') * len(LASTNAMES))])
+
+    def firstname(self, pid):
+        names = FIRSTNAMES[self.sex(pid)]
+        return(names[int(self.rand(pid, 'firstname') * len(names))])
+
+    def depth(self, pid):
+        '''
+        Generation of pid relative to the root, ascendants being negative
+        '''
+        if pid[0] == 'a':
+            return(-self.generation(int(pid[1:])))
+        elif pid[0] == 's':
+            return(-self.generation(int(pid[1:].split('_')[0])))
+        elif pid[0] == 'd':
+            return(len(pid[1:].split('_')))
+        return(self.depth(pid[1:]))
+
+    def parents(self, pid):
+        '''
+        Return the (father, mother) ids of pid, None when unknown
+        '''
+        if pid[0] == 'a':
+            n = int(pid[1:])
+            if self.generation(n) < self.generations:
+                return(('a%d' % (2 * n), 'a%d' % (2 * n + 1)))
+        elif pid[0] == 's':
+            n = int(pid[1:].split('_')[0])
+            return(('a%d' % (2 * n), 'a%d' % (2 * n + 1)))
+        elif pid[0] == 'd':
+            path = pid[1:].split('_')
+            parent = 'a1' if len(path) == 1 else 'd' + '_'.join(path[:-1])
+            if self.sex(parent) == 'M':
+                return((parent, 'w' + parent))
+            return(('w' + parent, parent))
+        return(None)
+
+    def unions(self, pid):
+        '''
+        Return the (spouse, children) of pid
+        '''
+        if pid[0] == 'w':
+            return([(pid[1:], self.unions(pid[1:])[0][1])])
+        if pid[0] == 'a' and pid != 'a1':
+            n = int(pid[1:])
+            spouse = 'a%d' % (n + 1 if n % 2 == 0 else n - 1)
+            child = n // 2
+            return([(spouse, ['a%d' % child] + ['s%d_%d' % (child, k) for k in range(1, self.children)])])
+        if pid == 'a1' or pid[0] == 'd':
+            if self.depth(pid) >= self.descendants:
+                return([])
+            prefix = 'd' if pid == 'a1' else pid + '_'
+            return([('w' + pid, [prefix + str(k) for k in range(1, self.children + 1)])])
+        return([])
+
+    def date(self, pid, what, year, lang):
+        '''
+        Return the date of the event what around year in lang, or None
+        when it is missing or in the future
+        '''
+        if self.rand(pid, what) < self.missing or year > 2020:
+            return(None)
+        day = 1 + int(self.rand(pid, what+'d') * 28)
+        month = int(self.rand(pid, what+'m') * 12)
+        if lang == 'fr' and day == 1:
+            day = '1er'
+        return('%s%s %s %d' % (LABELS[lang]['on'], day, MONTHS[lang][month], year))
+
+    def place(self, pid, what):
+        return(PLACES[int(self.rand(pid, what+'p') * len(PLACES))])
+
+    def url(self, pid, lang):
+        return('%s?lang=%s&amp;i=%s' % (OWNER, lang, pid))
+
+    def link(self, pid, lang, sosa=False):
+        ret = ''
+        if sosa:
+            ret = '<a href="%s"><img src="/static/images/sosa.png" alt="sosa"/></a> ' % self.url(pid, lang)
+        return(ret + '<a href="%s">%s %s</a>' % (self.url(pid, lang), self.firstname(pid), self.lastname(pid)))
+
+    def render(self, pid, lang='en'):
+        '''
+        Return the HTML person page of pid
+        '''
+        if lang not in LABELS:
+            lang = 'en'
+        labels = LABELS[lang]
+        sex = self.sex(pid)
+        first = self.firstname(pid)
+        last = self.lastname(pid)
+        born = 1950 + 30 * self.depth(pid) + int(self.rand(pid, 'age') * 10)
+        out = ['<!DOCTYPE html>\n<html lang="%s">\n<head>\n<meta charset="utf-8"/>\n<title>%s %s - Geneanet</title>\n</head>\n<body>\n' % (lang, first, last)]
+        alt = 'H' if sex == 'M' and lang == 'fr' else sex
+        out.append('<div id="person-title">\n <h1><img src="/static/images/%s.png" alt="%s"/> <a href="%s">%s</a> <a href="%s?lang=%s&amp;m=N&amp;v=%s">%s</a></h1>\n</div>\n' % (
+            sex.lower(), alt, self.url(pid, lang), first, OWNER, lang, urllib.parse.quote_plus(last.lower()), last.upper()))
+        out.append('<div id="perso">\n <ul>\n')
+        for what, year in [('born', born), ('deceased', born + 60 + int(self.rand(pid, 'death') * 25))]:
+            date = self.date(pid, what, year, lang)
+            if date is None:
+                if what == 'born':
+                    out.append('  <li>%s</li>\n' % labels[sex][what])
+                continue
+            place, code = self.place(pid, what)
+            out.append('  <li>%s %s - %s, %s</li>\n' % (labels[sex][what], date, place, code))
+        out.append(' </ul>\n</div>\n')
+        parents = self.parents(pid)
+        if parents:
+            out.append('<h2>%s</h2>\n<ul>\n' % labels['parents'])
+            for p in parents:
+                out.append(' <li style="vertical-align:middle;list-style-type:disc">%s</li>\n' % self.link(p, lang, p[0] == 'a'))
+            out.append('</ul>\n')
+        unions = self.unions(pid)
+        if unions:
+            out.append('<h2>%s</h2>\n<ul class="fiche_union">\n' % labels['unions'])
+            for spouse, children in unions:
+                out.append(' <li>%s' % self.link(spouse, lang))
+                date = self.date(pid if sex == 'M' else spouse, 'married', born + 25, lang)
+                if date:
+                    place, code = self.place(pid if sex == 'M' else spouse, 'married')
+                    out.append(' <em>%s %s, %s, %s</em>' % (labels[sex]['married'], date, place, code))
+                out.append('\n  <ul>\n')
+                for c in children:
+                    out.append('   <li style="vertical-align:middle;list-style-type:circle">%s</li>\n' % self.link(c, lang))
+                out.append('  </ul>\n </li>\n')
+            out.append('</ul>\n')
+        out.append('</body>\n</html>\n')
+        return(''.join(out).encode('utf-8'))
+
+    def persons(self):
+        '''
+        Return the ids of all the persons of the tree
+        '''
+        ret = ['a%d' % n for n in range(1, 2 ** (self.generations + 1))]
+        ret.extend(['s%d_%d' % (n, k) for n in range(1, 2 ** self.generations) for k in range(1, self.children)])
+        todo = ['a1']
+        while todo:
+            pid = todo.pop(0)
+            for spouse, children in self.unions(pid):
+                ret.append(spouse)
+                ret.extend(children)
+                todo.extend(children)
+        return(ret)
+
+    def size(self):
+        '''
+        Return the number of persons in the tree
+        '''
+        asc = 2 ** (self.generations + 1) - 1
+        siblings = (2 ** self.generations - 1) * (self.children - 1)
+        desc = sum([self.children ** g for g in range(1, self.descendants + 1)])
+        # spouses of the root and of the descendants having children
+        spouses = 1 + sum([self.children ** g for g in range(1, self.descendants)]) if self.descendants else 0
+        return(asc + siblings + desc + spouses)
+
+class GeneWebHandler(BaseHTTPRequestHandler):
+    '''
+    Serve the pages of server.tree, as Geneanet would
+    '''
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def count(self, what):
+        with self.server.lock:
+            self.server.stats[what] = self.server.stats.get(what, 0) + 1
+
+    def reply(self, code, content=b'', headers=None):
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if content:
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if content and self.command != 'HEAD':
+            self.wfile.write(content)
+
+    def do_GET(self):
+        u = urllib.parse.urlsplit(self.path)
+        if u.path == '/connexion/':
+            self.count('login_page')
+            self.reply(200, b'<html><form><input type="hidden" name="_csrf_token" value="benchtoken"/></form></html>')
+            return
+        if u.path != '/' + OWNER:
+            self.reply(404)
+            return
+        query = urllib.parse.parse_qs(u.query)
+        pid = query.get('i', [''])[0]
+        lang = query.get('lang', ['en'])[0]
+        self.count('requests')
+        server = self.server
+        if server.latency:
+            time.sleep(max(0.0, random.gauss(server.latency, server.latency / 4)))
+        if random.random() < server.error_rate:
+            self.count('errors')
+            self.reply(503, headers={'Retry-After': '1'})
+            return
+        if server.tree.rand(pid, 'login') < server.login_rate and 'gntoken=bench' not in self.headers.get('Cookie', ''):
+            self.count('redirects')
+            self.reply(302, headers={'Location': '/connexion/'})
+            return
+        if not server.tree.exists(pid):
+            self.reply(404)
+            return
+        content = server.tree.render(pid, lang)
+        etag = '"%08x"' % zlib.crc32(content)
+        if self.headers.get('If-None-Match') == etag:
+            self.count('notmodified')
+            self.reply(304, headers={'ETag': etag})
+            return
+        self.count('pages')
+        self.reply(200, content, {'ETag': etag})
+
+    def do_POST(self):
+        if urllib.parse.urlsplit(self.path).path != '/connexion/login_check':
+            self.reply(404)
+            return
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.count('logins')
+        self.reply(302, headers={'Location': '/', 'Set-Cookie': 'gntoken=bench; Path=/'})
+
+def serve(port=0, tree=None, latency=0.0, error_rate=0.0, login_rate=0.0, verbose=False):
+    '''
+    Start the server in a background thread and return it
+    Its base URL is server.url, its counters server.stats
+    '''
+    server = ThreadingHTTPServer(('127.0.0.1', port), GeneWebHandler)
+    server.daemon_threads = True
+    server.tree = tree or SyntheticTree()
+    server.latency = latency
+    server.error_rate = error_rate
+    server.login_rate = login_rate
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.stats = {}
+    server.url = 'http://127.0.0.1:%d/' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return(server)
+
+def add_arguments(parser):
+    '''
+    Options describing the synthetic tree and the server behaviour
+    '''
+    parser.add_argument("--generations", default=3, type=int, help="Number of generations of ascendants (3 by default)")
+    parser.add_argument("--descendants", default=2, type=int, help="Number of generations of descendants (2 by default)")
+    parser.add_argument("--children", default=3, type=int, help="Number of children per couple (3 by default)")
+    parser.add_argument("--missing", default=0.1, type=float, help="Fraction of missing dates (0.1 by default)")
+    parser.add_argument("--seed", default=0, type=int, help="Seed of the names, dates and places")
+    parser.add_argument("--latency", default=0.0, type=float, help="Mean latency of a page in seconds (0 by default)")
+    parser.add_argument("--error-rate", default=0.0, type=float, help="Fraction of pages answered 503 (0 by default)")
+    parser.add_argument("--login-rate", default=0.0, type=float, help="Fraction of pages redirecting to the login page until logged in (0 by default)")
+
+def from_arguments(args, port=0, verbose=False):
+    tree = SyntheticTree(args.generations, args.descendants, args.children, args.missing, args.seed)
+    return(serve(port, tree, args.latency, args.error_rate, args.login_rate, verbose))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic GeneWeb tree as Geneanet would")
+    parser.add_argument("--port", default=8080, type=int, help="Port to listen on (8080 by default)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = from_arguments(args, args.port, True)
+    print("Serving %d persons, root page %s%s?lang=en&i=a1" % (server.tree.size(), server.url, OWNER))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Retries of the Geneanet requests and circuit breaker
+"""
+import os
+import sys
+import time
+import email.utils
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+HOST = "gw.geneanet.org"
+URL = "https://gw.geneanet.org/owner?lang=en&p=john&n=doe"
+
+class Response:
+    def __init__(self, status, headers={}):
+        self.status_code = status
+        self.headers = headers
+        self.ok = status < 400
+        self.content = b'<html>%d</html>' % status
+
+class Fetcher(g2g.GFetcher):
+    '''
+    GFetcher answering the given statuses in turn instead of requesting
+    '''
+    def __init__(self, statuses):
+        super().__init__()
+        self.backoff = g2g.GBackoff(retries=2, delay=0.001, failures=0, pause=0)
+        self.statuses = list(statuses)
+        self.asked = 0
+
+    def request(self, purl, headers):
+        self.asked = self.asked + 1
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return(Response(status))
+
+class TestBackoff(unittest.TestCase):
+
+    def test_delay(self):
+        backoff = g2g.GBackoff(retries=4, delay=2.0)
+        for attempt in range(4):
+            delay = backoff.delay(attempt)
+            self.assertGreaterEqual(delay, 2.0 * 2 ** attempt * 0.5)
+            self.assertLessEqual(delay, 2.0 * 2 ** attempt * 1.5)
+        for i in range(100):
+            self.assertLessEqual(backoff.delay(30), g2g.BACKOFF_MAX)
+        # Retry-After is followed, within BACKOFF_MAX
+        self.assertGreaterEqual(backoff.delay(0, 60), 60)
+        self.assertLessEqual(backoff.delay(0, 10 ** 6), g2g.BACKOFF_MAX)
+
+    def test_retry_after(self):
+        self.assertEqual(g2g.retry_after('120'), 120.0)
+        self.assertEqual(g2g.retry_after('-5'), 0.0)
+        self.assertIsNone(g2g.retry_after(None))
+        self.assertIsNone(g2g.retry_after('soon'))
+        when = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(g2g.retry_after(when), 60, delta=2)
+
+    def test_slowdown(self):
+        backoff = g2g.GBackoff(failures=0)
+        self.assertEqual(backoff.slowdown(HOST), 1.0)
+        backoff.failure(HOST, True)
+        backoff.failure(HOST, True)
+        self.assertEqual(backoff.slowdown(HOST), 4.0)
+        for i in range(10):
+            backoff.failure(HOST, True)
+        self.assertEqual(backoff.slowdown(HOST), g2g.SLOWDOWN_MAX)
+        # Server errors do not slow down
+        backoff.failure("other", False)
+        self.assertEqual(backoff.slowdown("other"), 1.0)
+        for i in range(100):
+            backoff.success(HOST)
+        self.assertEqual(backoff.slowdown(HOST), 1.0)
+
+    def test_breaker(self):
+        backoff = g2g.GBackoff(failures=3, pause=60)
+        backoff.failure(HOST, False)
+        backoff.failure(HOST, False)
+        self.assertEqual(backoff.pause(HOST), 0.0)
+        backoff.failure(HOST, False)
+        self.assertGreater(backoff.pause(HOST), 50)
+        self.assertEqual(backoff.pause("other"), 0.0)
+        # Once paused, a single failure pauses again
+        backoff.paused[HOST] = 0
+        backoff.failure(HOST, False)
+        self.assertGreater(backoff.pause(HOST), 50)
+        # A success closes the breaker
+        backoff.paused[HOST] = 0
+        backoff.success(HOST)
+        backoff.failure(HOST, False)
+        self.assertEqual(backoff.pause(HOST), 0.0)
+
+class TestDownload(unittest.TestCase):
+
+    def test_retried(self):
+        fetcher = Fetcher([503, ConnectionError("reset"), 200])
+        self.assertEqual(fetcher.download(URL), b'<html>200</html>')
+        self.assertEqual(fetcher.asked, 3)
+        self.assertEqual(fetcher.retries, 2)
+        self.assertEqual(fetcher.failures, 0)
+
+    def test_given_up(self):
+        fetcher = Fetcher([500, 500, 500, 200])
+        self.assertIsNone(fetcher.download(URL))
+        self.assertEqual(fetcher.asked, 3)
+        self.assertEqual(fetcher.failures, 1)
+
+    def test_not_retried(self):
+        fetcher = Fetcher([404])
+        self.assertIsNone(fetcher.download(URL))
+        self.assertEqual(fetcher.asked, 1)
+        self.assertEqual(fetcher.retries, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Rows of a batch file
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+URL = "https://gw.geneanet.org/owner?lang=en&p=john&n=doe"
+
+class TestRow(unittest.TestCase):
+
+    def row(self, **item):
+        return(g2g.GBatch().row(1, item))
+
+    def test_url_only(self):
+        self.assertEqual(self.row(url=' '+URL+' '), {'row': 1, 'url': URL, 'gid': None,
+            'level': None, 'direction': None, 'error': None})
+
+    def test_gid(self):
+        self.assertEqual(self.row(url=URL, id='12')['gid'], 'I12')
+        self.assertEqual(self.row(url=URL, id=' I0042 ')['gid'], 'I0042')
+        self.assertIsNone(self.row(url=URL, id='')['gid'])
+
+    def test_depth(self):
+        self.assertEqual(self.row(url=URL, depth='3')['level'], 3)
+        self.assertEqual(self.row(url=URL, depth=2)['level'], 2)
+        self.assertEqual(self.row(url=URL, depth=0)['level'], 0)
+        self.assertIsNone(self.row(url=URL, depth='')['level'])
+        self.assertIsNotNone(self.row(url=URL, depth='deep')['error'])
+
+    def test_direction(self):
+        self.assertEqual(self.row(url=URL, direction=' AS ')['direction'], 'as')
+        self.assertIsNone(self.row(url=URL, direction='ads')['error'])
+        self.assertIsNotNone(self.row(url=URL, direction='up')['error'])
+
+    def test_no_url(self):
+        self.assertIsNotNone(self.row(id='12')['error'])
+
+class TestLoad(unittest.TestCase):
+
+    def load(self, name, text):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, name)
+            with open(path, 'w', encoding='utf-8') as fd:
+                fd.write(text)
+            batch = g2g.GBatch()
+            batch.load(path)
+        return(batch.rows)
+
+    def test_csv(self):
+        rows = self.load('batch.csv', "# roots\n%s,12,2,a\n\n%s\n" % (URL, URL))
+        self.assertEqual([(r['row'], r['gid'], r['level'], r['direction']) for r in rows],
+            [(1, 'I12', 2, 'a'), (2, None, None, None)])
+
+    def test_csv_header(self):
+        rows = self.load('batch.csv', "URL,direction\n%s,d\n" % URL)
+        self.assertEqual([(r['url'], r['direction']) for r in rows], [(URL, 'd')])
+
+    def test_jsonl(self):
+        rows = self.load('batch.jsonl', '{"url": "%s", "depth": 0}\n{"id": "3"}\n' % URL)
+        self.assertEqual([(r['level'], r['error'] is None) for r in rows], [(0, True), (None, False)])
+
+if __name__ == '__main__':
+    unittest.main()
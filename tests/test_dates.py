@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Geneanet dates, their Gramps form and the matching of the Gramps persons
+by dates
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+# Geneanet date, its GDate string and (modifier, ymd, ymd2, calendar)
+DATES = [
+    ('1850', '1850', ('', (1850, 0, 0), None, 'gregorian')),
+    ('en 1850', '1850', ('', (1850, 0, 0), None, 'gregorian')),
+    ('about 1850', 'about 1850', ('about', (1850, 0, 0), None, 'gregorian')),
+    ('vers 1850', 'about 1850', ('about', (1850, 0, 0), None, 'gregorian')),
+    ('March 1850', '1850-03', ('', (1850, 3, 0), None, 'gregorian')),
+    ('3 March 1850', '1850-03-03', ('', (1850, 3, 3), None, 'gregorian')),
+    ('le 1er mars 1850', '1850-03-01', ('', (1850, 3, 1), None, 'gregorian')),
+    ('between 1850 and 1860', 'between 1850 and 1860', ('between', (1850, 0, 0), (1860, 0, 0), 'gregorian')),
+    ('before 1 January 1700 (julian)', 'before 1700-01-01 (julian)', ('before', (1700, 1, 1), None, 'julian')),
+]
+
+class TestDates(unittest.TestCase):
+
+    def test_format_iso(self):
+        self.assertEqual(g2g.format_iso((0, 0, 0)), '')
+        self.assertEqual(g2g.format_iso((1850, 0, 0)), '1850')
+        self.assertEqual(g2g.format_iso((1850, 3, 0)), '1850-03')
+        self.assertEqual(g2g.format_iso((1850, 3, 7)), '1850-03-07')
+
+    def test_format_year(self):
+        self.assertEqual(g2g.format_year('about 1850-00-00'), 'about 1850')
+        self.assertEqual(g2g.format_year('1850'), '1850')
+        self.assertIsNone(g2g.format_year(None))
+
+    def test_parse_date(self):
+        for text, iso, parts in DATES:
+            d = g2g.parse_date(text)
+            self.assertEqual(d, iso, text)
+            self.assertEqual((d.modifier, d.ymd, d.ymd2, d.calendar), parts, text)
+        self.assertIsNone(g2g.parse_date(''))
+
+    def test_date_from_string(self):
+        for text, iso, parts in DATES:
+            d = g2g.date_from_string(iso)
+            self.assertEqual(d, iso)
+            self.assertEqual((d.modifier, d.ymd, d.ymd2, d.calendar), parts, iso)
+
+    def test_gramps_date(self):
+        # A Geneanet date written into Gramps reads back the same
+        for text, iso, parts in DATES:
+            event = g2g.Event()
+            date = event.get_date_object()
+            g2g.parse_date(text).apply(date)
+            self.assertEqual(g2g.gramps_date(event), iso, text)
+
+class TestFindPerson(unittest.TestCase):
+    '''
+    Regression: Gramps persons with a year only or qualified date were
+    not matched, and imported again
+    '''
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        try:
+            from gramps.gen.db.utils import make_database
+            g2g.db = make_database("sqlite")
+            g2g.db.load(self.tmp.name)
+        except Exception as e:
+            g2g.db = None
+            self.tmp.cleanup()
+            self.skipTest("No Gramps SQLite database: %s" % e)
+        g2g.pindex = None
+
+    def tearDown(self):
+        g2g.db.close()
+        g2g.db = None
+        g2g.pindex = None
+        self.tmp.cleanup()
+
+    def add_person(self, firstname, lastname, birth):
+        with g2g.DbTxn("test", g2g.db) as tran:
+            event = g2g.Event()
+            event.set_type(g2g.EventType(g2g.EventType.BIRTH))
+            g2g.parse_date(birth).apply(event.get_date_object())
+            g2g.db.add_event(event, tran)
+            p = g2g.Person()
+            name = g2g.Name()
+            name.set_first_name(firstname)
+            surname = g2g.Surname()
+            surname.set_surname(lastname)
+            name.add_surname(surname)
+            p.set_primary_name(name)
+            ref = g2g.EventRef()
+            ref.set_reference_handle(event.get_handle())
+            p.add_event_ref(ref)
+            p.set_birth_ref(ref)
+            g2g.db.add_person(p, tran)
+        return(p.gramps_id)
+
+    def find(self, firstname, lastname, birth):
+        gp = g2g.GPerson(0)
+        gp.g_firstname = firstname
+        gp.g_lastname = lastname
+        gp.g_birthdate = g2g.parse_date(birth)
+        gp.find_grampsp()
+        return(gp.gid if gp.grampsp else None)
+
+    def test_match(self):
+        for i, (text, iso, parts) in enumerate(DATES):
+            with self.subTest(date=text):
+                g2g.pindex = None
+                gid = self.add_person('Jean', 'Dupont%d' % i, text)
+                self.assertEqual(self.find('Jean', 'Dupont%d' % i, text), gid)
+
+    def test_missing_death(self):
+        # Namesakes still alive, born at different dates
+        self.add_person('Jean', 'Durand', '1954')
+        self.assertIsNone(self.find('Jean', 'Durand', '1983'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Order and deduplication of the crawl frontier
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+URL = "https://gw.geneanet.org/owner?lang=en&p=%s&n=doe"
+
+class Runner(g2g.GPerson):
+    '''
+    GPerson recording its crawls instead of fetching pages
+    '''
+    def __init__(self, level, done):
+        super().__init__(level)
+        self.done = done
+
+    def crawl(self, level, relation):
+        self.done.append((self.url, level))
+
+def work(relation, level, name, done):
+    return(g2g.GWork(relation, level, Runner(level, done).at(URL % name)))
+
+class TestFrontier(unittest.TestCase):
+
+    def setUp(self):
+        self.level = g2g.LEVEL
+        g2g.LEVEL = 2
+
+    def tearDown(self):
+        g2g.LEVEL = self.level
+
+    def run_order(self, order, items):
+        done = []
+        frontier = g2g.GFrontier(order)
+        for relation, level, name in items:
+            frontier.push(work(relation, level, name, done))
+        frontier.run()
+        return([(url.split('p=')[1].split('&')[0], level) for url, level in done])
+
+    def test_bfs(self):
+        items = [('person', 1, 'a'), ('person', 0, 'b'), ('person', 2, 'c')]
+        self.assertEqual(self.run_order('bfs', items), [('a', 1), ('b', 0), ('c', 2)])
+
+    def test_dfs(self):
+        items = [('person', 1, 'a'), ('person', 0, 'b'), ('person', 2, 'c')]
+        self.assertEqual(self.run_order('dfs', items), [('a', 1), ('b', 0), ('c', 2)])
+
+    def test_priority(self):
+        items = [('person', 1, 'a'), ('person', 0, 'b'), ('person', 2, 'c'), ('person', 0, 'd')]
+        self.assertEqual(self.run_order('priority', items), [('b', 0), ('d', 0), ('a', 1), ('c', 2)])
+
+    def test_dedup(self):
+        items = [('person', 1, 'a'), ('person', 1, 'a'), ('person', 2, 'a')]
+        self.assertEqual(self.run_order('bfs', items), [('a', 1)])
+        # A different relation is a different exploration
+        items = [('person', 1, 'a'), ('spouse', 1, 'a')]
+        self.assertEqual(len(self.run_order('bfs', items)), 2)
+
+    def test_lower_level_requeued(self):
+        # Reached deeper first, then from a lower level: only the lower
+        # level exploration is done
+        items = [('person', 2, 'a'), ('person', 0, 'a')]
+        for order in g2g.ORDERS:
+            self.assertEqual(self.run_order(order, items), [('a', 0)])
+
+    def test_restore(self):
+        done = []
+        frontier = g2g.GFrontier('bfs')
+        frontier.restore([work('person', 1, 'a', done)], [(('person', g2g.canonical_url(URL % 'b')), 0)])
+        frontier.push(work('person', 1, 'b', done))
+        frontier.push(work('person', 0, 'a', done))
+        frontier.run()
+        self.assertEqual([level for url, level in done], [0])
+
+    def test_urls_beyond_level(self):
+        p = g2g.GPerson(3)
+        p.fref = URL % 'f'
+        p.mref = URL % 'm'
+        self.assertEqual(g2g.GWork('parents', 2, p).urls(), [p.fref, p.mref])
+        self.assertEqual(g2g.GWork('parents', 3, p).urls(), [])
+        self.assertEqual(g2g.GWork('person', 3, p.at(URL % 'p')).urls(), [URL % 'p'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Import of a small tree from the local stand-in of Geneanet
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOP)
+sys.path.insert(0, os.path.join(TOP, 'bench'))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+import geneweb_server
+import bench_import
+
+# Globals of GeneanetCore set by the import, restored after each test
+GLOBALS = ['db', 'gname', 'verbosity', 'force', 'ascendants', 'descendants', 'spouses', 'LEVEL',
+           'CACHE_MODE', 'RATE', 'ORDER', 'TWO_PHASE', 'crawlstate', 'persons']
+
+class TestImport(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = dict([(k, getattr(g2g, k)) for k in GLOBALS])
+        self.tmp = tempfile.TemporaryDirectory()
+        try:
+            from gramps.gen.db.utils import make_database
+            g2g.db = make_database("sqlite")
+            g2g.db.load(self.tmp.name)
+        except Exception as e:
+            self.tmp.cleanup()
+            self.skipTest("No Gramps SQLite database: %s" % e)
+        g2g.gname = self.tmp.name
+        g2g.verbosity = 0
+        g2g.force = False
+        g2g.ascendants = True
+        g2g.descendants = True
+        g2g.spouses = True
+        g2g.CACHE_MODE = 'bypass'
+        g2g.RATE = 60000
+        g2g.crawlstate = None
+        self.tree = geneweb_server.SyntheticTree(generations=3, descendants=1, children=2)
+        self.server = geneweb_server.serve(tree=self.tree)
+
+    def tearDown(self):
+        self.server.shutdown()
+        g2g.db.close()
+        for k, v in self.saved.items():
+            setattr(g2g, k, v)
+        self.tmp.cleanup()
+
+    def run_import(self, gid=None, **options):
+        for k, v in options.items():
+            setattr(g2g, k, v)
+        g2g.g2gaction(gid, '%s%s?lang=en&i=a1' % (self.server.url, geneweb_server.OWNER))
+
+    def check_links(self):
+        '''
+        The families and the persons of the database reference each other
+        '''
+        db = g2g.db
+        for f in db.iter_families():
+            h = f.get_handle()
+            for ph in [f.get_father_handle(), f.get_mother_handle()]:
+                if ph:
+                    self.assertIn(h, db.get_person_from_handle(ph).get_family_handle_list(), f.gramps_id)
+            for cr in f.get_child_ref_list():
+                self.assertIn(h, db.get_person_from_handle(cr.ref).get_parent_family_handle_list(), f.gramps_id)
+        for p in db.iter_people():
+            h = p.get_handle()
+            for fh in p.get_family_handle_list():
+                f = db.get_family_from_handle(fh)
+                self.assertIn(h, [f.get_father_handle(), f.get_mother_handle()], p.gramps_id)
+            for fh in p.get_parent_family_handle_list():
+                f = db.get_family_from_handle(fh)
+                self.assertIn(h, [cr.ref for cr in f.get_child_ref_list()], p.gramps_id)
+
+    def test_links(self):
+        self.run_import(LEVEL=4, ORDER='bfs', TWO_PHASE=False)
+        self.assertGreater(g2g.db.get_number_of_families(), 0)
+        self.check_links()
+        self.assertEqual(bench_import.check(g2g.db, self.tree, True), [])
+
+    def test_links_two_phase(self):
+        self.run_import(LEVEL=4, ORDER='bfs', TWO_PHASE=True)
+        self.check_links()
+        self.assertEqual(bench_import.check(g2g.db, self.tree, True), [])
+
+    def test_level(self):
+        # The last parents explored are linked to their child
+        self.run_import(LEVEL=1, ORDER='bfs', TWO_PHASE=False)
+        self.assertLess(g2g.db.get_number_of_people(), self.tree.size())
+        self.check_links()
+        self.assertEqual(bench_import.check(g2g.db, self.tree, False), [])
+
+    def test_mismatch(self):
+        # Importing into another person stops, closing the crawler
+        with g2g.DbTxn("test", g2g.db) as tran:
+            p = g2g.Person()
+            name = g2g.Name()
+            name.set_first_name('Paul')
+            surname = g2g.Surname()
+            surname.set_surname('Martin')
+            name.add_surname(surname)
+            p.set_primary_name(name)
+            g2g.db.add_person(p, tran)
+        with self.assertRaises(g2g.GMismatch):
+            self.run_import(p.gramps_id, LEVEL=4, ORDER='bfs', TWO_PHASE=False)
+        self.assertIsNone(g2g.scheduler)
+        self.assertIsNone(g2g.cache)
+        self.assertEqual(g2g.db.get_number_of_people(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
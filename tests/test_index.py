@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Keys of the Gramps indexes and reuse of a saved person index
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+URL = "https://gw.geneanet.org/owner?lang=en&p=jean&n=dupont"
+
+class TestPersonIndex(unittest.TestCase):
+
+    def test_key(self):
+        self.assertEqual(g2g.GPersonIndex.key(' Dupont ', 'Jean  Pierre'), g2g.GPersonIndex.key('DUPONT', 'jean pierre'))
+        self.assertNotEqual(g2g.GPersonIndex.key('Dupont', 'Jean'), g2g.GPersonIndex.key('Dupond', 'Jean'))
+
+    def test_lookup(self):
+        index = g2g.GPersonIndex()
+        index.update('h1', 'Dupont', 'Jean', None, None)
+        index.update('h2', 'dupont', 'JEAN', None, None)
+        self.assertEqual(sorted(h for h, b, d in index.lookup('DUPONT', 'Jean')), ['h1', 'h2'])
+        # A renamed person leaves its former name
+        index.update('h1', 'Martin', 'Jean', None, None)
+        self.assertEqual([h for h, b, d in index.lookup('Dupont', 'Jean')], ['h2'])
+        self.assertEqual([h for h, b, d in index.lookup('Martin', 'Jean')], ['h1'])
+
+    def test_lookup_url(self):
+        index = g2g.GPersonIndex()
+        index.add_url('h1', URL)
+        self.assertEqual(index.lookup_url("https://gw.geneanet.org/owner?n=Dupont&p=Jean&oc=0"), 'h1')
+        self.assertIsNone(index.lookup_url("https://gw.geneanet.org/owner?p=jean&n=dupont&oc=1"))
+
+    def test_save_load(self):
+        index = g2g.GPersonIndex()
+        index.update('h1', 'Dupont', 'Jean', None, None)
+        index.add_url('h1', URL)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.json')
+            index.save(path, 'sig')
+            loaded = g2g.GPersonIndex()
+            self.assertFalse(loaded.load(path, 'other'))
+            self.assertTrue(loaded.load(path, 'sig'))
+            self.assertEqual(loaded.lookup('dupont', 'jean'), index.lookup('dupont', 'jean'))
+            self.assertEqual(loaded.lookup_url(URL), 'h1')
+
+def place(handle, name, code=None):
+    p = g2g.Place()
+    p.set_handle(handle)
+    p.set_name(g2g.PlaceName(value=name))
+    if code:
+        p.set_code(code)
+    return(p)
+
+class TestPlaceIndex(unittest.TestCase):
+
+    def test_key(self):
+        self.assertEqual(g2g.GPlaceIndex('exact').key('Saint-Étienne'), 'Saint-Étienne')
+        self.assertEqual(g2g.GPlaceIndex('case').key(' SAINT-Étienne'), 'saint étienne')
+        self.assertEqual(g2g.GPlaceIndex('accents').key('Saint-Étienne'), 'saint etienne')
+        self.assertEqual(g2g.GPlaceIndex('case').key(None), '')
+
+    def test_code(self):
+        self.assertEqual(g2g.GPlaceIndex.code(' 42000 '), '42000')
+        self.assertEqual(g2g.GPlaceIndex.code('Loire'), '')
+        self.assertEqual(g2g.GPlaceIndex.code(None), '')
+
+    def test_lookup(self):
+        index = g2g.GPlaceIndex('case')
+        index.update(place('p1', 'Lyon', '69000'))
+        index.update(place('p2', 'LYON'))
+        self.assertEqual(index.lookup('lyon', '69000'), 'p1')
+        # Without the same code, the place without code is preferred
+        self.assertEqual(index.lookup('lyon', '69001'), 'p2')
+        self.assertIsNone(g2g.GPlaceIndex('exact').lookup('lyon'))
+        index = g2g.GPlaceIndex('case')
+        index.update(place('p1', 'Lyon', '69000'))
+        self.assertIsNone(index.lookup('Lyon', '69001'))
+        self.assertEqual(index.lookup('Lyon'), 'p1')
+        # A renamed place leaves its former name
+        index.update(place('p1', 'Lyon 1er'))
+        self.assertIsNone(index.lookup('Lyon'))
+
+class TestSignature(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        try:
+            from gramps.gen.db.utils import make_database
+            self.make_database = make_database
+            self.open()
+        except Exception as e:
+            self.tmp.cleanup()
+            self.skipTest("No Gramps SQLite database: %s" % e)
+
+    def tearDown(self):
+        g2g.db.close()
+        g2g.db = None
+        self.tmp.cleanup()
+
+    def open(self):
+        g2g.db = self.make_database("sqlite")
+        g2g.db.load(self.tmp.name)
+
+    def test_stable(self):
+        before = g2g.db_signature()
+        self.assertTrue(before)
+        g2g.db.close()
+        self.open()
+        self.assertEqual(g2g.db_signature(), before)
+        with g2g.DbTxn("test", g2g.db) as tran:
+            p = g2g.Person()
+            g2g.db.add_person(p, tran)
+        self.assertNotEqual(g2g.db_signature(), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Parsing of Geneanet person pages and cache of the records parsed
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'fixtures')
+URL = "https://gw.geneanet.org/bench?lang=en&p=john&n=smith"
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as fd:
+        return(fd.read())
+
+def page(name, person):
+    lang = name.split('_')[0]
+    return(g2g.page_parser.parse(fixture(name+'.html'), "https://gw.geneanet.org/bench?lang=%s&%s" % (lang, person)))
+
+def ref(lang, person):
+    return("https://gw.geneanet.org/bench?lang=%s&%s" % (lang, person))
+
+class TestFixtures(unittest.TestCase):
+    '''
+    Records extracted from the pages of bench/fixtures
+    '''
+    def english(self):
+        # Birth and death are found by their label in the Gramps language
+        if g2g._("Born") != "Born":
+            self.skipTest("Gramps is not in english")
+
+    def test_en_simple(self):
+        rec = page('en_simple', 'p=john&n=smith')
+        self.assertEqual((rec['g_firstname'], rec['g_lastname'], rec['g_sex']), ('John', 'Smith', 'M'))
+        self.assertEqual(rec['fref'], ref('en', 'p=william&n=smith'))
+        self.assertEqual(rec['mref'], ref('en', 'p=mary&n=brown'))
+        self.assertEqual(rec['spouseref'], [ref('en', 'p=anna&n=taylor')])
+        self.assertEqual(rec['childref'], [[ref('en', 'p=paul&n=smith'), ref('en', 'p=alice&n=smith')]])
+        self.assertEqual((rec['marriagedate'], rec['marriageplace'], rec['marriageplacecode']), (['1875-06-01'], ['Cambridge'], ['30000']))
+        self.english()
+        self.assertEqual((rec['g_birthdate'], rec['g_birthplace'], rec['g_birthplacecode']), ('1850-03-03', 'London', '10000'))
+        self.assertEqual((rec['g_deathdate'], rec['g_deathplace'], rec['g_deathplacecode']), ('1910-11-12', 'Oxford', '20000'))
+
+    def test_en_many_children(self):
+        rec = page('en_many_children', 'p=margaret&n=jones')
+        self.assertEqual((rec['g_firstname'], rec['g_lastname'], rec['g_sex']), ('Margaret', 'Jones', 'F'))
+        self.assertEqual(rec['fref'], ref('en', 'p=thomas&n=jones&oc=2'))
+        self.assertEqual(len(rec['childref'][0]), 14)
+        self.assertEqual(rec['childref'][0][0], ref('en', 'p=george&n=walker'))
+        self.english()
+        self.assertEqual((rec['g_birthdate'], rec['g_birthplace']), ('about 1790', 'Bristol'))
+        self.assertEqual(rec['g_deathdate'], 'before 1860')
+
+    def test_fr_multi_spouse(self):
+        rec = page('fr_multi_spouse', 'p=pierre&n=martin')
+        self.assertEqual((rec['g_firstname'], rec['g_lastname'], rec['g_sex']), ('Pierre', 'Martin', 'M'))
+        self.assertEqual(rec['mref'], ref('fr', 'p=jeanne&n=le+goff&oc=1'))
+        self.assertEqual(len(rec['spouseref']), 3)
+        self.assertEqual([len(c) for c in rec['childref']], [2, 1, 0])
+        self.assertEqual(rec['marriagedate'], ['1825-05-03', '1838', 'about 1850'])
+        self.assertEqual(rec['marriageplace'], ['Quimper', 'Morlaix', None])
+        self.assertEqual(rec['marriageplacecode'], ['29000', '29600', None])
+
+    def test_fr_missing_dates(self):
+        rec = page('fr_missing_dates', 'p=marie+anne&n=queffelec')
+        self.assertEqual((rec['g_firstname'], rec['g_lastname'], rec['g_sex']), ('Marie Anne', 'Queffelec', 'F'))
+        self.assertEqual(rec['fref'], '')
+        self.assertIsNone(rec['g_birthdate'])
+        self.assertIsNone(rec['g_deathdate'])
+        self.assertEqual(rec['marriagedate'], [None])
+        self.assertEqual(rec['childref'], [[ref('fr', 'p=jean&n=le+gall')]])
+
+    def test_en_no_parents(self):
+        # The children of the union are not taken as parents
+        rec = page('en_no_parents', 'p=walter&n=hughes')
+        self.assertEqual((rec['g_firstname'], rec['g_lastname']), ('Walter', 'Hughes'))
+        self.assertEqual(rec['fref'], "")
+        self.assertEqual(rec['mref'], "")
+        self.assertEqual(rec['childref'], [[ref('en', 'p=henry&n=hughes'), ref('en', 'p=emily&n=hughes')]])
+
+    def test_records_complete(self):
+        # Every record can initiate a GPerson
+        attrs = set(g2g.GPerson.RECORD) - set(['hash', 'level'])
+        for name in ['en_simple', 'en_many_children', 'en_no_parents', 'fr_multi_spouse', 'fr_missing_dates']:
+            rec = page(name, 'p=x&n=y')
+            self.assertEqual(attrs - set(rec), set(), name)
+
+class TestDigest(unittest.TestCase):
+
+    def test_dynamic_parts(self):
+        content = fixture('en_simple.html')
+        dynamic = content.replace(b'"owner": "bench"', b'"owner": "bench", "ts": 1234')
+        dynamic = dynamic.replace(b'<body>', b'<body>\n<!-- served in 12ms -->\n<input type="hidden" name="token" value="abc"/>')
+        self.assertNotEqual(dynamic, content)
+        self.assertEqual(g2g.GPageParser.digest(dynamic), g2g.GPageParser.digest(content))
+        self.assertNotEqual(g2g.GPageParser.digest(content.replace(b'1850', b'1851')), g2g.GPageParser.digest(content))
+
+    def test_record_hash(self):
+        rec = g2g.page_parser.parse(fixture('en_simple.html'), URL)
+        other = dict(rec)
+        other['url'] = URL+"&oc=0"
+        self.assertEqual(g2g.GPageParser.record_hash(other), g2g.GPageParser.record_hash(rec))
+        other['g_birthdate'] = '1851'
+        self.assertNotEqual(g2g.GPageParser.record_hash(other), g2g.GPageParser.record_hash(rec))
+
+class TestRecordCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = g2g.GPageCache(self.tmp.name)
+        self.version = g2g.GPageParser.VERSION
+
+    def tearDown(self):
+        g2g.GPageParser.VERSION = self.version
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_record(self):
+        rec = {'url': URL, 'g_firstname': 'John'}
+        self.cache.put_record(URL, 'h1', rec)
+        self.assertEqual(self.cache.get_record(URL, 'h1'), rec)
+        self.assertIsNone(self.cache.get_record(URL, 'h2'))
+
+    def test_parser_version(self):
+        self.cache.put_record(URL, 'h1', {'url': URL})
+        g2g.GPageParser.VERSION = self.version + 1
+        self.assertIsNone(self.cache.get_record(URL, 'h1'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Background fetching of the Geneanet pages
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOP)
+sys.path.insert(0, os.path.join(TOP, 'bench'))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+import geneweb_server
+
+URL = "https://gw.geneanet.org/%s?lang=en&p=%s&n=doe"
+
+class Fetcher:
+    '''
+    GFetcher taking delay seconds per page, failing the pages of the
+    owner bad, without cache nor network
+    '''
+    def __init__(self, delay=0.0):
+        self.stopping = threading.Event()
+        self.backoff = g2g.GBackoff()
+        self.delay = delay
+        self.downloads = []
+
+    def cached(self, purl):
+        return(None)
+
+    def download(self, purl):
+        self.downloads.append(purl)
+        time.sleep(self.delay)
+        if '/bad?' in purl:
+            return(None)
+        return(purl.encode())
+
+class TestScheduler(unittest.TestCase):
+
+    def scheduler(self, fetcher, concurrency=1, workers=3):
+        scheduler = g2g.GScheduler(fetcher, rate=10 ** 6, concurrency=concurrency, workers=workers)
+        self.addCleanup(scheduler.close)
+        return(scheduler)
+
+    def test_once(self):
+        fetcher = Fetcher()
+        scheduler = self.scheduler(fetcher)
+        scheduler.prefetch([URL % ('a', 'x'), URL % ('a', 'x')])
+        self.assertEqual(scheduler.get(URL % ('a', 'x')), (URL % ('a', 'x')).encode())
+        self.assertEqual(len(fetcher.downloads), 1)
+        # Consumed pages are forgotten and not prefetched again
+        self.assertEqual(scheduler.futures, {})
+        scheduler.prefetch([URL % ('a', 'x')])
+        self.assertEqual(scheduler.futures, {})
+
+    def test_failure_forgotten(self):
+        fetcher = Fetcher()
+        scheduler = self.scheduler(fetcher)
+        self.assertIsNone(scheduler.get(URL % ('bad', 'x')))
+        self.assertIsNone(scheduler.get(URL % ('bad', 'x')))
+        self.assertEqual(len(fetcher.downloads), 2)
+        self.assertEqual(scheduler.futures, {})
+
+    def test_owners_not_starved(self):
+        fetcher = Fetcher(0.05)
+        scheduler = self.scheduler(fetcher)
+        scheduler.prefetch([URL % ('a', i) for i in range(10)])
+        start = time.time()
+        scheduler.get(URL % ('b', 'x'))
+        # One page of owner a at most is fetched before
+        self.assertLess(time.time() - start, 0.3)
+        self.assertLessEqual(max(scheduler.active.values()), 1)
+
+class TestLogin(unittest.TestCase):
+    '''
+    Workers redirected to the login page of the stand-in at the same time
+    '''
+    def setUp(self):
+        self.server = geneweb_server.serve(latency=0.05, login_rate=1.0)
+        self.saved = g2g.LOGIN_URL
+        g2g.LOGIN_URL = self.server.url + 'connexion/'
+
+    def tearDown(self):
+        g2g.LOGIN_URL = self.saved
+        self.server.shutdown()
+
+    def test_once(self):
+        fetcher = g2g.GFetcher()
+        self.addCleanup(fetcher.close)
+        fetcher.user = 'bench'
+        fetcher.password = 'bench'
+        statuses = []
+        def fetch(pid):
+            statuses.append(fetcher.request('%s%s?lang=en&i=%s' % (self.server.url, geneweb_server.OWNER, pid)).status_code)
+        threads = [threading.Thread(target=fetch, args=('a%d' % i,)) for i in range(1, 9)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual(self.server.stats['logins'], 1)
+        self.assertEqual(fetcher.requests, 16)
+
+if __name__ == '__main__':
+    unittest.main()
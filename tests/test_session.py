@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+Gramps signals during an import
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+class Log:
+    '''
+    Gramps database and GWriteBatch only logging the calls
+    '''
+    def __init__(self):
+        self.calls = []
+
+    def disable_signals(self):
+        self.calls.append('disable')
+
+    def enable_signals(self):
+        self.calls.append('enable')
+
+    def emit(self, signal):
+        self.calls.append(signal)
+
+    def commit(self):
+        self.calls.append('commit')
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (g2g.db, g2g.writer)
+        self.log = Log()
+        g2g.db = self.log
+        g2g.writer = self.log
+
+    def tearDown(self):
+        g2g.db, g2g.writer = self.saved
+
+    def test_checkpoint(self):
+        session = g2g.GImportSession(2)
+        session.start()
+        session.touch('person')
+        session.imported()
+        self.assertEqual(self.log.calls, ['disable'])
+        session.imported()
+        # Committed before the views are refreshed
+        self.assertEqual(self.log.calls, ['disable', 'commit', 'enable', 'person-rebuild', 'disable'])
+
+    def test_end(self):
+        session = g2g.GImportSession(0)
+        session.start()
+        session.touch('person')
+        session.touch('family')
+        session.imported()
+        session.end()
+        session.end()
+        self.assertEqual(self.log.calls, ['disable', 'enable', 'family-rebuild', 'person-rebuild'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+#
+# GeneanetForGramps
+#
+# Copyright (C) 2020  Bruno Cornec
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the Affero GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+
+"""
+State of an interrupted import saved for --resume
+"""
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import GeneanetCore as g2g
+except ImportError as e:
+    raise unittest.SkipTest("Gramps is needed: %s" % e)
+
+URL = "https://gw.geneanet.org/owner?lang=en&p=%s&n=doe"
+
+class Writer:
+    '''
+    GWriteBatch only counting its commits
+    '''
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits = self.commits + 1
+
+def person(name, gid):
+    p = g2g.GPerson(0).at(URL % name)
+    p.gid = gid
+    g2g.persons[g2g.canonical_url(p.url)] = p
+    return(p)
+
+class TestCrawlState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'state.json')
+        self.saved = (g2g.writer, g2g.frontier, g2g.persons)
+        g2g.writer = Writer()
+        g2g.frontier = g2g.GFrontier('bfs')
+        g2g.persons = {}
+        self.state = g2g.GCrawlState(self.path)
+
+    def tearDown(self):
+        g2g.writer, g2g.frontier, g2g.persons = self.saved
+        self.tmp.cleanup()
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as fd:
+            return(json.load(fd))
+
+    def test_no_checkpoint(self):
+        person('a', 'I0001')
+        self.state.save()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(g2g.writer.commits, 0)
+
+    def test_only_committed(self):
+        person('a', 'I0001')
+        g2g.frontier.push(g2g.GWork('person', 1, g2g.GPerson(1).at(URL % 'c')))
+        self.state.checkpoint()
+        self.assertEqual(g2g.writer.commits, 1)
+        # Written after the checkpoint, then aborted
+        person('b', 'I0002')
+        g2g.persons[g2g.canonical_url(URL % 'a')].record = lambda: {'level': 9}
+        self.state.save()
+        self.assertEqual(g2g.writer.commits, 1)
+        data = self.load()
+        self.assertEqual([p['gid'] for p in data['persons'].values()], ['I0001'])
+        self.assertEqual(list(data['persons'].values())[0]['record']['level'], 0)
+        self.assertEqual([w['url'] for w in data['frontier']], [URL % 'c'])
+
+if __name__ == '__main__':
+    unittest.main()